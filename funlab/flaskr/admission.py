@@ -0,0 +1,160 @@
+"""Admission control: per-client token buckets, a global concurrency limit and priority classes."""
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Iterable
+
+from flask import Response, g, render_template, request, session
+
+if TYPE_CHECKING:
+    from funlab.flaskr.app import FunlabFlask
+
+CRITICAL, NORMAL, LOW = 'critical', 'normal', 'low'
+DEFAULT_CRITICAL_PATHS = ('/health', '/plugin-manager', '/metrics')
+# with STATIC_FAST_PATH_ENABLED, files under /static are answered before Flask and never reach
+# admission control, so the LOW /static class only applies without the fast path (or to its misses)
+DEFAULT_LOW_PATHS = ('/static', '/notifications/poll')
+DEFAULT_UNLIMITED_PATHS = ('/static',)
+
+
+class TokenBucket:
+    __slots__ = ('tokens', 'updated')
+
+    def __init__(self, burst: float):
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def take(self, rate: float, burst: float, now: float) -> float:
+        """Consume one token; return 0 when granted, else seconds until one is available."""
+        self.tokens = min(burst, self.tokens + (now - self.updated) * rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / rate
+
+
+class AdmissionController:
+    """Shed load early, in the first ``before_request`` handler, instead of queueing it.
+
+    Requests are classified by path prefix:
+
+    * critical (health, plugin manager, metrics): always admitted;
+    * low (static files, notification polling): shed once ``max_concurrent * low_share``
+      requests are in flight;
+    * normal: shed once ``max_concurrent`` requests are in flight.
+
+    Non-critical requests also take a token from the client's bucket (``rate`` per second,
+    ``burst`` capacity), keyed by the logged-in user id or the remote address; paths in
+    ``unlimited_paths`` are exempt. Shed requests get a 503 with ``Retry-After`` and a
+    maintenance page rendered once and reused. Set ``max_concurrent`` below the WSGI server's
+    thread count so spare threads can keep answering while the others are busy.
+    """
+
+    def __init__(self, max_concurrent: int = 0, rate: float = 20, burst: float = 40, low_share: float = 0.75,
+                 critical_paths: Iterable[str] = DEFAULT_CRITICAL_PATHS, low_paths: Iterable[str] = DEFAULT_LOW_PATHS,
+                 unlimited_paths: Iterable[str] = DEFAULT_UNLIMITED_PATHS, retry_after: int = 5,
+                 max_clients: int = 10000):
+        self.max_concurrent = max_concurrent
+        self.low_limit = max(1, int(max_concurrent * low_share)) if max_concurrent else 0
+        self.rate = rate
+        self.burst = burst
+        self.critical_paths = tuple(critical_paths)
+        self.low_paths = tuple(low_paths)
+        self.unlimited_paths = tuple(unlimited_paths)
+        self.retry_after = retry_after
+        self.max_clients = max_clients
+        self._buckets: OrderedDict[str, TokenBucket] = OrderedDict()
+        self._lock = threading.Lock()
+        self._page: bytes = None
+        self.in_flight = 0
+        self.admitted = 0
+        self.shed = {'concurrency': 0, 'rate': 0}
+
+    @classmethod
+    def from_config(cls, config) -> AdmissionController:
+        return cls(max_concurrent=int(config.get('ADMISSION_MAX_CONCURRENT', 0)),
+                   rate=float(config.get('ADMISSION_RATE', 20)),
+                   burst=float(config.get('ADMISSION_BURST', 40)),
+                   low_share=float(config.get('ADMISSION_LOW_PRIORITY_SHARE', 0.75)),
+                   critical_paths=config.get('ADMISSION_CRITICAL_PATHS', DEFAULT_CRITICAL_PATHS),
+                   low_paths=config.get('ADMISSION_LOW_PATHS', DEFAULT_LOW_PATHS),
+                   unlimited_paths=config.get('ADMISSION_UNLIMITED_PATHS', DEFAULT_UNLIMITED_PATHS),
+                   retry_after=int(config.get('ADMISSION_RETRY_AFTER', 5)))
+
+    def init_app(self, app: FunlabFlask):
+        self.app = app
+        app.before_request_funcs.setdefault(None, []).insert(0, self._admit)
+        app.teardown_request_funcs.setdefault(None, []).append(self._release)
+
+    def classify(self, path: str) -> str:
+        if path.startswith(self.critical_paths):
+            return CRITICAL
+        if path.startswith(self.low_paths):
+            return LOW
+        return NORMAL
+
+    def _client_key(self) -> str:
+        if user_id := session.get('_user_id'):
+            return f'user:{user_id}'
+        return f'ip:{request.remote_addr}'
+
+    def _admit(self):
+        path = request.path
+        priority = self.classify(path)
+        if priority != CRITICAL and self.rate > 0 and not path.startswith(self.unlimited_paths):
+            if wait := self._take_token(self._client_key()):
+                return self._reject('rate', wait)
+        limit = 0 if priority == CRITICAL else self.low_limit if priority == LOW else self.max_concurrent
+        with self._lock:  # check and count together, so concurrent requests cannot all pass the limit
+            admitted = not limit or self.in_flight < limit
+            if admitted:
+                self.in_flight += 1
+                self.admitted += 1
+        if not admitted:
+            return self._reject('concurrency', self.retry_after)
+        g._admission_counted = True
+        return None
+
+    def _release(self, exc=None):
+        if g.pop('_admission_counted', False):
+            with self._lock:
+                self.in_flight -= 1
+
+    def _take_token(self, key: str) -> float:
+        now = time.monotonic()
+        with self._lock:
+            if (bucket := self._buckets.get(key)) is None:
+                bucket = self._buckets[key] = TokenBucket(self.burst)
+                if len(self._buckets) > self.max_clients:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+            return bucket.take(self.rate, self.burst, now)
+
+    def _reject(self, reason: str, retry_after: float) -> Response:
+        with self._lock:
+            self.shed[reason] += 1
+        headers = {'Retry-After': str(max(1, round(retry_after))), 'Cache-Control': 'no-store'}
+        if request.accept_mimetypes.best == 'application/json':
+            return Response('{"success": false, "error": "Server busy, retry later"}', status=503,
+                            headers=headers, mimetype='application/json')
+        return Response(self._maintenance_page(), status=503, headers=headers, mimetype='text/html')
+
+    def _maintenance_page(self) -> bytes:
+        if self._page is None:
+            # rendered once, outside the shed request, as an anonymous visitor of '/'
+            try:
+                with self.app.test_request_context('/'):
+                    self._page = render_template('error-maintenance.html').encode('utf-8')
+            except Exception as e:
+                self.app.mylogger.warning(f"Could not render error-maintenance.html: {e}")
+                self._page = b'<h1>Service temporarily unavailable</h1><p>Please retry shortly.</p>'
+        return self._page
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'in_flight': self.in_flight, 'admitted': self.admitted, 'clients': len(self._buckets),
+                    'shed_concurrency': self.shed['concurrency'], 'shed_rate': self.shed['rate']}
@@ -1,20 +1,37 @@
 from __future__ import annotations
 import argparse
+import hashlib
 from http.client import HTTPException
 from pathlib import Path
 import traceback
 from werkzeug.routing import BuildError
 
-from flask import (Blueprint, Flask, redirect, render_template, url_for, current_app)
+from flask import (Blueprint, Flask, Response, abort, redirect, render_template, url_for, current_app)
 from flask_login import current_user
 from funlab.core.auth import policy_required
 from funlab.core.menu import MenuItem, MenuDivider
 from funlab.core.config import Config
 from funlab.core.appbase import _FlaskBase
 from funlab.core.notification import INotificationProvider
-from funlab.core.policy import is_admin, is_authenticated_user
 from funlab.utils import vars2env
 from funlab.flaskr.plugin_mgmt_view import PluginManagerView
+from funlab.flaskr.admission import AdmissionController
+from funlab.flaskr.compression import ResponseCompressor
+from funlab.flaskr.config_snapshot import ConfigSnapshot, ConfigSourceTracker
+from funlab.flaskr.db_tuning import DatabaseTuning
+from funlab.flaskr.error_storm import ErrorAggregator
+from funlab.flaskr.hooks import AsyncHookExecutor, HookDispatcher, hook_registry
+from funlab.flaskr.identity_cache import IdentityCache, is_admin, is_authenticated_user
+from funlab.flaskr.log_queue import QueuedLogging
+from funlab.flaskr.metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, RequestMetrics
+from funlab.flaskr.plugin_accounting import PluginAccounting
+from funlab.flaskr.plugin_discovery import PluginDiscoveryCache
+from funlab.flaskr.plugin_swap import PluginReloadCoordinator
+from funlab.flaskr.plugin_timeseries import PluginMetricsSampler
+from funlab.flaskr.response_cache import ResponseCache, cached_view
+from funlab.flaskr.static_files import StaticFiles
+from funlab.flaskr.streaming import render_page
+from funlab.flaskr.turbo import TurboSupport
 
 class FunlabFlask(_FlaskBase):
     def __init__(self, configfile:str, envfile:str, *args, **kwargs):
@@ -22,9 +39,45 @@ class FunlabFlask(_FlaskBase):
         import logging
         mylogger = log.get_logger(self.__class__.__name__, level=logging.INFO)
         mylogger.progress("Creating FunlabFlask ...", key='funlabflask')
-        super().__init__(configfile=configfile, envfile=envfile, *args, **kwargs)
+        self.request_metrics: RequestMetrics = None
+        self.response_cache: ResponseCache = None
+        self.error_aggregator: ErrorAggregator = None
+        self.queued_logging: QueuedLogging = None
+        self.config_snapshot: ConfigSnapshot = None
+        self.plugin_reloader: PluginReloadCoordinator = None
+        self.plugin_accounting: PluginAccounting = None
+        self.plugin_metrics_sampler: PluginMetricsSampler = None
+        self.admission: AdmissionController = None
+        self.response_compressor: ResponseCompressor = None
+        self.static_files: StaticFiles = None
+        self.turbo: TurboSupport = None
+        self.hook_executor: AsyncHookExecutor = None
+        self.hook_dispatcher: HookDispatcher = None
+        self.identity_cache: IdentityCache = None
+        self.db_tuning: DatabaseTuning = None
+        self.config_changes: dict = {}
+        self._configfile = configfile
+        self._envfile = envfile
+        # plugins are discovered inside super().__init__(), before config is available: env-configured
+        self.plugin_discovery = PluginDiscoveryCache.from_env()
+        with self.plugin_discovery.installed():
+            super().__init__(configfile=configfile, envfile=envfile, *args, **kwargs)
         self.app:FunlabFlask
 
+        self._register_log_queue(mylogger)
+        self._register_hook_executor()
+        self._register_config_snapshot()
+        self._register_identity_cache()
+        self._register_db_tuning()
+        self._register_plugin_accounting()
+        self._register_plugin_reloader()
+        self._register_admission_control()
+        self._register_request_metrics()
+        self._register_response_compression()
+        self._register_response_cache()
+        self._register_static_files()
+        self._register_turbo()
+        self.error_aggregator = ErrorAggregator.from_config(self.config)
         # ✅ 註冊內建的 PluginManagerView
         self._register_plugin_manager_view()
         mylogger.end_progress("FunlabFlask created.", key='funlabflask')
@@ -107,6 +160,221 @@ class FunlabFlask(_FlaskBase):
         except Exception as e:
             self.mylogger.error(f"Failed to register PluginManagerView: {e}")
 
+    def _register_plugin_accounting(self):
+        """Attribute request/thread CPU and memory to plugins when ``ACCOUNTING_ENABLED`` is set."""
+        if not self.config.get('ACCOUNTING_ENABLED', False):
+            return
+        self.plugin_accounting = PluginAccounting.from_config(self, self.config)
+        # registered before the reload gate, so time held during a plugin swap is not charged to it
+        self.plugin_accounting.init_app(self)
+        self.mylogger.info("Per-plugin resource accounting enabled")
+
+    def _register_plugin_reloader(self):
+        """Run plugin reloads in the background, draining the plugin's requests around the swap."""
+        if not hasattr(self, 'plugin_manager'):
+            return
+        self.plugin_reloader = PluginReloadCoordinator.from_config(self)
+        # registered before request metrics so held requests are still timed and counted
+        self.plugin_reloader.init_app(self)
+
+    def _register_admission_control(self):
+        """Shed excess load with fast 503 responses when ``ADMISSION_ENABLED`` is set."""
+        if not self.config.get('ADMISSION_ENABLED', False):
+            return
+        self.admission = AdmissionController.from_config(self.config)
+        # registered before request metrics (which then runs first) so shed requests are counted
+        self.admission.init_app(self)
+        self.mylogger.info(f"Admission control enabled, max concurrent {self.admission.max_concurrent or 'unlimited'}")
+
+    def _register_request_metrics(self):
+        """Enable request metrics and the ``/metrics`` endpoint when ``METRICS_ENABLED`` is set."""
+        if not self.config.get('METRICS_ENABLED', False):
+            return
+        self.request_metrics = RequestMetrics.from_config(self.config)
+        self.request_metrics.init_app(self)
+        self.mylogger.info("Request metrics enabled at /metrics")
+
+    def _register_response_compression(self):
+        """Compress dynamic responses when ``COMPRESS_ENABLED`` is set (nodes without a reverse proxy)."""
+        if not self.config.get('COMPRESS_ENABLED', False):
+            return
+        self.response_compressor = ResponseCompressor.from_config(self.config)
+        self.response_compressor.init_app(self)
+        self.mylogger.info(f"Response compression enabled: {', '.join(self.response_compressor.algorithms)}")
+
+    def _register_response_cache(self):
+        """Enable the page/fragment cache used by :func:`cached_view` when ``RESPONSE_CACHE_ENABLED`` is set."""
+        if not self.config.get('RESPONSE_CACHE_ENABLED', False):
+            return
+        self.response_cache = ResponseCache.from_config(self.config)
+        if hasattr(self, 'hook_manager'):
+            # rendered pages embed plugin menus and hook output, drop them whenever a plugin reloads
+            self.hook_manager.register_hook(
+                'plugin_after_reload',
+                lambda context: self.response_cache.clear(),
+                priority=10,
+                plugin_name=self.__class__.__name__,
+            )
+        self.mylogger.info(f"Response cache enabled, max {self.response_cache.max_bytes} bytes")
+
+    def _register_static_files(self):
+        """Serve ``/static/`` from a WSGI fast path with an in-memory hot cache when ``STATIC_FAST_PATH_ENABLED`` is set.
+
+        Files answered there skip Flask routing and every request hook (metrics, admission, sessions).
+        """
+        if not self.config.get('STATIC_FAST_PATH_ENABLED', False) or not self.blueprint.has_static_folder:
+            return
+        self.static_files = StaticFiles.from_config(self.wsgi_app, self.blueprint.static_folder,
+                                                    self.blueprint.static_url_path, self.config)
+        self.wsgi_app = self.static_files
+        self.mylogger.info(f"Static fast path enabled for {self.static_files.url_prefix}")
+
+    def _register_turbo(self):
+        """Answer Turbo Frame navigations with the page content only when ``TURBO_ENABLED`` is set."""
+        if not self.config.get('TURBO_ENABLED', False):
+            return
+        self.turbo = TurboSupport.from_config(self.config)
+        self.turbo.init_app(self)
+        self.mylogger.info(f"Turbo Frame rendering enabled, Drive {'on' if self.turbo.drive else 'off'}")
+
+    def _register_hook_executor(self):
+        """Run hook callbacks declared async (``@async_hook``, ``mode='async'``, ``HOOK_ASYNC_CALLBACKS``) in the background,
+        and dispatch template hooks with lazily built contexts when ``HOOK_LAZY_CONTEXT`` is set."""
+        if not hasattr(self, 'hook_manager'):
+            return
+        try:
+            hook_registry(self.hook_manager)
+        except TypeError as e:
+            self.mylogger.error(f"Async hooks and lazy hook contexts disabled: {e}")
+            return
+        self.hook_executor = AsyncHookExecutor.from_config(self, self.config)
+        # plugins registered their hooks during super().__init__(): converted here as well
+        self.hook_executor.install(self.hook_manager)
+        if self.config.get('HOOK_LAZY_CONTEXT', False):
+            # no context built for hooks without callbacks, values built on first read
+            self.hook_dispatcher = HookDispatcher(self, self.hook_manager)
+            self.hook_dispatcher.install()
+            self.jinja_env.globals['call_hook'] = self.hook_dispatcher.render
+
+    def _register_identity_cache(self):
+        """Reuse loaded users and policy results across requests for ``IDENTITY_CACHE_TTL`` seconds when
+        ``IDENTITY_CACHE_ENABLED`` is set; policy results are always memoized within a request."""
+        if not self.config.get('IDENTITY_CACHE_ENABLED', False) or not getattr(self, 'login_manager', None):
+            return
+        self.identity_cache = IdentityCache.from_config(self.config)
+        if self.identity_cache.init_app(self):
+            self.mylogger.info(f"Identity cache enabled, ttl {self.identity_cache.ttl}s")
+        else:
+            self.mylogger.warning("Identity cache: no user_loader registered, only policy results are cached")
+
+    def _register_db_tuning(self):
+        """Apply the ``pool`` / ``sqlite`` tables of the active ``[DATABASE.<env>]`` section to the engine."""
+        if not getattr(self, 'dbmgr', None):
+            return
+        tuning = DatabaseTuning.from_config(self.dbmgr.config)
+        if not tuning.enabled:
+            return
+        self.db_tuning = tuning
+        engine = self.db_tuning.install(self.dbmgr, self.mylogger)
+        self.mylogger.info(f"Database tuning applied to {engine.url.get_backend_name()} engine, "
+                           f"pool {type(engine.pool).__name__}")
+
+    def _register_log_queue(self, *loggers):
+        """Route the app, plugin and ``LOG_QUEUE_LOGGERS`` log handlers through a bounded queue and listener
+        thread when ``LOG_QUEUE_ENABLED`` is set."""
+        if not self.config.get('LOG_QUEUE_ENABLED', False):
+            return
+        self.queued_logging = QueuedLogging.from_config(self.config)
+        plugin_loggers = [plugin.mylogger for plugin in self.plugins.values() if hasattr(plugin, 'mylogger')]
+        self.queued_logging.install([self.logger, self.mylogger, *loggers, *plugin_loggers])
+        self.mylogger.info(f"Queued logging enabled, queue size {self.queued_logging.queue_size}")
+
+    def _register_config_snapshot(self):
+        """Take the initial config snapshot and start tracking the config/env file hashes."""
+        self._config_sources = ConfigSourceTracker(self._config_source_paths())
+        self.config_snapshot = self._build_config_snapshot(self._config_sources.digest)
+
+    def _config_source_paths(self) -> list[Path]:
+        paths = []
+        if self._configfile:
+            config_path = Path(self._configfile)
+            if not config_path.is_file() and (lookup := getattr(self._config, '_lookup_config', None)):
+                config_path = lookup(self._configfile)  # directory or .py file given, as Config resolves it
+            paths.append(config_path)
+        if isinstance(self._envfile, (str, Path)):
+            paths.append(Path(self._envfile))
+        return paths
+
+    def _build_config_snapshot(self, source_digest: str) -> ConfigSnapshot:
+        return ConfigSnapshot.build(source_digest, self._config.as_dict(), dict(self.config))
+
+    def reload_config(self, *args, force: bool = False, **kwargs) -> set[str]:
+        """Reload configuration if config.toml or the env file changed since it was last loaded.
+
+        Re-parsing (and ``{{ENV...}}`` placeholder resolution) is skipped when the file hashes are
+        unchanged, unless ``force``. Cached pages are dropped only when something changed.
+
+        Returns:
+            set[str]: names of the config sections that changed; empty when nothing was reloaded.
+        """
+        digest = self._config_sources.changed() if self.config_snapshot else None
+        if digest is None and not force and self.config_snapshot:
+            self.mylogger.debug("Config files unchanged, reload skipped")
+            return set()
+        if base_reload := getattr(super(), 'reload_config', None):
+            base_reload(*args, **kwargs)
+        previous = self.config_snapshot
+        self._config_sources = ConfigSourceTracker(self._config_source_paths())
+        self.config_snapshot = self._build_config_snapshot(self._config_sources.digest)
+        if previous is None:
+            changed = set(self.config_snapshot.section_digests)
+        else:
+            changed = self.config_snapshot.changed_sections(previous)
+            self.config_changes = self.config_snapshot.diff(previous)
+        if changed and self.response_cache:
+            self.response_cache.clear()
+        self.mylogger.info(f"Config reloaded, changed sections: {sorted(changed) or 'none'}")
+        return changed
+
+    def plugins_for_config_sections(self, sections: set[str]) -> list[str]:
+        """Names of loaded plugins whose config section (their class name) is in ``sections``."""
+        return [name for name, plugin in self.plugins.items() if type(plugin).__name__ in sections]
+
+    def _runtime_gauges(self) -> dict:
+        """Process-level gauges appended to the ``/metrics`` output, labelled by pid when workers are combined."""
+        gauges = {}
+        if self.response_cache:
+            for name, value in self.response_cache.stats().items():
+                gauges[f'funlab_response_cache_{name}'] = value
+        if self.error_aggregator:
+            for name, value in self.error_aggregator.stats().items():
+                gauges[f'funlab_errors_{name}'] = value
+        if self.queued_logging:
+            for name, value in self.queued_logging.stats().items():
+                gauges[f'funlab_log_queue_{name}'] = value
+        if self.admission:
+            for name, value in self.admission.stats().items():
+                gauges[f'funlab_admission_{name}'] = value
+        if self.static_files:
+            for name, value in self.static_files.stats().items():
+                gauges[f'funlab_static_cache_{name}'] = value
+        if self.hook_executor:
+            for name, value in self.hook_executor.stats().items():
+                gauges[f'funlab_hook_async_{name}'] = value
+        if self.hook_dispatcher:
+            for name, value in self.hook_dispatcher.stats().items():
+                gauges[f'funlab_hook_dispatch_{name}'] = value
+        if self.turbo:
+            for name, value in self.turbo.stats().items():
+                gauges[f'funlab_turbo_{name}'] = value
+        if self.identity_cache:
+            for name, value in self.identity_cache.stats().items():
+                gauges[f'funlab_identity_cache_{name}'] = value
+        if self.db_tuning:
+            for name, value in self.db_tuning.stats().items():
+                gauges[f'funlab_db_{name}'] = value
+        return gauges
+
     def _is_security_component_enabled(self, component_cls) -> bool:
         """Return whether a built-in component may activate in the current security mode."""
         security_mode = str(getattr(component_cls, 'security_mode', 'public') or 'public').lower()
@@ -136,17 +404,19 @@ class FunlabFlask(_FlaskBase):
                 return redirect(url_for(current_app.login_manager.login_view))
 
         @self.blueprint.route('/blank')
+        @cached_view()
         def blank():
-            return render_template('blank.html')
+            return render_page('blank.html')
 
         @self.blueprint.route('/home')
+        @cached_view()
         def home():
             if getattr(current_app, 'authorization_enabled', False) and not current_user.is_authenticated:
                 return current_app.login_manager.unauthorized()
             home_entry:str=None
             if home_entry:=self.config.get("HOME_ENTRY", None):
                 if home_entry.endswith(('.html', '.htm',)):
-                    return render_template(home_entry)
+                    return render_page(home_entry)
                 else:
                     try:
                         return redirect(url_for(home_entry))
@@ -156,26 +426,30 @@ class FunlabFlask(_FlaskBase):
                                 "HOME_ENTRY '%s' is unavailable in public mode; falling back to blank page.",
                                 home_entry,
                             )
-                            return render_template('blank.html')
+                            return render_page('blank.html')
                         raise
             else:
-                return render_template('blank.html')
+                return render_page('blank.html')
 
         @self.blueprint.route('/conf_data')
         @policy_required(is_admin)
+        @cached_view()
         def conf_data():
-            return render_template('conf-data.html', app_conf=self.config, all_conf=self._config.as_dict())
+            snapshot = self.config_snapshot
+            return render_template('conf-data.html', app_conf=snapshot.app_config, all_conf=snapshot.data,
+                                   config_changes=self.config_changes)
 
         @self.blueprint.route('/about')
+        @cached_view()
         def about():
             about_entry:str=None
             if about_entry:=self.config.get("ABOUT_ENTRY", None):
                 if about_entry.endswith(('.html', '.htm',)):
-                    return render_template(about_entry)
+                    return render_page(about_entry)
                 else:
                     return redirect(url_for(about_entry))
             else:
-                return render_template('about.html')
+                return render_page('about.html')
 
         @self.blueprint.route('/health')
         def health():
@@ -203,11 +477,21 @@ class FunlabFlask(_FlaskBase):
             has_prewarm_pending = any(v.get('status') == 'pending' for v in prewarm_status.values())
             system_ok = all_plugins_healthy and not has_prewarm_pending
 
-            return jsonify({
+            payload = {
                 'status': 'ok' if system_ok else 'degraded',
                 'plugins': plugin_health,
                 'prewarm': prewarm_status,
-            }), (200 if system_ok else 503)
+            }
+            if self.db_tuning:
+                payload['database'] = self.db_tuning.stats()
+            return jsonify(payload), (200 if system_ok else 503)
+
+        @self.blueprint.route('/metrics')
+        def metrics():
+            if not self.request_metrics:
+                abort(404)
+            return Response(self.request_metrics.render(self.plugins, extra=self._runtime_gauges()),
+                            content_type=METRICS_CONTENT_TYPE)
 
         # ------------------------------------------------------------------
         # Notification routes: dispatch through current_app.notification_provider
@@ -251,13 +535,20 @@ class FunlabFlask(_FlaskBase):
         self.notification_provider.register_routes(self.blueprint)
 
         # Error handlers and blueprint registration always run regardless of provider.
+        def render_error_page(template:str, msg:str):
+            if not self.response_cache:
+                return render_template(template, msg=msg)
+            # error pages do not depend on the path, so unknown URLs cannot flood the cache
+            key = self.response_cache.make_key(template, msg, path=False)
+            return self.response_cache.get_or_render(key, lambda: render_template(template, msg=msg))
+
         @self.errorhandler(403)
         def access_deny_error(error):
-            return render_template('error-403.html', msg=str(error)), 403
+            return render_error_page('error-403.html', str(error)), 403
 
         @self.errorhandler(404)
         def not_found_error(error):
-            return render_template('error-404.html', msg=str(error)), 404
+            return render_error_page('error-404.html', str(error)), 404
 
         @self.errorhandler(500)
         def internal_error(error):
@@ -267,10 +558,31 @@ class FunlabFlask(_FlaskBase):
         def handle_unexpected_error(error):
             if isinstance(error, HTTPException):
                 return error
-            trace_info = traceback.format_exception(error)
-            trace_info = ''.join(trace_info)
-            traceback.print_exception(error)
-            return render_template('error-500.html', msg=str(error), trace_info=trace_info), 500
+            if self.request_metrics:
+                self.request_metrics.record_exception(error)
+            if not self.error_aggregator:
+                trace_info = ''.join(traceback.format_exception(error))
+                traceback.print_exception(error)
+                return render_template('error-500.html', msg=str(error), trace_info=trace_info), 500
+            record, sample = self.error_aggregator.record(error)
+            msg = str(error)
+            if sample:
+                trace_info = ''.join(traceback.format_exception(error))
+                traceback.print_exception(error)
+                if record.window_count == self.error_aggregator.sample_limit:
+                    self.mylogger.warning(f"Error {record.id} ({record.exc_type} at {record.location}) repeated "
+                                          f"{record.window_count} times, further occurrences are only counted "
+                                          f"for {self.error_aggregator.window:.0f}s")
+                return render_template('error-500.html', msg=msg, trace_info=trace_info), 500
+            # storm: skip logging and source lookups; the stored frames (identical for the fingerprint, no
+            # request data) plus this occurrence's own exception line
+            trace_info = record.stack + ''.join(traceback.format_exception_only(error))
+            if not self.response_cache:
+                return render_template('error-500.html', msg=msg, trace_info=trace_info), 500
+            digest = hashlib.sha1(msg.encode('utf-8', 'replace')).hexdigest()
+            key = self.response_cache.make_key('error-500.html', record.id, digest, path=False)
+            return self.response_cache.get_or_render(
+                key, lambda: render_template('error-500.html', msg=msg, trace_info=trace_info)), 500
 
         # Need to call flask's register_blueprint for all route, after route defined
         self.register_blueprint(self.blueprint)
@@ -335,6 +647,9 @@ def start_server(app:Flask):
                 gunicorn_logger = logging.getLogger('gunicorn.error')
                 app.logger.handlers = gunicorn_logger.handlers
                 app.logger.setLevel(gunicorn_logger.level)
+                if queued_logging := getattr(app, 'queued_logging', None):
+                    app.logger.handlers = list(gunicorn_logger.handlers)  # attach() must not empty gunicorn's list
+                    queued_logging.attach(app.logger)
                 super().__init__()
 
             def load_config(self):
@@ -358,6 +673,8 @@ def start_server(app:Flask):
         handler = logging.FileHandler(log_file)
         handler.setLevel(logging.DEBUG)
         app.logger.addHandler(handler)
+        if queued_logging := getattr(app, 'queued_logging', None):
+            queued_logging.attach(app.logger)
         app.run(port=config['PORT'], use_reloader=False)
 
 def main(args=None):
@@ -0,0 +1,287 @@
+"""Trace which static assets are referenced and build a lean static tree from them.
+
+Usage::
+
+    python -m funlab.flaskr.asset_pruner --manifest assets.json
+    python -m funlab.flaskr.asset_pruner --out build/static --demo-out build/static-demo
+
+References are collected from templates, Python and JS sources of the app and the installed
+``funlab_plugin`` packages (``/static/...`` paths and ``url_for('...static', filename=...)``),
+then followed through CSS ``url()``/``@import`` and JS ``import`` statements inside the static
+tree. A reference built at render time (``/static/avatars/{{ user.avatar }}``) keeps its whole
+directory, as do libraries that load their own files at runtime (``whole_dirs``). One with no
+literal directory (``'/static/' + path``) cannot be traced: the unused files it may name are
+reported as possibly used and kept in ``--out``.
+"""
+from __future__ import annotations
+
+import argparse
+import fnmatch
+import importlib.util
+import json
+import os
+import posixpath
+import re
+import shutil
+import sys
+from dataclasses import dataclass, field
+from importlib.metadata import entry_points
+from pathlib import Path
+from typing import Iterable
+
+STATIC_ROOT = Path(__file__).parent / 'static'
+SOURCE_DIRS = (Path(__file__).parent,)
+SOURCE_SUFFIXES = ('.html', '.htm', '.jinja', '.j2', '.py', '.js', '.txt')
+TEXT_ASSET_SUFFIXES = ('.css', '.js', '.mjs', '.webmanifest', '.json', '.svg', '.html')
+# editors that fetch their plugins, themes, skins and languages relative to their own script
+DEFAULT_WHOLE_DIRS = ('dist/libs/tinymce', 'dist/libs/hugerte')
+# template showcases no route renders; what only they use goes to the demo assets
+DEFAULT_EXCLUDED_SOURCES = ('*_demo.html',)
+
+_STATIC_REF = re.compile(r"""(?<![\w./-])(?:\.{0,2}/)?static/([^"'()\s?#<>{}\\`]*)([?#][^"'()\s]*)?(\{[{%]|['"`]\s*\+|\$\{)?""")
+_URL_FOR_REF = re.compile(r"""url_for\(\s*['"][\w.]*static['"]\s*,\s*filename\s*=\s*['"]([^'"]+)['"]""")
+_CSS_REF = re.compile(r"""url\(\s*['"]?([^'")]+?)['"]?\s*\)|@import\s+['"]([^'"]+)['"]""")
+_JS_REF = re.compile(r"""(?:\bfrom\s*|\bimport\s*\(?\s*)['"](\.{1,2}/[^'"]+|/static/[^'"]+)['"]""")
+
+
+@dataclass
+class AssetManifest:
+    root: str
+    used: dict[str, int] = field(default_factory=dict)
+    unused: dict[str, int] = field(default_factory=dict)
+    missing: dict[str, list[str]] = field(default_factory=dict)
+    dynamic: list[str] = field(default_factory=list)
+    # literal start of references completed at runtime outside any directory -> where they are made
+    unresolved: dict[str, list[str]] = field(default_factory=dict)
+
+    @property
+    def possibly_used(self) -> dict[str, int]:
+        """Unused files an unresolved reference may name."""
+        stems = tuple(self.unresolved)
+        return {name: size for name, size in self.unused.items() if stems and name.startswith(stems)}
+
+    @property
+    def used_bytes(self) -> int:
+        return sum(self.used.values())
+
+    @property
+    def unused_bytes(self) -> int:
+        return sum(self.unused.values())
+
+    def to_dict(self) -> dict:
+        return {'root': self.root, 'used_bytes': self.used_bytes, 'unused_bytes': self.unused_bytes,
+                'dynamic': self.dynamic, 'missing': self.missing, 'unresolved': self.unresolved,
+                'possibly_used': dict(sorted(self.possibly_used.items())),
+                'used': dict(sorted(self.used.items())), 'unused': dict(sorted(self.unused.items()))}
+
+    def write(self, path: str | Path):
+        Path(path).write_text(json.dumps(self.to_dict(), indent=2), encoding='utf-8')
+
+
+class AssetTracer:
+    """Find the files under ``static_root`` reachable from ``sources``.
+
+    Args:
+        static_root: the static folder served at ``/static/``.
+        sources: directories (scanned recursively for ``SOURCE_SUFFIXES``) or files to start from.
+        whole_dirs: directories, relative to ``static_root``, kept entirely once any file in them is used.
+        keep: glob patterns, relative to ``static_root``, always kept.
+        exclude: file name glob patterns of sources not to scan.
+    """
+
+    def __init__(self, static_root: str | Path = STATIC_ROOT, sources: Iterable[str | Path] = SOURCE_DIRS,
+                 whole_dirs: Iterable[str] = DEFAULT_WHOLE_DIRS, keep: Iterable[str] = (),
+                 exclude: Iterable[str] = DEFAULT_EXCLUDED_SOURCES):
+        self.static_root = Path(static_root).resolve()
+        self.sources = [Path(source) for source in sources]
+        self.whole_dirs = tuple(d.strip('/') for d in whole_dirs)
+        self.keep = tuple(keep)
+        self.exclude = tuple(exclude)
+
+    def _source_files(self) -> Iterable[Path]:
+        for source in self.sources:
+            if source.is_file():
+                yield source
+                continue
+            for dirpath, dirnames, filenames in os.walk(source):
+                current = Path(dirpath).resolve()
+                if current == self.static_root or self.static_root in current.parents:
+                    dirnames.clear()  # static assets are traced from their references only
+                    continue
+                dirnames[:] = [d for d in dirnames if not d.startswith(('.', '__pycache__', '_users'))]
+                for filename in filenames:
+                    if (filename.endswith(SOURCE_SUFFIXES) and (current / filename).resolve() != Path(__file__).resolve()
+                            and not any(fnmatch.fnmatch(filename, pattern) for pattern in self.exclude)):
+                        yield current / filename
+
+    @staticmethod
+    def _read(path: Path) -> str:
+        try:
+            return path.read_text(encoding='utf-8', errors='ignore')
+        except OSError:
+            return ''
+
+    @staticmethod
+    def _static_refs(text: str) -> Iterable[tuple[str, bool]]:
+        """``(path relative to static root, is_prefix)`` for each ``static/...`` reference in ``text``.
+
+        For a reference completed at runtime, or ending with ``/``, the path is its literal start.
+        """
+        for match in _STATIC_REF.finditer(text):
+            path, _, dynamic = match.groups()
+            if dynamic or path.endswith('/'):
+                yield path, True
+            elif path:  # a bare '/static/' is a URL prefix constant, not a reference
+                yield path, False
+        for match in _URL_FOR_REF.finditer(text):
+            yield match.group(1), False
+
+    def _asset_refs(self, relative: str, text: str) -> Iterable[tuple[str, bool]]:
+        """References made by a static asset, resolved relative to its own location."""
+        base = posixpath.dirname(relative)
+        refs = [m.group(1) or m.group(2) for m in _CSS_REF.finditer(text)] if relative.endswith('.css') else []
+        if relative.endswith(('.js', '.mjs')):
+            refs += _JS_REF.findall(text)
+        for ref in refs:
+            ref = ref.strip().split('?')[0].split('#')[0]
+            if not ref or ref.startswith(('data:', 'http:', 'https:', '//', '#')):
+                continue
+            if ref.startswith('/static/'):
+                yield ref[len('/static/'):], False
+            elif not ref.startswith('/'):
+                yield posixpath.normpath(posixpath.join(base, ref)), False
+        yield from self._static_refs(text)
+
+    def _whole_dir(self, relative: str) -> str | None:
+        return next((d for d in self.whole_dirs if relative == d or relative.startswith(d + '/')), None)
+
+    def trace(self) -> AssetManifest:
+        available = {}
+        for dirpath, _, filenames in os.walk(self.static_root):
+            for filename in filenames:
+                path = Path(dirpath) / filename
+                available[path.relative_to(self.static_root).as_posix()] = path.stat().st_size
+
+        used: set[str] = set()
+        dynamic: set[str] = set()
+        missing: dict[str, set[str]] = {}
+        unresolved: dict[str, set[str]] = {}
+        queue: list[tuple[str, str]] = [(name, 'keep') for name in available
+                                        if any(fnmatch.fnmatch(name, pattern) for pattern in self.keep)]
+
+        def add_prefix(prefix: str, origin: str):
+            if prefix and prefix not in dynamic:
+                dynamic.add(prefix)
+                queue.extend((name, origin) for name in available if name.startswith(prefix + '/'))
+
+        def add_reference_prefix(literal: str, origin: str):
+            directory, _, stem = literal.rpartition('/')
+            if directory:
+                add_prefix(directory, origin)
+            else:
+                unresolved.setdefault(stem, set()).add(origin)
+
+        for source in self._source_files():
+            for ref, is_prefix in self._static_refs(self._read(source)):
+                if is_prefix:
+                    add_reference_prefix(ref, str(source))
+                else:
+                    queue.append((ref, str(source)))
+
+        while queue:
+            ref, origin = queue.pop()
+            ref = posixpath.normpath(ref).lstrip('/')
+            if ref in used or ref.startswith('..'):
+                continue
+            if ref not in available:
+                missing.setdefault(ref, set()).add(origin)
+                continue
+            used.add(ref)
+            if whole := self._whole_dir(ref):
+                add_prefix(whole, ref)
+            if ref.endswith(TEXT_ASSET_SUFFIXES):
+                for child, is_prefix in self._asset_refs(ref, self._read(self.static_root / ref)):
+                    if is_prefix:
+                        add_reference_prefix(child, ref)
+                    else:
+                        queue.append((child, ref))
+
+        return AssetManifest(root=str(self.static_root),
+                             used={name: available[name] for name in used},
+                             unused={name: size for name, size in available.items() if name not in used},
+                             missing={ref: sorted(where) for ref, where in sorted(missing.items())},
+                             dynamic=sorted(dynamic),
+                             unresolved={stem: sorted(where) for stem, where in sorted(unresolved.items())})
+
+
+def plugin_source_dirs(group: str = 'funlab_plugin') -> list[Path]:
+    """Package directories of the installed plugins, located without importing the plugins."""
+    dirs = []
+    for ep in entry_points(group=group):
+        package = ep.module.rpartition('.')[0] or ep.module
+        try:
+            spec = importlib.util.find_spec(package)
+        except (ImportError, ValueError):
+            continue
+        if spec and spec.submodule_search_locations:
+            dirs += [Path(location) for location in spec.submodule_search_locations]
+        elif spec and spec.origin:
+            dirs.append(Path(spec.origin))
+    return dirs
+
+
+def copy_assets(root: str | Path, names: Iterable[str], dest: str | Path) -> int:
+    """Copy ``names`` (relative to ``root``) into ``dest``, keeping their layout; return bytes copied."""
+    total = 0
+    for name in sorted(names):
+        target = Path(dest) / name
+        target.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copy2(Path(root) / name, target)
+        total += target.stat().st_size
+    return total
+
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(prog='python -m funlab.flaskr.asset_pruner',
+                                     description='Trace referenced static assets and build a lean static tree.')
+    parser.add_argument('--static', default=str(STATIC_ROOT), help='static folder to prune')
+    parser.add_argument('--source', action='append', default=[], help='extra template/source directory or file')
+    parser.add_argument('--no-plugins', action='store_true', help='do not scan installed funlab_plugin packages')
+    parser.add_argument('--keep', action='append', default=[], help='glob (relative to --static) always kept')
+    parser.add_argument('--whole-dir', action='append', default=None,
+                        help=f'directory kept entirely once used (default: {", ".join(DEFAULT_WHOLE_DIRS)})')
+    parser.add_argument('--exclude', action='append', default=None,
+                        help=f'source file name glob not scanned (default: {", ".join(DEFAULT_EXCLUDED_SOURCES)})')
+    parser.add_argument('--manifest', help='write the JSON manifest to this file')
+    parser.add_argument('--out', help='copy the used and possibly used assets into this directory')
+    parser.add_argument('--demo-out', help='copy the other (demo) assets into this directory')
+    args = parser.parse_args(argv)
+
+    sources = [*SOURCE_DIRS, *map(Path, args.source)]
+    if not args.no_plugins:
+        sources += plugin_source_dirs()
+    tracer = AssetTracer(args.static, sources, whole_dirs=args.whole_dir or DEFAULT_WHOLE_DIRS,
+                           keep=args.keep, exclude=DEFAULT_EXCLUDED_SOURCES if args.exclude is None else args.exclude)
+    manifest = tracer.trace()
+    if args.manifest:
+        manifest.write(args.manifest)
+    possibly_used = manifest.possibly_used
+    if args.out:
+        copy_assets(tracer.static_root, [*manifest.used, *possibly_used], args.out)
+    if args.demo_out:
+        copy_assets(tracer.static_root, [name for name in manifest.unused if name not in possibly_used], args.demo_out)
+
+    mb = 1024 * 1024
+    print(f"used:    {len(manifest.used):6d} files {manifest.used_bytes / mb:8.1f} MB")
+    print(f"unused:  {len(manifest.unused):6d} files {manifest.unused_bytes / mb:8.1f} MB")
+    print(f"possible:{len(possibly_used):6d} files {sum(possibly_used.values()) / mb:8.1f} MB")
+    print(f"dynamic: {', '.join(manifest.dynamic) or '-'}")
+    for stem, where in manifest.unresolved.items():
+        print(f"unresolved: /static/{stem}... (built in {', '.join(where)})", file=sys.stderr)
+    for ref, where in manifest.missing.items():
+        print(f"missing: {ref} (referenced in {', '.join(where)})", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
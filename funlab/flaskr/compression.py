@@ -0,0 +1,149 @@
+"""Gzip/brotli compression of dynamic HTML and JSON responses."""
+from __future__ import annotations
+
+import zlib
+from typing import TYPE_CHECKING, Iterable, Iterator
+
+from flask import request
+
+try:
+    import brotli  # optional: pip install brotli
+except ImportError:
+    brotli = None
+
+if TYPE_CHECKING:
+    from flask import Flask, Response
+
+DEFAULT_MIMETYPES = (
+    'text/html', 'text/css', 'text/plain', 'text/xml', 'text/javascript',
+    'application/json', 'application/javascript', 'application/xml', 'image/svg+xml',
+    'text/vnd.turbo-stream.html',
+)
+
+
+class _GzipEncoder:
+    def __init__(self, level: int):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # wbits 31 = gzip container
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush(zlib.Z_FINISH)
+
+
+class _BrotliEncoder:
+    def __init__(self, quality: int):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush()
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+class ResponseCompressor:
+    """Compress eligible responses in an ``after_request`` handler.
+
+    A response is compressed when the client accepts one of ``algorithms``, its mimetype is in
+    ``mimetypes``, it is not already encoded, not a ``send_file`` passthrough (static files) and,
+    unless streamed, at least ``min_size`` bytes. Streamed responses (``stream_template``) are
+    compressed incrementally with sync flushes so chunks keep reaching the client as they render.
+    """
+
+    def __init__(self, min_size: int = 500, level: int = 6, brotli_quality: int = 4,
+                 mimetypes: Iterable[str] = DEFAULT_MIMETYPES, algorithms: Iterable[str] = ('br', 'gzip'),
+                 stream: bool = True):
+        self.min_size = min_size
+        self.level = level
+        self.brotli_quality = brotli_quality
+        self.mimetypes = frozenset(mimetypes)
+        self.algorithms = tuple(algo for algo in algorithms if algo != 'br' or brotli is not None)
+        self.stream = stream
+
+    @classmethod
+    def from_config(cls, config) -> ResponseCompressor:
+        return cls(min_size=int(config.get('COMPRESS_MIN_SIZE', 500)),
+                   level=int(config.get('COMPRESS_LEVEL', 6)),
+                   brotli_quality=int(config.get('COMPRESS_BR_QUALITY', 4)),
+                   mimetypes=config.get('COMPRESS_MIMETYPES', DEFAULT_MIMETYPES),
+                   algorithms=config.get('COMPRESS_ALGORITHMS', ('br', 'gzip')),
+                   stream=bool(config.get('COMPRESS_STREAMS', True)))
+
+    def init_app(self, app: Flask):
+        # index 0 runs last among after_request handlers, after hooks may have changed the body
+        app.after_request_funcs.setdefault(None, []).insert(0, self.compress_response)
+
+    def _encoder(self, algorithm: str):
+        if algorithm == 'br':
+            return _BrotliEncoder(self.brotli_quality)
+        return _GzipEncoder(self.level)
+
+    def _choose_algorithm(self) -> str | None:
+        accepted = request.accept_encodings
+        for algorithm in self.algorithms:
+            if accepted.quality(algorithm) > 0:
+                return algorithm
+        return None
+
+    def _is_eligible(self, response: Response) -> bool:
+        if response.direct_passthrough or response.status_code < 200 or response.status_code in (204, 206, 304):
+            return False
+        if 'Content-Encoding' in response.headers or response.mimetype not in self.mimetypes:
+            return False
+        if 'no-transform' in response.headers.get('Cache-Control', ''):
+            return False
+        length = response.content_length
+        return length is None or length >= self.min_size
+
+    def compress_response(self, response: Response) -> Response:
+        if request.method == 'HEAD' or not self._is_eligible(response):
+            return response
+        response.vary.add('Accept-Encoding')
+        if not (algorithm := self._choose_algorithm()):
+            return response
+
+        if response.is_sequence:
+            data = response.get_data()
+            if len(data) < self.min_size:
+                return response
+            encoder = self._encoder(algorithm)
+            response.set_data(encoder.compress(data) + encoder.finish())
+        elif self.stream:
+            response.response = self._compress_stream(response.response, self._encoder(algorithm))
+            response.headers.pop('Content-Length', None)
+        else:
+            return response
+
+        response.headers['Content-Encoding'] = algorithm
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)  # body bytes differ from the identity representation
+        return response
+
+    def _compress_stream(self, chunks: Iterable, encoder) -> Iterator[bytes]:
+        # Sync-flush once at least min_size bytes are pending: template streams yield many tiny
+        # chunks and flushing each of them would make the output larger than the input.
+        pending = 0
+        try:
+            for chunk in chunks:
+                if isinstance(chunk, str):
+                    chunk = chunk.encode('utf-8')
+                data = encoder.compress(chunk)
+                pending += len(chunk)
+                if pending >= self.min_size:
+                    data += encoder.flush()
+                    pending = 0
+                if data:
+                    yield data
+            yield encoder.finish()
+        finally:
+            if close := getattr(chunks, 'close', None):
+                close()
@@ -0,0 +1,132 @@
+"""Immutable, redacted configuration snapshots with change detection between reloads."""
+from __future__ import annotations
+
+import hashlib
+import re
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from types import MappingProxyType
+from typing import Any, Iterable, Mapping
+
+REDACTED = '******'
+_SECRET_KEY_RE = re.compile(r'SECRET|PASSW|TOKEN|(?:^|_)KEY$|CREDENTIAL', re.IGNORECASE)
+_URL_PASSWORD_RE = re.compile(r'(?P<prefix>[a-z][a-z0-9+.\-]*://[^:/@\s]+:)(?P<password>[^@\s]+)(?=@)', re.IGNORECASE)
+
+
+def redact(value: Any, key: str = '') -> Any:
+    """Return ``value`` with secrets masked: values of secret-like keys and passwords in URLs."""
+    if isinstance(value, Mapping):
+        return {k: redact(v, str(k)) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [redact(v, key) for v in value]
+    if key and _SECRET_KEY_RE.search(key) and value not in (None, '', False):
+        return REDACTED
+    if isinstance(value, str):
+        return _URL_PASSWORD_RE.sub(rf'\g<prefix>{REDACTED}', value)
+    return value
+
+
+def freeze(value: Any) -> Any:
+    """Deep read-only copy: mappings become ``MappingProxyType``, lists and sets tuples/frozensets."""
+    if isinstance(value, Mapping):
+        return MappingProxyType({k: freeze(v) for k, v in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(v) for v in value)
+    if isinstance(value, (set, frozenset)):
+        return frozenset(freeze(v) for v in value)
+    return value
+
+
+def _digest(value: Any) -> str:
+    return hashlib.sha256(repr(_canonical(value)).encode('utf-8')).hexdigest()
+
+
+def _canonical(value: Any) -> Any:
+    if isinstance(value, Mapping):
+        return tuple(sorted((str(k), _canonical(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_canonical(v) for v in value)
+    return value
+
+
+def diff_config(old: Mapping, new: Mapping, prefix: str = '') -> dict[str, list]:
+    """Structural diff of two nested mappings as dotted key paths.
+
+    Returns ``{'added': [...], 'removed': [...], 'changed': [...]}``; lists and scalars are
+    compared as whole values.
+    """
+    result = {'added': [], 'removed': [], 'changed': []}
+    for key in old.keys() | new.keys():
+        path = f'{prefix}{key}'
+        if key not in new:
+            result['removed'].append(path)
+        elif key not in old:
+            result['added'].append(path)
+        elif isinstance(old[key], Mapping) and isinstance(new[key], Mapping):
+            for kind, paths in diff_config(old[key], new[key], f'{path}.').items():
+                result[kind].extend(paths)
+        elif _canonical(old[key]) != _canonical(new[key]):
+            result['changed'].append(path)
+    for paths in result.values():
+        paths.sort()
+    return result
+
+
+@dataclass(frozen=True)
+class ConfigSnapshot:
+    """Point-in-time view of the loaded configuration.
+
+    ``data`` (all sections) and ``app_config`` (Flask config) are redacted and read-only, safe to
+    render. ``section_digests`` hash each raw, unredacted section so secret changes are detected too.
+    """
+    source_digest: str
+    data: Mapping
+    app_config: Mapping
+    section_digests: Mapping
+    raw: Mapping = field(repr=False, compare=False)
+    created_at: float = field(default_factory=time.time)
+
+    @classmethod
+    def build(cls, source_digest: str, all_config: Mapping, app_config: Mapping) -> ConfigSnapshot:
+        return cls(source_digest=source_digest,
+                   data=freeze(redact(all_config)),
+                   app_config=freeze(redact(app_config)),
+                   section_digests=MappingProxyType({str(name): _digest(section)
+                                                     for name, section in all_config.items()}),
+                   raw=freeze(all_config))
+
+    def changed_sections(self, other: ConfigSnapshot) -> set[str]:
+        """Names of top-level sections that differ between ``other`` and this snapshot."""
+        names = self.section_digests.keys() | other.section_digests.keys()
+        return {name for name in names if self.section_digests.get(name) != other.section_digests.get(name)}
+
+    def diff(self, other: ConfigSnapshot) -> dict[str, list]:
+        """Key paths added, removed or changed from ``other`` to this snapshot (secrets included)."""
+        return diff_config(other.raw, self.raw)
+
+
+class ConfigSourceTracker:
+    """Detect changes of the config/env files by content hash, so unchanged files are not re-parsed."""
+
+    def __init__(self, paths: Iterable[str | Path | None]):
+        self.paths = tuple(Path(path) for path in paths if path)
+        self.digest = self.fingerprint()
+
+    def fingerprint(self) -> str:
+        sha = hashlib.sha256()
+        for path in self.paths:
+            sha.update(str(path).encode('utf-8'))
+            try:
+                sha.update(path.read_bytes())
+            except OSError:
+                sha.update(b'<missing>')
+        return sha.hexdigest()
+
+    def changed(self) -> str | None:
+        """Return the new hash when any source file changed since :attr:`digest`, else None.
+
+        The caller stores it in :attr:`digest` once the new configuration has been applied.
+        """
+        digest = self.fingerprint()
+        return None if digest == self.digest else digest
@@ -0,0 +1,187 @@
+"""Config-driven SQLAlchemy pool settings, SQLite pragmas and connection checkout timing."""
+from __future__ import annotations
+
+import importlib
+import logging
+import threading
+import time
+from functools import wraps
+from typing import TYPE_CHECKING
+
+import sqlalchemy as sa
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.pool import QueuePool
+
+if TYPE_CHECKING:
+    from funlab.core.dbmgr import DbMgr
+    from funlab.flaskr.app import FunlabFlask
+
+# [DATABASE.<env>].pool keys -> create_engine() arguments
+POOL_OPTIONS = {'size': 'pool_size', 'max_overflow': 'max_overflow', 'timeout': 'pool_timeout',
+                'recycle': 'pool_recycle', 'pre_ping': 'pool_pre_ping'}
+SQLITE_PRAGMAS = ('journal_mode', 'synchronous', 'busy_timeout', 'mmap_size', 'cache_size', 'foreign_keys')
+
+
+def _section(config, name: str) -> dict:
+    value = config.get(name, None) if config is not None else None
+    if value is None:
+        return {}
+    return dict(value.as_dict() if hasattr(value, 'as_dict') else value)
+
+
+def _is_memory_sqlite(url) -> bool:
+    url = make_url(url)
+    return url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:')
+
+
+def _evaluate(value):
+    """Value of a DbMgr engine argument: ``'@expression'`` strings are evaluated, importing the
+    modules they name (``'@sqlite3.PARSE_DECLTYPES | sqlite3.PARSE_COLNAMES'``)."""
+    if not isinstance(value, str):
+        return value
+    value = str(value)  # tomlkit strings
+    if not value.startswith('@'):
+        return value
+    namespace = {}
+    while True:
+        try:
+            return eval(value[1:], namespace)  # config is trusted, as in DbMgr
+        except NameError as error:
+            if not error.name or error.name in namespace:
+                raise
+            namespace[error.name] = importlib.import_module(error.name)
+
+
+class DatabaseTuning:
+    """Apply the ``pool`` and ``sqlite`` tables of the ``[DATABASE.<env>]`` config section to the app's engine.
+
+    Pool options are only applied to engines using a ``QueuePool`` (server databases and file-backed
+    SQLite); in-memory SQLite keeps its single shared connection. SQLite pragmas run on every new
+    connection. Checkouts (waiting for a pooled connection, or opening one) are timed; ``stats()``
+    reports them with the pool state for ``/health`` and ``/metrics``.
+    """
+
+    def __init__(self, pool: dict = None, sqlite: dict = None, slow_checkout_ms: float = 100):
+        unknown = set(pool or ()) - POOL_OPTIONS.keys() | set(sqlite or ()) - set(SQLITE_PRAGMAS)
+        if unknown:
+            raise ValueError(f"Unknown database tuning option(s): {', '.join(sorted(unknown))}")
+        self.pool = dict(pool or {})
+        self.sqlite = dict(sqlite or {})
+        self.slow_checkout_ms = slow_checkout_ms
+        self.engine: Engine = None
+        self.pool_applied = False
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.slow_checkouts = 0
+        self.checkout_errors = 0
+        self.checkout_ms_total = 0.0
+        self.checkout_ms_max = 0.0
+
+    @classmethod
+    def from_config(cls, db_config) -> DatabaseTuning:
+        return cls(pool=_section(db_config, 'pool'), sqlite=_section(db_config, 'sqlite'),
+                   slow_checkout_ms=float(db_config.get('slow_checkout_ms', 100)))
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.pool or self.sqlite)
+
+    def engine_options(self, url) -> dict:
+        """``create_engine()`` pool arguments applicable to ``url``."""
+        if not self.pool or _is_memory_sqlite(url):
+            return {}
+        return {POOL_OPTIONS[key]: value for key, value in self.pool.items()}
+
+    def init_app(self, app: FunlabFlask):
+        self.install(app.dbmgr, app.mylogger)
+
+    def install(self, dbmgr: DbMgr, logger: logging.Logger = None) -> Engine:
+        """Tune the engine of ``dbmgr``, creating it with DbMgr's arguments plus the pool options when they apply."""
+        url = dbmgr.get_db_url()
+        if options := self.engine_options(url):
+            try:
+                kwargs = self._engine_kwargs(dbmgr)
+            except Exception as error:
+                (logger or logging.getLogger(__name__)).warning(
+                    f"Database pool options not applied, keeping DbMgr's engine: cannot evaluate its "
+                    f"engine arguments ({type(error).__name__}: {error})")
+            else:
+                self._replace_engine(dbmgr, sa.create_engine(url, future=True, **kwargs, **options))
+                self.pool_applied = True
+        engine = dbmgr.get_db_engine()
+        if self.sqlite and engine.dialect.name == 'sqlite':
+            sa.event.listen(engine, 'connect', self._apply_pragmas)
+            if not _is_memory_sqlite(engine.url):
+                engine.dispose()  # connections opened before the listener get the pragmas on reconnect
+        self._time_checkouts(engine)
+        self.engine = engine
+        return engine
+
+    @staticmethod
+    def _replace_engine(dbmgr: DbMgr, engine: Engine):
+        """Make ``engine`` the engine of ``dbmgr``, which has no setter for it.
+
+        DbMgr binds a session factory per thread, created under its lock from ``get_db_engine()``;
+        swapping the engine and dropping those factories under the same lock leaves no thread with a
+        factory, or a new session, on the old pool. Sessions already open finish on it.
+        """
+        with dbmgr._DbMgr__lock:
+            replaced, dbmgr._db_engines = dbmgr._db_engines, engine
+            for session_factory in dbmgr._thread_safe_session_factories.values():
+                session_factory.remove()
+            dbmgr._thread_safe_session_factories.clear()
+        if replaced is not None:
+            replaced.dispose()
+
+    @staticmethod
+    def _engine_kwargs(dbmgr: DbMgr) -> dict:
+        """The ``kwargs`` and ``connect_args`` DbMgr creates its engine with, evaluated the same way."""
+        kwargs = {key: _evaluate(value) for key, value in _section(dbmgr.config, 'kwargs').items()}
+        if connect_args := {key: _evaluate(value) for key, value in _section(dbmgr.config, 'connect_args').items()}:
+            kwargs['connect_args'] = connect_args
+        return kwargs
+
+    def _apply_pragmas(self, dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name in SQLITE_PRAGMAS:
+                if name in self.sqlite:
+                    cursor.execute(f"PRAGMA {name} = {self.sqlite[name]}")
+        finally:
+            cursor.close()
+
+    def _time_checkouts(self, engine: Engine):
+        raw_connection = engine.raw_connection
+
+        @wraps(raw_connection)
+        def timed_raw_connection(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return raw_connection(*args, **kwargs)
+            except Exception:
+                with self._lock:
+                    self.checkout_errors += 1
+                raise
+            finally:
+                self._record((time.perf_counter() - start) * 1000)
+        # Connection() checks out through Engine.raw_connection(), which survives pool re-creation on dispose()
+        engine.raw_connection = timed_raw_connection
+
+    def _record(self, elapsed_ms: float):
+        with self._lock:
+            self.checkouts += 1
+            self.checkout_ms_total += elapsed_ms
+            self.checkout_ms_max = max(self.checkout_ms_max, elapsed_ms)
+            if elapsed_ms >= self.slow_checkout_ms:
+                self.slow_checkouts += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = {'pool_applied': int(self.pool_applied), 'checkouts': self.checkouts,
+                     'slow_checkouts': self.slow_checkouts, 'checkout_errors': self.checkout_errors,
+                     'checkout_ms_avg': round(self.checkout_ms_total / self.checkouts, 3) if self.checkouts else 0.0,
+                     'checkout_ms_max': round(self.checkout_ms_max, 3)}
+        if self.engine is not None and isinstance(pool := self.engine.pool, QueuePool):
+            stats.update(pool_size=pool.size(), pool_checked_out=pool.checkedout(),
+                         pool_overflow=pool.overflow(), pool_idle=pool.checkedin())
+        return stats
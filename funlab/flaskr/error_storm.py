@@ -0,0 +1,113 @@
+"""Fingerprinted exception aggregation that limits full traceback handling during error storms."""
+from __future__ import annotations
+
+import hashlib
+import threading
+import time
+import traceback
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, field
+
+
+@dataclass
+class ErrorRecord:
+    id: str
+    exc_type: str
+    location: str
+    message: str
+    count: int = 0
+    window_count: int = 0
+    suppressed: int = 0
+    window_start: float = field(default_factory=time.monotonic)
+    first_seen: float = field(default_factory=time.time)
+    last_seen: float = field(default_factory=time.time)
+    trace: str = None  # first sample's full traceback, for the admin error list
+    stack: str = None  # formatted frames only: same for every occurrence, no exception message
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+def error_fingerprint(error: BaseException) -> tuple:
+    """Exception type plus (filename, function, line) of every traceback frame.
+
+    Only code objects and line numbers are read: no source lines are loaded and nothing is
+    formatted, so fingerprinting stays cheap however often the same failure repeats.
+    """
+    frames = []
+    tb = error.__traceback__
+    while tb is not None:
+        code = tb.tb_frame.f_code
+        frames.append((code.co_filename, code.co_name, tb.tb_lineno))
+        tb = tb.tb_next
+    return (type(error).__module__, type(error).__qualname__, tuple(frames))
+
+
+class ErrorAggregator:
+    """Count exceptions per fingerprint and decide which occurrences get full handling.
+
+    The first ``sample_limit`` occurrences of a fingerprint in each ``window`` seconds are
+    reported as samples (format, log, render with the trace); the rest only increment
+    counters. At most ``max_fingerprints`` are kept, least recently seen evicted first.
+    The first sample of a fingerprint formats ``trace`` and ``stack`` before the record is
+    shared, so later occurrences always see them.
+    """
+
+    def __init__(self, sample_limit: int = 5, window: float = 60.0, max_fingerprints: int = 500):
+        self.sample_limit = sample_limit
+        self.window = window
+        self.max_fingerprints = max_fingerprints
+        self._records: OrderedDict[tuple, ErrorRecord] = OrderedDict()
+        self._lock = threading.Lock()
+        self.total = 0
+        self.suppressed = 0
+
+    @classmethod
+    def from_config(cls, config) -> ErrorAggregator:
+        return cls(sample_limit=int(config.get('ERROR_SAMPLE_LIMIT', 5)),
+                   window=float(config.get('ERROR_SAMPLE_WINDOW', 60)),
+                   max_fingerprints=int(config.get('ERROR_MAX_FINGERPRINTS', 500)))
+
+    def record(self, error: BaseException) -> tuple[ErrorRecord, bool]:
+        """Count ``error``; return its record and whether this occurrence should be fully handled."""
+        key = error_fingerprint(error)
+        now = time.monotonic()
+        with self._lock:
+            self.total += 1
+            if (record := self._records.get(key)) is None:
+                module, qualname, frames = key
+                filename, func, lineno = frames[-1] if frames else ('?', '?', 0)
+                record = ErrorRecord(id=hashlib.sha1(repr(key).encode('utf-8')).hexdigest()[:12],
+                                     exc_type=qualname if module == 'builtins' else f'{module}.{qualname}',
+                                     location=f'{filename}:{lineno} in {func}', message=str(error))
+                self._records[key] = record
+                while len(self._records) > self.max_fingerprints:
+                    self._records.popitem(last=False)
+            else:
+                self._records.move_to_end(key)
+                if now - record.window_start >= self.window:
+                    record.window_start, record.window_count = now, 0
+            record.count += 1
+            record.window_count += 1
+            record.last_seen = time.time()
+            sample = record.window_count <= self.sample_limit
+            if not sample:
+                record.suppressed += 1
+                self.suppressed += 1
+            elif record.stack is None:
+                record.stack = ''.join(traceback.format_tb(error.__traceback__))
+                record.trace = ''.join(traceback.format_exception(error))
+        return record, sample
+
+    def top(self, limit: int = 20) -> list[dict]:
+        with self._lock:
+            records = sorted(self._records.values(), key=lambda r: r.count, reverse=True)[:limit]
+            return [record.to_dict() for record in records]
+
+    def clear(self):
+        with self._lock:
+            self._records.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'fingerprints': len(self._records), 'total': self.total, 'suppressed': self.suppressed}
@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 from funlab.core.plugin import Plugin
+from funlab.flaskr.hooks import async_hook, hook_needs
 
 
 class HookTestView(Plugin):
@@ -143,19 +144,26 @@ class HookTestView(Plugin):
             plugin_name=self.name,
         )
 
+    @hook_needs()
     def _render_head_marker(self, context) -> str:
         return "<!-- hook_test:head -->"
 
+    @hook_needs()
     def _render_content_marker(self, context) -> str:
         return "<div style=\"display:none\" data-hook-test=\"content\"></div>"
 
+    @hook_needs()
     def _render_body_marker(self, context) -> str:
         return "<!-- hook_test:body -->"
 
+    @hook_needs('request')
+    @async_hook
     def _log_before_request(self, context) -> None:
         """Log before request hook execution."""
         self.mylogger.debug(f"Hook: controller_before_request - {context.get('request')}")
 
+    @hook_needs('response')
+    @async_hook
     def _log_after_request(self, context) -> None:
         """Log after request hook execution."""
         response = context.get('response')
@@ -166,12 +174,14 @@ class HookTestView(Plugin):
         error = context.get('error')
         self.mylogger.warning(f"Hook: controller_error_handler - {error}")
 
+    @async_hook
     def _log_plugin_lifecycle(self, context) -> None:
         """Log plugin lifecycle hook execution."""
         plugin = context.get('plugin')
         plugin_name = context.get('plugin_name', 'Unknown')
         self.mylogger.info(f"Hook: Plugin lifecycle event - {plugin_name} ({plugin.__class__.__name__ if plugin else 'N/A'})")
 
+    @async_hook
     def _log_plugin_init(self, context) -> None:
         """Log plugin initialization hook execution."""
         plugin = context.get('plugin')
@@ -179,16 +189,19 @@ class HookTestView(Plugin):
         event_type = context.get('event_type', 'init')
         self.mylogger.info(f"Hook: Plugin {event_type} - {plugin_name} ({plugin.__class__.__name__ if plugin else 'N/A'})")
 
+    @hook_needs('model', 'model_class', 'is_new')
+    @async_hook
     def _log_model_operation(self, context) -> None:
-        """Log model operation hook execution."""
+        """Log model operation hook execution; ``model`` arrives as a ModelSnapshot of its columns."""
         model = context.get('model')
         model_class = context.get('model_class')
         is_new = context.get('is_new', False)
         self.mylogger.debug(
             f"Hook: Model operation - {model_class.__name__ if model_class else 'Unknown'} "
-            f"({'create' if is_new else 'update'})"
+            f"{model.identity if model else ''} ({'create' if is_new else 'update'})"
         )
 
+    @async_hook
     def _log_task_execution(self, context) -> None:
         """Log task execution hook."""
         task = context.get('task')
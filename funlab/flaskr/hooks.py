@@ -0,0 +1,444 @@
+"""Hook dispatch helpers: lazily built contexts and fire-and-forget callbacks on a bounded worker pool."""
+from __future__ import annotations
+
+import atexit
+import os
+import queue
+import threading
+import time
+from collections.abc import Mapping, MutableMapping
+from dataclasses import dataclass
+from functools import wraps
+from typing import TYPE_CHECKING, Callable, Iterable
+
+from flask import Request, Response, current_app, has_request_context, request
+from flask_login import current_user
+from markupsafe import Markup
+from werkzeug.local import LocalProxy
+
+if TYPE_CHECKING:
+    from funlab.flaskr.app import FunlabFlask
+
+SYNC, ASYNC = 'sync', 'async'
+DROP, BLOCK, CALLER_RUNS = 'drop', 'block', 'caller_runs'
+# view hooks return the HTML they insert, they can never run detached
+SYNC_ONLY_PREFIXES = ('view_',)
+
+
+def async_hook(func: Callable) -> Callable:
+    """Mark a hook callback to run on the background hook executor.
+
+    Works with plain ``register_hook`` calls, including those made while plugins are constructed,
+    before the executor is installed. The callback gets a snapshot of the context (see
+    :func:`snapshot_context`) and its return value is discarded.
+    """
+    func.__hook_mode__ = ASYNC
+    return func
+
+
+def hook_needs(*keys: str) -> Callable:
+    """Declare the context keys a hook callback reads.
+
+    When every callback of a hook declares its keys, :class:`HookDispatcher` only offers those,
+    and async callbacks snapshot only their own keys instead of the whole context.
+    """
+    def decorator(func: Callable) -> Callable:
+        func.__hook_needs__ = frozenset(keys)
+        return func
+    return decorator
+
+
+def _request():
+    return request._get_current_object() if has_request_context() else None
+
+
+def _current_user():
+    # resolving current_user loads the user (a database query) on first use in a request
+    return current_user._get_current_object() if has_request_context() else None
+
+
+def _app():
+    return current_app._get_current_object()
+
+
+DEFAULT_CONTEXT_FACTORIES = {'request': _request, 'current_user': _current_user, 'app': _app}
+
+
+class LazyHookContext(MutableMapping):
+    """Hook context whose values are computed by ``factories`` on first access, then memoized.
+
+    Values written by callbacks (``context['start_time'] = ...``) replace the factory, so later
+    callbacks of the same dispatch see them. ``in`` and iteration do not compute anything.
+    """
+
+    __slots__ = ('_values', '_factories')
+
+    def __init__(self, values: Mapping = None, factories: Mapping[str, Callable] = None):
+        self._values = dict(values or {})
+        self._factories = {key: factory for key, factory in (factories or {}).items() if key not in self._values}
+
+    def __getitem__(self, key):
+        if key in self._values:
+            return self._values[key]
+        value = self._values[key] = self._factories[key]()
+        del self._factories[key]
+        return value
+
+    def __setitem__(self, key, value):
+        self._factories.pop(key, None)
+        self._values[key] = value
+
+    def __delitem__(self, key):
+        if self._factories.pop(key, None) is None:
+            del self._values[key]
+
+    def __contains__(self, key) -> bool:
+        return key in self._values or key in self._factories
+
+    def __iter__(self):
+        return iter([*self._values, *self._factories])
+
+    def __len__(self) -> int:
+        return len(self._values) + len(self._factories)
+
+    @property
+    def computed(self) -> frozenset:
+        """Keys whose values exist, given or already computed."""
+        return frozenset(self._values)
+
+    def __repr__(self) -> str:
+        return f'<LazyHookContext computed={sorted(self._values)} lazy={sorted(self._factories)}>'
+
+
+def hook_registry(hook_manager) -> Mapping[str, list[dict]]:
+    """The ``{hook_name: [{'callback', 'priority', 'plugin_name'}, ...]}`` registry of ``hook_manager``.
+
+    Taken from its ``get_hooks()`` when it has one; the funlab-libs ``HookManager`` only keeps it in
+    ``_hooks``, which is read here and nowhere else. Raises ``TypeError`` when neither is a mapping,
+    so a changed ``HookManager`` fails at startup instead of silently dispatching to nothing.
+    """
+    get_hooks = getattr(hook_manager, 'get_hooks', None)
+    registry = get_hooks() if callable(get_hooks) else getattr(hook_manager, '_hooks', None)
+    if not isinstance(registry, Mapping):
+        raise TypeError(f"{type(hook_manager).__name__} exposes no hook registry (get_hooks() or _hooks)")
+    return registry
+
+
+class HookDispatcher:
+    """Call the callbacks registered in ``hook_manager`` with a :class:`LazyHookContext`.
+
+    Used for the ``call_hook`` template global and, after :meth:`install`, for ``call_hook`` made
+    from Python: a hook without callbacks returns at once, and ``request``, ``current_user`` and
+    ``app`` are only built when a callback reads them. Callbacks run by priority, their failures
+    are logged and do not stop the others.
+    """
+
+    def __init__(self, app: FunlabFlask, hook_manager, factories: Mapping[str, Callable] = None):
+        hook_registry(hook_manager)  # fail now rather than on the first dispatch
+        self.app = app
+        self.hook_manager = hook_manager
+        self.factories = dict(DEFAULT_CONTEXT_FACTORIES if factories is None else factories)
+        self.calls = 0
+        self.empty_calls = 0
+        self.values_built = 0
+
+    def callbacks(self, hook_name: str) -> list[dict]:
+        entries = hook_registry(self.hook_manager).get(hook_name) or ()
+        return sorted(entries, key=lambda entry: entry.get('priority', 100))
+
+    def context(self, entries: list[dict], values: Mapping) -> LazyHookContext:
+        factories = self.factories
+        needs = [getattr(entry['callback'], '__hook_needs__', None) for entry in entries]
+        if needs and all(keys is not None for keys in needs):
+            wanted = frozenset().union(*needs)
+            factories = {key: factory for key, factory in factories.items() if key in wanted}
+        return LazyHookContext(values, factories)
+
+    def call(self, hook_name: str, **values) -> list:
+        """Run the callbacks of ``hook_name``; return their results in call order."""
+        if not (entries := self.callbacks(hook_name)):
+            self.empty_calls += 1
+            return []
+        self.calls += 1
+        context = self.context(entries, values)
+        results = []
+        for entry in entries:
+            try:
+                results.append(entry['callback'](context))
+            except Exception as e:
+                self.app.mylogger.error(f"Hook {hook_name} of {entry.get('plugin_name')} failed: {e}")
+        self.values_built += len(context.computed) - len(values)
+        return results
+
+    def install(self, hook_manager=None):
+        """Route ``hook_manager.call_hook`` (controller, model, task hooks) through :meth:`call`."""
+        hook_manager = hook_manager or self.hook_manager
+
+        @wraps(hook_manager.call_hook)
+        def call_hook(hook_name, **values):
+            return self.call(hook_name, **values)
+        hook_manager.call_hook = call_hook
+
+    def render(self, hook_name: str, **values) -> Markup:
+        """HTML returned by the callbacks of a view hook, concatenated."""
+        return Markup(''.join(str(result) for result in self.call(hook_name, **values) if result))
+
+    def stats(self) -> dict:
+        return {'calls': self.calls, 'empty_calls': self.empty_calls, 'values_built': self.values_built}
+
+
+@dataclass(frozen=True)
+class RequestSnapshot:
+    method: str
+    path: str
+    url: str
+    endpoint: str | None
+    blueprint: str | None
+    remote_addr: str | None
+    user_agent: str
+
+    def __str__(self) -> str:
+        return f'<Request {self.method} {self.url}>'
+
+
+@dataclass(frozen=True)
+class ResponseSnapshot:
+    status_code: int
+    status: str
+    mimetype: str | None
+    content_length: int | None
+
+    def __str__(self) -> str:
+        return f'<Response {self.status}>'
+
+
+@dataclass(frozen=True)
+class UserSnapshot:
+    """Plain copy of the fields hooks read from ``current_user``; never an ORM instance."""
+    id: object
+    username: str | None
+    role: str | None
+    is_authenticated: bool
+    is_active: bool
+    is_anonymous: bool
+
+    def get_id(self) -> str | None:
+        return None if self.id is None else str(self.id)
+
+    def __str__(self) -> str:
+        return self.username or '<anonymous>'
+
+
+@dataclass(frozen=True, eq=False)
+class ModelSnapshot:
+    """Plain copy of the loaded column values of an SQLAlchemy model instance; never the instance.
+
+    Columns read as attributes (``snapshot.id``); unloaded columns and relationships are left out,
+    so taking the snapshot never queries the database.
+    """
+    model_class: type
+    identity: tuple | None
+    values: dict
+
+    def __getattr__(self, name):
+        try:
+            return self.__dict__['values'][name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def __str__(self) -> str:
+        return f'<{self.model_class.__name__} {self.identity or "(pending)"}>'
+
+
+def _snapshot_model(model) -> ModelSnapshot:
+    from sqlalchemy import inspect
+    state = inspect(model)
+    loaded = state.dict
+    return ModelSnapshot(type(model), state.identity,
+                         {attr.key: loaded[attr.key] for attr in state.mapper.column_attrs if attr.key in loaded})
+
+
+def _snapshot_user(user) -> UserSnapshot:
+    authenticated = bool(getattr(user, 'is_authenticated', False))
+    return UserSnapshot(getattr(user, 'id', None) if authenticated else None,
+                        getattr(user, 'username', None) if authenticated else None,
+                        getattr(user, 'role', None) if authenticated else None,
+                        authenticated, bool(getattr(user, 'is_active', False)),
+                        bool(getattr(user, 'is_anonymous', not authenticated)))
+
+
+def _snapshot_value(value):
+    if isinstance(value, LocalProxy):
+        try:
+            value = value._get_current_object()
+        except RuntimeError:  # proxy used outside of its context
+            return None
+    if isinstance(value, Request):
+        return RequestSnapshot(value.method, value.path, value.url, value.endpoint, value.blueprint,
+                               value.remote_addr, value.user_agent.string)
+    if isinstance(value, Response):
+        return ResponseSnapshot(value.status_code, value.status, value.mimetype,
+                                None if value.is_streamed else value.content_length)
+    if hasattr(value, 'get_id') and hasattr(value, 'is_authenticated'):  # flask-login user
+        return _snapshot_user(value)
+    if hasattr(value, '_sa_instance_state'):  # bound to the request's DB session
+        return _snapshot_model(value)
+    return value
+
+
+def snapshot_context(context: Mapping, keys: Iterable[str] = None) -> dict:
+    """Copy of a hook context (only ``keys``, if given) that stays valid after the request ends.
+
+    ``request``, ``response``, user objects and SQLAlchemy model instances become :class:`RequestSnapshot` /
+    :class:`ResponseSnapshot` / :class:`UserSnapshot` / :class:`ModelSnapshot`; other context-local proxies
+    are resolved to the object they point at.
+    """
+    keys = context.keys() if keys is None else [key for key in keys if key in context]
+    return {key: _snapshot_value(context[key]) for key in keys}
+
+
+class AsyncHookExecutor:
+    """Run hook callbacks on ``workers`` daemon threads fed by a queue of ``queue_size`` items.
+
+    When the queue is full, ``policy`` decides: ``drop`` discards the call (counted),
+    ``block`` waits up to ``block_timeout`` seconds for room then drops, ``caller_runs`` runs
+    the callback on the calling thread. Callback exceptions are logged and counted, never
+    propagated. Workers start lazily and again after ``fork`` (gunicorn preload). With
+    ``enabled`` off every callback runs synchronously, as registered.
+    """
+
+    def __init__(self, app: FunlabFlask, workers: int = 2, queue_size: int = 1000, policy: str = DROP,
+                 block_timeout: float = 0.1, callbacks: Iterable[str] = (), enabled: bool = True):
+        if policy not in (DROP, BLOCK, CALLER_RUNS):
+            raise ValueError(f"Unknown hook queue policy: {policy}")
+        self.app = app
+        self.enabled = enabled
+        self.workers = workers
+        self.queue_size = queue_size
+        self.policy = policy
+        self.block_timeout = block_timeout
+        # 'hook_name' or 'hook_name:PluginName' entries forced to async
+        self.callbacks = frozenset(callbacks)
+        self.queue: queue.Queue = None
+        self._threads: list[threading.Thread] = []
+        self._pid = None
+        self._start_lock = threading.Lock()
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.dropped = 0
+        self.caller_runs = 0
+        self.max_wait = 0.0
+
+    @classmethod
+    def from_config(cls, app: FunlabFlask, config) -> AsyncHookExecutor:
+        return cls(app, workers=int(config.get('HOOK_ASYNC_WORKERS', 2)),
+                   queue_size=int(config.get('HOOK_ASYNC_QUEUE_SIZE', 1000)),
+                   policy=config.get('HOOK_ASYNC_POLICY', DROP),
+                   block_timeout=float(config.get('HOOK_ASYNC_BLOCK_TIMEOUT', 0.1)),
+                   callbacks=config.get('HOOK_ASYNC_CALLBACKS', ()),
+                   enabled=bool(config.get('HOOK_ASYNC_ENABLED', True)))
+
+    # registration
+    def install(self, hook_manager):
+        """Convert already registered async callbacks and accept ``mode=`` in ``register_hook``."""
+        for hook_name, entries in hook_registry(hook_manager).items():
+            for entry in entries:
+                if isinstance(entry, dict) and callable(entry.get('callback')):
+                    entry['callback'] = self.prepare(hook_name, entry['callback'], entry.get('plugin_name'))
+        original = hook_manager.register_hook
+
+        @wraps(original)
+        def register_hook(hook_name, callback, *args, mode: str = None, **kwargs):
+            plugin_name = kwargs.get('plugin_name', args[1] if len(args) > 1 else None)
+            return original(hook_name, self.prepare(hook_name, callback, plugin_name, mode), *args, **kwargs)
+        hook_manager.register_hook = register_hook
+        atexit.register(self.stop)
+
+    def prepare(self, hook_name: str, callback: Callable, plugin_name: str = None, mode: str = None) -> Callable:
+        """Return ``callback`` itself, or a dispatching wrapper when it is meant to run async."""
+        if getattr(callback, '__hook_mode__', None) == 'dispatch':
+            return callback
+        if mode is None:
+            configured = hook_name in self.callbacks or f'{hook_name}:{plugin_name}' in self.callbacks
+            mode = ASYNC if configured else getattr(callback, '__hook_mode__', SYNC)
+        if mode != ASYNC or not self.enabled:
+            return callback
+        if hook_name.startswith(SYNC_ONLY_PREFIXES):
+            self.app.mylogger.warning(f"Hook {hook_name} of {plugin_name} renders output, it stays synchronous")
+            return callback
+
+        @wraps(callback)
+        def dispatch(context=None, *args, **kwargs):
+            self.submit(hook_name, plugin_name, callback, context, args, kwargs)
+        dispatch.__hook_mode__ = 'dispatch'
+        return dispatch
+
+    # execution
+    def submit(self, hook_name: str, plugin_name: str | None, callback: Callable, context, args=(), kwargs=None):
+        if self._pid != os.getpid():
+            self._start()
+        if isinstance(context, Mapping):
+            context = snapshot_context(context, getattr(callback, '__hook_needs__', None))
+        item = (hook_name, plugin_name, callback, context, args, kwargs or {}, time.monotonic())
+        try:
+            if self.policy == BLOCK:
+                self.queue.put(item, timeout=self.block_timeout)
+            else:
+                self.queue.put_nowait(item)
+        except queue.Full:
+            if self.policy == CALLER_RUNS:
+                self.caller_runs += 1
+                self._run(item)
+            else:
+                self.dropped += 1
+            return
+        self.submitted += 1
+
+    def _start(self):
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            # a forked child inherits the queue object but none of the worker threads
+            self.queue = queue.Queue(self.queue_size)
+            self._threads = [threading.Thread(target=self._work, name=f'funlab-hook-{idx}', daemon=True)
+                             for idx in range(self.workers)]
+            for thread in self._threads:
+                thread.start()
+            self._pid = os.getpid()
+
+    def _work(self):
+        while (item := self.queue.get()) is not None:
+            self.max_wait = max(self.max_wait, time.monotonic() - item[-1])
+            self._run(item)
+
+    def _run(self, item: tuple):
+        hook_name, plugin_name, callback, context, args, kwargs, _ = item
+        try:
+            with self.app.app_context():
+                callback(context, *args, **kwargs)
+        except Exception as e:
+            self.failed += 1
+            self.app.mylogger.warning(f"Async hook {hook_name} of {plugin_name} failed: {e}")
+        else:
+            self.completed += 1
+
+    def stop(self, timeout: float = 5):
+        """Let the workers finish queued callbacks, waiting up to ``timeout`` seconds in total."""
+        if self._pid != os.getpid():
+            return
+        deadline = time.monotonic() + timeout
+        for _ in self._threads:
+            try:
+                self.queue.put(None, timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Full:
+                break
+        for thread in self._threads:
+            thread.join(timeout=max(0.0, deadline - time.monotonic()))
+        self._pid = None
+
+    def stats(self) -> dict:
+        return {'submitted': self.submitted, 'completed': self.completed, 'failed': self.failed,
+                'dropped': self.dropped, 'caller_runs': self.caller_runs,
+                'depth': self.queue.qsize() if self.queue else 0, 'capacity': self.queue_size,
+                'max_wait': round(self.max_wait, 6)}
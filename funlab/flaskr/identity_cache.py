@@ -0,0 +1,269 @@
+"""Cache loaded users and policy results within a request and, briefly, across requests."""
+from __future__ import annotations
+
+import copy
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from typing import TYPE_CHECKING, Callable, Hashable
+
+from flask import current_app, g, has_request_context, session
+from flask_login import current_user, user_loaded_from_cookie, user_logged_in, user_logged_out
+from funlab.core import policy as _policy
+
+if TYPE_CHECKING:
+    from funlab.flaskr.app import FunlabFlask
+
+SESSION_VERSION_KEY = '_identity_version'
+# DB session info key: user ids whose rows were flushed and not yet committed, None for all users
+_CHANGED_KEY = 'funlab_identity_changed'
+_MISSING = object()
+
+
+def _user_key(user) -> str | None:
+    if user is None or not getattr(user, 'is_authenticated', False):
+        return None
+    return str(user.get_id())
+
+
+def _detached_unsafe(user) -> bool:
+    """Whether ``user`` is an SQLAlchemy instance with attributes still to be lazy-loaded.
+
+    Such an instance breaks once the request's DB session is removed, so it is not shared.
+    """
+    if not hasattr(user, '_sa_instance_state'):
+        return False
+    try:
+        from sqlalchemy import inspect
+    except ImportError:
+        return False
+    return bool(inspect(user).unloaded)
+
+
+def _detached_copy(user, session=None):
+    """A copy of ``user`` that shares no state with it, so cached users are never used by two requests.
+
+    SQLAlchemy instances are merged without loading: into ``session`` (the request's), or into a
+    throwaway session leaving the copy detached. Other users are shallow-copied.
+    """
+    if not hasattr(user, '_sa_instance_state'):
+        return copy.copy(user)
+    if session is not None:
+        return session.merge(user, load=False)
+    from sqlalchemy.orm import Session
+    with Session() as scratch:
+        return scratch.merge(user, load=False)  # detached when the scratch session closes
+
+
+class IdentityCache:
+    """Size-bounded, short-TTL cache of users returned by the ``user_loader`` and of policy results.
+
+    Entries are keyed by user id and a per-login session version, set when the user logs in or is
+    restored from the remember-me cookie, so a new login never sees an earlier session's entries;
+    requests of a session without a version are not cached across requests.
+
+    Logout and :meth:`invalidate` drop a user's entries in this process. When users are SQLAlchemy
+    models, committing a change to a cached user's row, or adding, changing or deleting an instance
+    of a model it has a relationship to (roles), invalidates the user, or everyone for related rows,
+    in the process that commits it. Other worker processes keep their entries until ``ttl`` expires,
+    which bounds how stale a role change can be there.
+    """
+
+    def __init__(self, ttl: float = 30, max_entries: int = 2048):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: OrderedDict[tuple, tuple[float, object]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._warned_uncacheable = False
+        self.caches_users = False
+        self._user_models: frozenset[type] = frozenset()
+        self._related_models: frozenset[type] = frozenset()
+        self.hits = 0
+        self.misses = 0
+        self.uncacheable = 0
+
+    @classmethod
+    def from_config(cls, config) -> IdentityCache:
+        return cls(ttl=float(config.get('IDENTITY_CACHE_TTL', 30)),
+                   max_entries=int(config.get('IDENTITY_CACHE_MAX_ENTRIES', 2048)))
+
+    def init_app(self, app: FunlabFlask) -> bool:
+        """Returns whether the app's ``user_loader`` was wrapped; without one only policy results are cached."""
+        self.app = app
+        if (manager := getattr(app, 'login_manager', None)) and manager._user_callback:
+            manager._user_callback = self._cached_loader(manager._user_callback)
+            self.caches_users = True
+        user_logged_in.connect(self._logged_in, app)
+        user_loaded_from_cookie.connect(self._loaded_from_cookie, app)
+        user_logged_out.connect(self._logged_out, app)
+        return self.caches_users
+
+    @staticmethod
+    def _version() -> str | None:
+        return session.get(SESSION_VERSION_KEY) if has_request_context() else None
+
+    def _logged_in(self, sender, user, **extra):
+        session[SESSION_VERSION_KEY] = secrets.token_hex(8)
+        self.invalidate(_user_key(user))
+
+    def _loaded_from_cookie(self, sender, user, **extra):
+        # a remember-me restore starts a session without user_logged_in
+        session[SESSION_VERSION_KEY] = secrets.token_hex(8)
+
+    def _logged_out(self, sender, user, **extra):
+        session.pop(SESSION_VERSION_KEY, None)
+        self.invalidate(_user_key(user))
+
+    # storage
+    def get(self, key: tuple):
+        with self._lock:
+            if (entry := self._entries.get(key)) is None:
+                self.misses += 1
+                return _MISSING
+            if entry[0] < time.monotonic():
+                del self._entries[key]
+                self.misses += 1
+                return _MISSING
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: tuple, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: str = None):
+        """Drop the entries of ``user_id``, or all entries."""
+        with self._lock:
+            if user_id is None:
+                self._entries.clear()
+            else:
+                for key in [key for key in self._entries if key[1] == str(user_id)]:
+                    del self._entries[key]
+
+    # invalidation on commit
+    def _watch_model(self, model: type):
+        """Invalidate on commits touching ``model`` (a cached user's class) or the models it relates to."""
+        from sqlalchemy import event, inspect
+        from sqlalchemy.orm import Session
+        with self._lock:
+            if model in self._user_models:
+                return
+            first = not self._user_models
+            self._user_models |= {model}
+            self._related_models |= {rel.mapper.class_ for rel in inspect(model).relationships} - self._user_models
+        if first:
+            event.listen(Session, 'after_flush', self._after_flush)
+            event.listen(Session, 'after_commit', self._after_commit)
+            event.listen(Session, 'after_rollback', self._after_rollback)
+
+    def unwatch(self):
+        """Stop listening to SQLAlchemy session events (the listeners are process-wide)."""
+        from sqlalchemy import event
+        from sqlalchemy.orm import Session
+        if self._user_models:
+            event.remove(Session, 'after_flush', self._after_flush)
+            event.remove(Session, 'after_commit', self._after_commit)
+            event.remove(Session, 'after_rollback', self._after_rollback)
+            self._user_models = self._related_models = frozenset()
+
+    def _after_flush(self, db_session, flush_context):
+        # new/dirty/deleted still hold what was just flushed
+        changed = set()
+        for instance in (*db_session.new, *db_session.dirty, *db_session.deleted):
+            if type(instance) in self._related_models:
+                changed.add(None)
+            elif type(instance) in self._user_models and instance not in db_session.new:
+                changed.add(_user_key(instance))
+        if changed:
+            db_session.info.setdefault(_CHANGED_KEY, set()).update(changed)
+
+    def _after_commit(self, db_session):
+        changed = db_session.info.pop(_CHANGED_KEY, ())
+        if None in changed:
+            self.invalidate()
+        else:
+            for user_id in changed:
+                self.invalidate(user_id)
+
+    def _after_rollback(self, db_session):
+        db_session.info.pop(_CHANGED_KEY, None)
+
+    # users
+    def _request_session(self):
+        return dbmgr.get_db_session() if (dbmgr := getattr(self.app, 'dbmgr', None)) else None
+
+    def _cached_loader(self, loader: Callable) -> Callable:
+        """Wrap ``loader`` to keep a private copy of each loaded user; every hit gets its own copy of it."""
+        @wraps(loader)
+        def load_user(user_id, *args, **kwargs):
+            if (version := self._version()) is None:
+                return loader(user_id, *args, **kwargs)
+            key = ('user', str(user_id), version)
+            if (cached := self.get(key)) is not _MISSING:
+                session = self._request_session() if hasattr(cached, '_sa_instance_state') else None
+                return _detached_copy(cached, session)
+            user = loader(user_id, *args, **kwargs)
+            if user is not None:
+                if _detached_unsafe(user):
+                    self.uncacheable += 1
+                    if not self._warned_uncacheable:
+                        self._warned_uncacheable = True
+                        self.app.mylogger.warning("Loaded users have lazy-loaded attributes and are not cached "
+                                                  "across requests; load them eagerly in the user_loader")
+                else:
+                    if hasattr(user, '_sa_instance_state'):
+                        self._watch_model(type(user))
+                    self.set(key, _detached_copy(user))
+            return user
+        return load_user
+
+    # policies
+    def policy_result(self, policy_key: Hashable, user, evaluate: Callable[[], bool]) -> bool:
+        if (user_id := _user_key(user)) is None or (version := self._version()) is None:
+            return evaluate()
+        key = ('policy', user_id, version, policy_key)
+        if (result := self.get(key)) is _MISSING:
+            result = evaluate()
+            self.set(key, result)
+        return result
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'entries': len(self._entries), 'max_entries': self.max_entries, 'hits': self.hits,
+                    'misses': self.misses, 'uncacheable': self.uncacheable}
+
+
+def cached_policy(policy: Callable) -> Callable:
+    """Memoize ``policy(user)`` for the current request, and across requests with the app's identity cache.
+
+    Calls with extra arguments, or outside a request, are evaluated every time.
+    """
+    policy_key = f'{policy.__module__}.{policy.__qualname__}'
+
+    @wraps(policy)
+    def wrapper(user=None, *args, **kwargs):
+        if args or kwargs or not has_request_context():
+            return policy(user, *args, **kwargs)
+        if user is None:
+            user = current_user
+        user = getattr(user, '_get_current_object', lambda: user)()
+        results = g.setdefault('_policy_results', {})
+        memo_key = (policy_key, _user_key(user))
+        if (result := results.get(memo_key, _MISSING)) is _MISSING:
+            if (cache := getattr(current_app, 'identity_cache', None)) is not None:
+                result = cache.policy_result(policy_key, user, lambda: policy(user))
+            else:
+                result = policy(user)
+            results[memo_key] = result
+        return result
+    return wrapper
+
+
+is_admin = cached_policy(_policy.is_admin)
+is_authenticated_user = cached_policy(_policy.is_authenticated_user)
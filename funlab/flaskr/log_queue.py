@@ -0,0 +1,158 @@
+"""Non-blocking logging: handlers run on a listener thread fed by a bounded queue."""
+from __future__ import annotations
+
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+import weakref
+from typing import Iterable
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """Queue records together with the handlers they are destined for; drop them when the queue is full."""
+
+    def __init__(self, owner: QueuedLogging, targets: Iterable[logging.Handler]):
+        super().__init__(owner.queue)
+        self.owner = owner
+        self.targets: tuple[logging.Handler, ...] = ()
+        self.add_targets(targets)
+
+    def add_targets(self, targets: Iterable[logging.Handler]):
+        self.targets += tuple(targets)
+        self.setLevel(min((handler.level for handler in self.targets), default=logging.NOTSET))
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait((self.targets, record))
+        except queue.Full:
+            self.owner.dropped += 1
+        else:
+            self.owner.enqueued += 1
+
+
+class QueuedLogging:
+    """Move the handlers of the app, plugin and configured library loggers behind one bounded queue.
+
+    Request threads only format the message and ``put_nowait`` it; a daemon listener thread
+    drains up to ``batch_size`` records at a time and hands each handler its share of the batch
+    under one acquisition of the handler's lock, then flushes it once. Records arriving while the
+    queue is full are counted in :attr:`dropped` rather than blocking the caller.
+    """
+
+    def __init__(self, queue_size: int = 10000, batch_size: int = 256, logger_names: Iterable[str] = ()):
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.logger_names = tuple(logger_names)
+        self.queue: queue.Queue = queue.Queue(queue_size)
+        self.enqueued = 0
+        self.dropped = 0
+        self._queue_handlers: weakref.WeakSet[DroppingQueueHandler] = weakref.WeakSet()
+        self._thread: threading.Thread = None
+        self._stopping = False
+
+    @classmethod
+    def from_config(cls, config) -> QueuedLogging:
+        return cls(queue_size=int(config.get('LOG_QUEUE_SIZE', 10000)),
+                   batch_size=int(config.get('LOG_QUEUE_BATCH', 256)),
+                   logger_names=config.get('LOG_QUEUE_LOGGERS', ()))
+
+    def install(self, loggers: Iterable[logging.Logger] = ()):
+        """Queue the given loggers and those named in :attr:`logger_names`; other loggers are left alone.
+
+        Loggers created later are not queued unless passed to :meth:`attach`.
+        """
+        for logger in (*loggers, *(logging.getLogger(name) for name in self.logger_names)):
+            self.attach(logger)
+        self.start()
+        atexit.register(self.stop)
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def attach(self, logger: logging.Logger) -> logging.Logger:
+        """Move ``logger``'s own handlers behind the queue; safe to call again after adding handlers."""
+        direct = [handler for handler in logger.handlers if not isinstance(handler, DroppingQueueHandler)]
+        if not direct:
+            return logger
+        queued = next((handler for handler in logger.handlers if isinstance(handler, DroppingQueueHandler)), None)
+        for handler in direct:
+            logger.removeHandler(handler)
+        if queued:
+            queued.add_targets(direct)
+        else:
+            queued = DroppingQueueHandler(self, direct)
+            self._queue_handlers.add(queued)
+            logger.addHandler(queued)
+        return logger
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name='funlab-log-queue', daemon=True)
+        self._thread.start()
+
+    def _after_fork(self):
+        # the listener thread does not survive fork (gunicorn workers): new queue, new thread
+        self.queue = queue.Queue(self.queue_size)
+        for handler in list(self._queue_handlers):
+            handler.queue = self.queue
+        self._thread = None
+        self.start()
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            batch = [item]
+            while len(batch) < self.batch_size:
+                try:
+                    item = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._emit(batch)
+                    return
+                batch.append(item)
+            self._emit(batch)
+
+    @staticmethod
+    def _emit(batch: list):
+        by_handler: dict[logging.Handler, list[logging.LogRecord]] = {}
+        for targets, record in batch:
+            for handler in targets:
+                if record.levelno >= handler.level:
+                    by_handler.setdefault(handler, []).append(record)
+        for handler, records in by_handler.items():
+            handler.acquire()
+            try:
+                for record in records:
+                    if handler.filter(record):
+                        try:
+                            handler.emit(record)
+                        except Exception:
+                            handler.handleError(record)
+            finally:
+                handler.release()
+            try:
+                handler.flush()
+            except Exception:
+                pass
+
+    def stop(self):
+        """Drain queued records and stop the listener (registered with ``atexit``)."""
+        if self._stopping or not (self._thread and self._thread.is_alive()):
+            return
+        self._stopping = True
+        try:
+            self.queue.put(None, timeout=1)
+        except queue.Full:
+            return
+        self._thread.join(timeout=5)
+
+    def stats(self) -> dict:
+        return {'enqueued': self.enqueued, 'dropped': self.dropped, 'depth': self.queue.qsize(),
+                'capacity': self.queue_size}
@@ -0,0 +1,291 @@
+"""Prometheus-compatible request metrics for FunlabFlask."""
+from __future__ import annotations
+
+import bisect
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from flask import g, request
+
+if TYPE_CHECKING:
+    from flask import Flask
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+DEFAULT_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DEFAULT_SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+_FILE_PREFIX = 'funlab_metrics_'
+
+
+class _Shard:
+    """Metric storage written by a single OS thread only, so recording needs no lock."""
+    __slots__ = ('requests', 'latency', 'sizes', 'exceptions', 'in_flight')
+
+    def __init__(self):
+        self.requests: dict[tuple, int] = {}
+        self.latency: dict[tuple, list] = {}
+        self.sizes: dict[tuple, list] = {}
+        self.exceptions: dict[tuple, int] = {}
+        self.in_flight = 0
+
+
+def _new_snapshot() -> dict:
+    return {'requests': {}, 'latency': {}, 'sizes': {}, 'exceptions': {}, 'in_flight': 0}
+
+
+def _merge_counts(target: dict, source: dict):
+    for key, value in source.items():
+        target[key] = target.get(key, 0) + value
+
+
+def _merge_histograms(target: dict, source: dict):
+    for key, values in source.items():
+        if (current := target.get(key)) is None:
+            target[key] = list(values)
+        else:
+            for idx, value in enumerate(values):
+                current[idx] += value
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(**labels) -> str:
+    return ','.join(f'{name}="{_escape(value)}"' for name, value in labels.items())
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True
+    return True
+
+
+class RequestMetrics:
+    """Request count/latency/size/in-flight/exception metrics rendered in Prometheus text format.
+
+    Every OS thread records into its own shard, so the per-request cost is a dict lookup and a
+    few integer increments. Shards are merged only when metrics are scraped or flushed.
+
+    When ``multiproc_dir`` is set, each worker process periodically writes its merged snapshot to
+    ``funlab_metrics_<pid>.json`` in that directory and :meth:`render` combines the files of all
+    workers, so a scrape hitting any gunicorn worker reports the whole server. Plugin metrics and
+    ``extra`` gauges only describe the scraped process; they are then labelled with its ``pid``.
+    """
+
+    def __init__(self, multiproc_dir: str = None, flush_interval: float = 5.0,
+                 latency_buckets: tuple = DEFAULT_LATENCY_BUCKETS, size_buckets: tuple = DEFAULT_SIZE_BUCKETS):
+        self.latency_buckets = tuple(sorted(latency_buckets))
+        self.size_buckets = tuple(sorted(size_buckets))
+        self.multiproc_dir = Path(multiproc_dir) if multiproc_dir else None
+        if self.multiproc_dir:
+            self.multiproc_dir.mkdir(parents=True, exist_ok=True)
+        self.flush_interval = flush_interval
+        self._shards: dict[int, _Shard] = {}
+        self._shards_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._next_flush = time.monotonic() + flush_interval
+
+    @classmethod
+    def from_config(cls, config) -> RequestMetrics:
+        return cls(multiproc_dir=config.get('METRICS_MULTIPROC_DIR', None) or os.environ.get('PROMETHEUS_MULTIPROC_DIR'),
+                   flush_interval=float(config.get('METRICS_FLUSH_INTERVAL', 5.0)),
+                   latency_buckets=tuple(config.get('METRICS_LATENCY_BUCKETS', DEFAULT_LATENCY_BUCKETS)))
+
+    def init_app(self, app: Flask):
+        """Install request hooks so timing wraps every other before/after request handler."""
+        app.before_request_funcs.setdefault(None, []).insert(0, self._before_request)
+        # after_request handlers run in reverse registration order, so index 0 runs last.
+        app.after_request_funcs.setdefault(None, []).insert(0, self._after_request)
+        app.teardown_request(self._teardown_request)
+
+    # ------------------------------------------------------------------
+    # Recording
+    # ------------------------------------------------------------------
+    def _shard(self) -> _Shard:
+        # Keyed by native thread id rather than threading.local: under gevent every greenlet would
+        # otherwise get its own shard, while greenlets sharing an OS thread never interleave here.
+        ident = threading.get_native_id()
+        if (shard := self._shards.get(ident)) is None:
+            with self._shards_lock:
+                shard = self._shards.setdefault(ident, _Shard())
+        return shard
+
+    def _observe(self, histograms: dict, key: tuple, buckets: tuple, value: float):
+        if (values := histograms.get(key)) is None:
+            values = histograms[key] = [0] * (len(buckets) + 3)  # buckets, +Inf, sum, count
+        values[bisect.bisect_left(buckets, value)] += 1
+        values[-2] += value
+        values[-1] += 1
+
+    def observe_request(self, blueprint: str, endpoint: str, method: str, status: int,
+                        duration: float, size: int = None):
+        shard = self._shard()
+        key = (blueprint or '', endpoint or '<unmatched>')
+        req_key = key + (method, str(status))
+        shard.requests[req_key] = shard.requests.get(req_key, 0) + 1
+        self._observe(shard.latency, key, self.latency_buckets, duration)
+        if size is not None:
+            self._observe(shard.sizes, key, self.size_buckets, size)
+        if self.multiproc_dir and time.monotonic() >= self._next_flush:
+            self.flush()
+
+    def record_exception(self, error: BaseException):
+        shard = self._shard()
+        key = (type(error).__name__,)
+        shard.exceptions[key] = shard.exceptions.get(key, 0) + 1
+
+    def _before_request(self):
+        self._shard().in_flight += 1
+        g._metrics_start = time.perf_counter()
+
+    def _after_request(self, response):
+        if (start := g.pop('_metrics_start', None)) is not None:
+            size = response.content_length
+            if size is None and response.is_sequence:
+                size = response.calculate_content_length()  # never on streams: it would buffer them
+            self.observe_request(request.blueprint, request.endpoint, request.method, response.status_code,
+                                 time.perf_counter() - start, size)
+            self._shard().in_flight -= 1
+        return response
+
+    def _teardown_request(self, exc=None):
+        # Only reached with a pending start when after_request never ran (unhandled failure).
+        if (start := g.pop('_metrics_start', None)) is not None:
+            self.observe_request(request.blueprint, request.endpoint, request.method, 500,
+                                 time.perf_counter() - start)
+            self._shard().in_flight -= 1
+
+    # ------------------------------------------------------------------
+    # Aggregation
+    # ------------------------------------------------------------------
+    def snapshot(self) -> dict:
+        """Merge all thread shards of this process into one snapshot."""
+        merged = _new_snapshot()
+        with self._shards_lock:
+            shards = list(self._shards.values())
+        for shard in shards:
+            # dict.copy() is atomic under the GIL, so owners may keep writing meanwhile.
+            _merge_counts(merged['requests'], shard.requests.copy())
+            _merge_histograms(merged['latency'], shard.latency.copy())
+            _merge_histograms(merged['sizes'], shard.sizes.copy())
+            _merge_counts(merged['exceptions'], shard.exceptions.copy())
+            merged['in_flight'] += shard.in_flight
+        return merged
+
+    def flush(self):
+        """Write this worker's snapshot to the multiprocess directory."""
+        if not self.multiproc_dir or not self._flush_lock.acquire(blocking=False):
+            return
+        try:
+            self._next_flush = time.monotonic() + self.flush_interval
+            snapshot = self.snapshot()
+            data = {name: [list(key) + [value] for key, value in values.items()]
+                    for name, values in snapshot.items() if name != 'in_flight'}
+            data['in_flight'] = snapshot['in_flight']
+            target = self.multiproc_dir.joinpath(f'{_FILE_PREFIX}{os.getpid()}.json')
+            tmp = target.with_suffix('.tmp')
+            tmp.write_text(json.dumps(data), encoding='utf-8')
+            os.replace(tmp, target)
+        finally:
+            self._flush_lock.release()
+
+    def collect(self) -> dict:
+        """Return the combined snapshot of every worker, or of this process only."""
+        if not self.multiproc_dir:
+            return self.snapshot()
+        self.flush()
+        merged = _new_snapshot()
+        for path in self.multiproc_dir.glob(f'{_FILE_PREFIX}*.json'):
+            try:
+                data = json.loads(path.read_text(encoding='utf-8'))
+                pid = int(path.stem.removeprefix(_FILE_PREFIX))
+            except (OSError, ValueError):
+                continue  # file being replaced or foreign
+            _merge_counts(merged['requests'], {tuple(row[:-1]): row[-1] for row in data.get('requests', [])})
+            _merge_histograms(merged['latency'], {tuple(row[:-1]): row[-1] for row in data.get('latency', [])})
+            _merge_histograms(merged['sizes'], {tuple(row[:-1]): row[-1] for row in data.get('sizes', [])})
+            _merge_counts(merged['exceptions'], {tuple(row[:-1]): row[-1] for row in data.get('exceptions', [])})
+            # counters of exited workers are kept, but their in-flight gauge is meaningless
+            if _pid_alive(pid):
+                merged['in_flight'] += data.get('in_flight', 0)
+        return merged
+
+    # ------------------------------------------------------------------
+    # Exposition
+    # ------------------------------------------------------------------
+    def _render_histogram(self, lines: list, name: str, help_text: str, buckets: tuple, histograms: dict):
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} histogram')
+        for (blueprint, endpoint), values in sorted(histograms.items()):
+            labels = _labels(blueprint=blueprint, endpoint=endpoint)
+            cumulative = 0
+            for bound, count in zip(buckets + ('+Inf',), values[:-2]):
+                cumulative += count
+                lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'{name}_sum{{{labels}}} {values[-2]}')
+            lines.append(f'{name}_count{{{labels}}} {values[-1]}')
+
+    def render(self, plugins: dict = None, extra: dict = None) -> str:
+        """Render all metrics in Prometheus text exposition format.
+
+        Args:
+            plugins (dict, optional): name -> plugin; numeric entries of each ``plugin.metrics`` are exported.
+            extra (dict, optional): additional ``metric_name -> value`` gauges of this process.
+        """
+        data = self.collect()
+        process = {'pid': os.getpid()} if self.multiproc_dir else {}
+        lines = ['# HELP funlab_http_requests_total Total HTTP requests handled.',
+                 '# TYPE funlab_http_requests_total counter']
+        for (blueprint, endpoint, method, status), count in sorted(data['requests'].items()):
+            lines.append(f'funlab_http_requests_total{{{_labels(blueprint=blueprint, endpoint=endpoint, method=method, status=status)}}} {count}')
+        self._render_histogram(lines, 'funlab_http_request_duration_seconds', 'Request latency in seconds.',
+                               self.latency_buckets, data['latency'])
+        self._render_histogram(lines, 'funlab_http_response_size_bytes', 'Response body size in bytes.',
+                               self.size_buckets, data['sizes'])
+        lines.append('# HELP funlab_http_requests_in_flight Requests currently being handled.')
+        lines.append('# TYPE funlab_http_requests_in_flight gauge')
+        lines.append(f"funlab_http_requests_in_flight {data['in_flight']}")
+        lines.append('# HELP funlab_http_exceptions_total Unhandled exceptions by type.')
+        lines.append('# TYPE funlab_http_exceptions_total counter')
+        for (exc_type,), count in sorted(data['exceptions'].items()):
+            lines.append(f'funlab_http_exceptions_total{{{_labels(exception=exc_type)}}} {count}')
+        if plugins:
+            lines.append('# HELP funlab_plugin_metric Numeric values reported by plugin.metrics.')
+            lines.append('# TYPE funlab_plugin_metric gauge')
+            for plugin_name, plugin in plugins.items():
+                try:
+                    metrics = getattr(plugin, 'metrics', None)
+                except Exception:
+                    continue  # a broken plugin must not break the scrape
+                for metric, value in sorted(flatten_numeric(metrics).items()):
+                    lines.append(f'funlab_plugin_metric{{{_labels(plugin=plugin_name, metric=metric, **process)}}} '
+                                 f'{value}')
+        for name, value in (extra or {}).items():
+            lines.append(f'# TYPE {name} gauge')
+            lines.append(f'{name}{{{_labels(**process)}}} {value}' if process else f'{name} {value}')
+        lines.append('')
+        return '\n'.join(lines)
+
+
+def flatten_numeric(values, prefix: str = '') -> dict:
+    """Flatten nested dicts into ``a_b_c -> number``, dropping non-numeric leaves."""
+    flat = {}
+    if not isinstance(values, dict):
+        return flat
+    for key, value in values.items():
+        name = f'{prefix}_{key}' if prefix else str(key)
+        if isinstance(value, dict):
+            flat.update(flatten_numeric(value, name))
+        elif isinstance(value, bool):
+            flat[name] = int(value)
+        elif isinstance(value, (int, float)):
+            flat[name] = value
+    return flat
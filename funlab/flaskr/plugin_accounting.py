@@ -0,0 +1,206 @@
+"""Attribute request CPU/wall time, background thread CPU and allocated memory to plugins."""
+from __future__ import annotations
+
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import defaultdict
+from typing import TYPE_CHECKING
+
+from flask import g, request
+
+if TYPE_CHECKING:
+    from funlab.flaskr.app import FunlabFlask
+
+APP_OWNER = '(app)'
+
+
+class _Usage:
+    __slots__ = ('requests', 'cpu', 'wall', 'max_cpu', 'max_wall')
+
+    def __init__(self):
+        self.requests = 0
+        self.cpu = 0.0
+        self.wall = 0.0
+        self.max_cpu = 0.0
+        self.max_wall = 0.0
+
+    def add(self, cpu: float, wall: float):
+        self.requests += 1
+        self.cpu += cpu
+        self.wall += wall
+        self.max_cpu = max(self.max_cpu, cpu)
+        self.max_wall = max(self.max_wall, wall)
+
+
+class PluginAccounting:
+    """Per-plugin resource accounting.
+
+    * Requests: thread CPU time (``time.thread_time``) and wall time between the first
+      before_request handler and teardown, attributed through ``request.blueprint`` to the plugin
+      owning that blueprint. Under gevent greenlets share a thread, so CPU is approximate there.
+    * Threads: background threads are attributed to the plugin whose package defines their target
+      (or :meth:`tag_thread`), and their CPU clocks are read on demand (POSIX only).
+    * Memory: with ``tracemalloc_frames`` > 0, tracemalloc runs and :meth:`memory` charges
+      traced bytes to the innermost plugin frame of each allocation traceback, with the delta
+      since the previous snapshot. Snapshots are taken at most every ``memory_interval`` seconds,
+      the dashboard polls in between get the last result. Tracing costs CPU and memory, keep it
+      off in normal operation.
+    """
+
+    def __init__(self, app: FunlabFlask, tracemalloc_frames: int = 0, memory_interval: float = 30.0):
+        self.app = app
+        self.tracemalloc_frames = tracemalloc_frames
+        self.memory_interval = memory_interval
+        self._usage: dict[str, _Usage] = defaultdict(_Usage)
+        self._lock = threading.Lock()
+        self._threads_lock = threading.Lock()
+        self._blueprint_owners: dict[str, str] = {}
+        self._tagged_threads: dict[int, str] = {}
+        self._thread_cpu: dict[int, tuple[str, float]] = {}
+        self._retired_cpu: dict[str, float] = defaultdict(float)
+        self._last_memory: dict[str, int] = {}
+        self._memory_lock = threading.Lock()
+        self._memory_result: dict[str, dict] = {}
+        self._memory_taken = None
+
+    @classmethod
+    def from_config(cls, app: FunlabFlask, config) -> PluginAccounting:
+        return cls(app, tracemalloc_frames=int(config.get('ACCOUNTING_TRACEMALLOC_FRAMES', 0)),
+                   memory_interval=float(config.get('ACCOUNTING_MEMORY_INTERVAL', 30)))
+
+    def init_app(self, app: FunlabFlask):
+        app.before_request_funcs.setdefault(None, []).insert(0, self._before_request)
+        app.teardown_request_funcs.setdefault(None, []).append(self._teardown_request)
+        if self.tracemalloc_frames and not tracemalloc.is_tracing():
+            tracemalloc.start(self.tracemalloc_frames)
+
+    # ownership
+    def _owner_of_blueprint(self, blueprint: str | None) -> str:
+        if not blueprint:
+            return APP_OWNER
+        if (owner := self._blueprint_owners.get(blueprint)) is None:
+            # plugins may be loaded or reloaded lazily: rebuild the map on a miss
+            owners = {getattr(plugin, 'bp_name', None): name for name, plugin in list(self.app.plugins.items())}
+            self._blueprint_owners = {bp: name for bp, name in owners.items() if bp}
+            owner = self._blueprint_owners.setdefault(blueprint, APP_OWNER)
+        return owner
+
+    def _plugin_packages(self) -> list[tuple[str, str, str]]:
+        """``(module prefix, file path prefix, plugin name)``, longest module prefix first.
+
+        A plugin owns its whole package, except when it shares the app's package (built-in
+        views such as PluginManagerView), where it only owns its own module.
+        """
+        app_package = type(self.app).__module__.rpartition('.')[0]
+        packages = []
+        for name, plugin in list(self.app.plugins.items()):
+            module_name = type(plugin).__module__
+            package = module_name.rpartition('.')[0]
+            module_file = getattr(sys.modules.get(module_name), '__file__', None) or ''
+            if package and package != app_package:
+                packages.append((package, os.path.dirname(module_file) + os.sep if module_file else '', name))
+            else:
+                packages.append((module_name, module_file, name))
+        return sorted(packages, key=lambda item: len(item[0]), reverse=True)
+
+    # requests
+    def _before_request(self):
+        g._accounting_start = (time.thread_time(), time.perf_counter())
+
+    def _teardown_request(self, exc=None):
+        if (start := g.pop('_accounting_start', None)) is None:
+            return
+        cpu = time.thread_time() - start[0]
+        wall = time.perf_counter() - start[1]
+        owner = self._owner_of_blueprint(request.blueprint)
+        with self._lock:
+            self._usage[owner].add(cpu, wall)
+
+    # threads
+    def tag_thread(self, plugin_name: str, thread: threading.Thread = None):
+        """Attribute ``thread`` (default: the current one) to ``plugin_name``."""
+        thread = thread or threading.current_thread()
+        self._tagged_threads[thread.ident] = plugin_name
+
+    def _thread_owner(self, thread: threading.Thread, packages: list) -> str | None:
+        if (owner := self._tagged_threads.get(thread.ident)) is not None:
+            return owner
+        target = getattr(thread, '_target', None)
+        module = getattr(target, '__module__', None) or type(thread).__module__
+        for prefix, _, name in packages:
+            if module == prefix or module.startswith(prefix + '.'):
+                return name
+        return None
+
+    def thread_cpu(self) -> dict[str, dict]:
+        """CPU seconds of background threads per plugin, including threads that already ended."""
+        if not hasattr(time, 'pthread_getcpuclockid'):
+            return {}
+        with self._threads_lock:
+            return self._collect_thread_cpu(self._plugin_packages())
+
+    def _collect_thread_cpu(self, packages: list) -> dict[str, dict]:
+        live: dict[str, dict] = defaultdict(lambda: {'threads': 0, 'cpu': 0.0})
+        seen = set()
+        for thread in threading.enumerate():
+            if thread.ident is None or (owner := self._thread_owner(thread, packages)) is None:
+                continue
+            try:
+                cpu = time.clock_gettime(time.pthread_getcpuclockid(thread.ident))
+            except (OSError, OverflowError):
+                continue
+            seen.add(thread.ident)
+            self._thread_cpu[thread.ident] = (owner, cpu)
+            live[owner]['threads'] += 1
+            live[owner]['cpu'] += cpu
+        for ident in set(self._thread_cpu) - seen:
+            owner, cpu = self._thread_cpu.pop(ident)
+            self._retired_cpu[owner] += cpu
+            self._tagged_threads.pop(ident, None)
+        for owner, cpu in self._retired_cpu.items():
+            live[owner]['cpu'] += cpu
+        return dict(live)
+
+    # memory
+    def memory(self) -> dict[str, dict]:
+        """Traced bytes per plugin package and the change since the previous snapshot."""
+        if not tracemalloc.is_tracing():
+            return {}
+        with self._memory_lock:
+            now = time.monotonic()
+            if self._memory_taken is None or now - self._memory_taken >= self.memory_interval:
+                self._memory_result = self._take_memory()
+                self._memory_taken = now
+            return self._memory_result
+
+    def _take_memory(self) -> dict[str, dict]:
+        packages = [(path, name) for _, path, name in self._plugin_packages() if path]
+        totals: dict[str, int] = defaultdict(int)
+        for stat in tracemalloc.take_snapshot().statistics('traceback'):
+            # frames run oldest to most recent: charge the innermost plugin frame, so allocations
+            # made through libraries count too
+            owner = next((name for frame in reversed(stat.traceback) for path, name in packages
+                          if frame.filename.startswith(path)), None)
+            if owner:
+                totals[owner] += stat.size
+        result = {name: {'bytes': size, 'delta': size - self._last_memory.get(name, size)}
+                  for name, size in totals.items()}
+        self._last_memory = dict(totals)
+        return result
+
+    def stats(self, include_memory: bool = False) -> dict[str, dict]:
+        """Per-plugin usage: request counts and CPU/wall seconds, thread CPU, optionally memory."""
+        with self._lock:
+            result = {owner: {'requests': usage.requests, 'cpu': round(usage.cpu, 6), 'wall': round(usage.wall, 6),
+                              'max_cpu': round(usage.max_cpu, 6), 'max_wall': round(usage.max_wall, 6)}
+                      for owner, usage in self._usage.items()}
+        for owner, threads in self.thread_cpu().items():
+            result.setdefault(owner, {}).update(thread_count=threads['threads'],
+                                                thread_cpu=round(threads['cpu'], 6))
+        if include_memory:
+            for owner, memory in self.memory().items():
+                result.setdefault(owner, {}).update(memory_bytes=memory['bytes'], memory_delta=memory['delta'])
+        return result
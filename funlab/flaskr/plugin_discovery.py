@@ -0,0 +1,189 @@
+"""On-disk cache of plugin entry points, keyed by a fingerprint of the installed distributions."""
+from __future__ import annotations
+
+import contextlib
+import hashlib
+import importlib.metadata
+import json
+import os
+import stat
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+_ORIGINAL_ENTRY_POINTS = importlib.metadata.entry_points
+_DIST_SUFFIXES = ('.dist-info', '.egg-info', '.egg-link')
+
+
+def default_cache_dir() -> Path:
+    """Per-user cache directory: ``%LOCALAPPDATA%\\funlab`` on Windows, else ``$XDG_CACHE_HOME/funlab``
+    (``~/.cache/funlab``)."""
+    if os.name == 'nt' and (local := os.environ.get('LOCALAPPDATA')):
+        return Path(local, 'funlab')
+    return Path(os.environ.get('XDG_CACHE_HOME') or Path.home() / '.cache', 'funlab')
+
+
+def _is_private(path: Path, st: os.stat_result = None) -> bool:
+    """Whether ``path`` is owned by the current user and not writable by group or others (POSIX)."""
+    if not hasattr(os, 'getuid'):
+        return True
+    st = st or path.stat()
+    return st.st_uid == os.getuid() and not st.st_mode & (stat.S_IWGRP | stat.S_IWOTH)
+
+
+def environment_fingerprint(paths: list[str] = None) -> str:
+    """Hash of the interpreter and the names and mtimes of every distribution on ``sys.path``.
+
+    Installing, upgrading or removing a package (editable ones included) changes a metadata
+    directory name or mtime; only directory listings are read, no metadata files.
+    """
+    sha = hashlib.sha256(sys.version.encode('utf-8'))
+    for path in paths if paths is not None else sys.path:
+        sha.update(f'\0{path}'.encode('utf-8'))
+        try:
+            with os.scandir(path or '.') as entries:
+                for entry in sorted(entries, key=lambda e: e.name):
+                    if entry.name.endswith(_DIST_SUFFIXES):
+                        sha.update(f'{entry.name}:{entry.stat().st_mtime_ns}'.encode('utf-8'))
+        except (FileNotFoundError, NotADirectoryError, PermissionError):
+            continue
+    return sha.hexdigest()
+
+
+class PluginDiscoveryCache:
+    """Serve ``importlib.metadata.entry_points(group=...)`` from a JSON file while the
+    environment fingerprint is unchanged, so worker start skips scanning every distribution.
+
+    The file lives in ``cache_dir`` (env ``FUNLAB_PLUGIN_CACHE_DIR``, default the per-user
+    :func:`default_cache_dir`), is named after the interpreter and environment (``sys.prefix``) and
+    is shared by all workers of that environment; set ``FUNLAB_PLUGIN_CACHE=0`` to disable it.
+    Entry point values name the code that gets imported, so a file or directory not owned by the
+    current user, or writable by group/others, is ignored and never written to.
+    """
+
+    def __init__(self, cache_dir: str | Path = None, enabled: bool = True):
+        self.cache_dir = Path(cache_dir or default_cache_dir())
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._fingerprint: str = None
+        self._groups: dict[str, list] = None
+        self.hits = 0
+        self.misses = 0
+        self.scan_seconds = 0.0
+        self.fingerprint_seconds = 0.0
+        self.loaded_from_disk = False
+        self.rejected_files = 0
+
+    @classmethod
+    def from_env(cls) -> PluginDiscoveryCache:
+        return cls(cache_dir=os.environ.get('FUNLAB_PLUGIN_CACHE_DIR'),
+                   enabled=os.environ.get('FUNLAB_PLUGIN_CACHE', '1').lower() not in ('0', 'false', 'no'))
+
+    @property
+    def cache_file(self) -> Path:
+        env = hashlib.sha256(f'{sys.prefix}\0{sys.executable}'.encode('utf-8')).hexdigest()[:12]
+        return self.cache_dir / f'plugin_entry_points_py{sys.version_info.major}{sys.version_info.minor}_{env}.json'
+
+    def _load(self):
+        start = time.perf_counter()
+        self._fingerprint = environment_fingerprint()
+        self.fingerprint_seconds = time.perf_counter() - start
+        self._groups = {}
+        try:
+            with open(self.cache_file, encoding='utf-8') as f:
+                if not (_is_private(self.cache_dir) and _is_private(self.cache_file, os.fstat(f.fileno()))):
+                    self.rejected_files += 1
+                    return
+                data = json.load(f)
+            if data.get('fingerprint') != self._fingerprint:
+                return
+            groups = {group: [_checked_item(item) for item in items] for group, items in data['groups'].items()}
+        except (OSError, ValueError, TypeError, KeyError, AttributeError):
+            return  # missing or corrupt: rescan and rewrite
+        self._groups = groups
+        self.loaded_from_disk = True
+
+    def _save(self):
+        self.cache_dir.mkdir(mode=0o700, parents=True, exist_ok=True)
+        if not _is_private(self.cache_dir):
+            self.rejected_files += 1
+            return
+        fd, tmp = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump({'fingerprint': self._fingerprint, 'groups': self._groups}, f)
+            os.replace(tmp, self.cache_file)
+        except OSError:
+            with contextlib.suppress(OSError):
+                os.unlink(tmp)
+
+    def entry_points(self, **params):
+        """Drop-in for ``importlib.metadata.entry_points``; only ``group=`` lookups are cached."""
+        if not self.enabled or set(params) != {'group'}:
+            return _ORIGINAL_ENTRY_POINTS(**params)
+        group = params['group']
+        with self._lock:
+            if self._groups is None:
+                self._load()
+            if (cached := self._groups.get(group)) is not None:
+                self.hits += 1
+                return importlib.metadata.EntryPoints(_to_entry_point(item) for item in cached)
+            self.misses += 1
+            start = time.perf_counter()
+            found = _ORIGINAL_ENTRY_POINTS(group=group)
+            self.scan_seconds += time.perf_counter() - start
+            self._groups[group] = [_from_entry_point(ep) for ep in found]
+            try:
+                self._save()
+            except OSError:
+                pass  # read-only cache dir: keep the in-memory result
+            return found
+
+    @contextlib.contextmanager
+    def installed(self):
+        """Route ``entry_points`` calls through the cache while the block runs.
+
+        Modules that did ``from importlib.metadata import entry_points`` hold their own reference,
+        so it is swapped in every already imported ``funlab`` module as well.
+        """
+        targets = [importlib.metadata]
+        targets += [module for name, module in list(sys.modules.items())
+                    if name.startswith('funlab') and getattr(module, 'entry_points', None) is _ORIGINAL_ENTRY_POINTS]
+        for module in targets:
+            module.entry_points = self.entry_points
+        try:
+            yield self
+        finally:
+            for module in targets:
+                module.entry_points = _ORIGINAL_ENTRY_POINTS
+
+    def invalidate(self):
+        with self._lock:
+            self._groups = None
+            self.loaded_from_disk = False
+            with contextlib.suppress(OSError):
+                self.cache_file.unlink()
+
+    def stats(self) -> dict:
+        return {'enabled': self.enabled, 'hits': self.hits, 'misses': self.misses,
+                'loaded_from_disk': self.loaded_from_disk, 'rejected_files': self.rejected_files,
+                'scan_ms': round(self.scan_seconds * 1000, 2),
+                'fingerprint_ms': round(self.fingerprint_seconds * 1000, 2),
+                'cache_file': str(self.cache_file)}
+
+
+def _from_entry_point(ep: importlib.metadata.EntryPoint) -> dict:
+    return {'name': ep.name, 'value': ep.value, 'group': ep.group}
+
+
+def _checked_item(item: dict) -> dict:
+    if not all(isinstance(item.get(key), str) for key in ('name', 'value', 'group')):
+        raise ValueError(f'Invalid cached entry point: {item!r}')
+    return {key: item[key] for key in ('name', 'value', 'group')}
+
+
+def _to_entry_point(item: dict) -> importlib.metadata.EntryPoint:
+    # only name/value/group are kept: ``ep.dist`` is None for entry points served from the cache
+    return importlib.metadata.EntryPoint(name=item['name'], value=item['value'], group=item['group'])
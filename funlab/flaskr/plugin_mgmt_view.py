@@ -1,8 +1,10 @@
 """Plugin management API and monitoring interface."""
 from flask import Blueprint, jsonify, request, render_template
 from funlab.core.auth import policy_required
-from funlab.core.policy import is_admin
+from funlab.flaskr.identity_cache import is_admin
 from funlab.core.plugin import Plugin
+from funlab.flaskr.plugin_accounting import APP_OWNER
+from funlab.flaskr.plugin_timeseries import PluginMetricsSampler
 from datetime import datetime
 from typing import TYPE_CHECKING
 
@@ -17,6 +19,12 @@ class PluginManagerView(Plugin):
 
     def __init__(self, app: 'FunlabFlask', url_prefix: str = None):
         super().__init__(app, url_prefix or 'plugin-manager')
+        self.metrics_sampler: PluginMetricsSampler = None
+        if self.plugin_config.get('METRICS_HISTORY', False):
+            self.metrics_sampler = PluginMetricsSampler.for_app(app, self.plugin_config)
+        elif sampler := getattr(app, 'plugin_metrics_sampler', None):  # turned off, then reloaded
+            sampler.stop()
+            app.plugin_metrics_sampler = None
         self._register_routes()
         if self.plugin_config.get('HOOK_EXAMPLES', False):
             self._register_hook_examples()
@@ -42,7 +50,7 @@ class PluginManagerView(Plugin):
         def get_plugins():
             """Return plugin statistics."""
             try:
-                stats = self.app.plugin_manager.get_plugin_stats()
+                stats = self._merge_accounting(self.app.plugin_manager.get_plugin_stats())
                 return jsonify({
                     'success': True,
                     'data': stats
@@ -102,6 +110,17 @@ class PluginManagerView(Plugin):
                             'error': f'Plugin {plugin_name} not found'
                         }), 404
 
+                    if reloader := getattr(self.app, 'plugin_reloader', None):
+                        # warm, drain and swap in the background; poll the job for the outcome
+                        job = reloader.submit(plugin_name)
+                        return jsonify({
+                            'success': True,
+                            'message': f'Plugin {plugin_name} reload started',
+                            'plugin_name': plugin_name,
+                            'job_id': job.id,
+                            'job': job.to_dict()
+                        }), 202
+
                     # ensure application-level config is reloaded so plugin's
                     # _init_configuration() will see updated `config.toml` values
                     try:
@@ -128,6 +147,22 @@ class PluginManagerView(Plugin):
                     'error': str(e)
                 }), 500
 
+        @self._blueprint.route('/api/reload-jobs/<job_id>', methods=['GET'])
+        @policy_required(is_admin)
+        def get_reload_job(job_id: str):
+            """Return the state of a background plugin reload."""
+            reloader = getattr(self.app, 'plugin_reloader', None)
+            job = reloader.get_job(job_id) if reloader else None
+            if job is None:
+                return jsonify({
+                    'success': False,
+                    'error': f'Reload job {job_id} not found'
+                }), 404
+            return jsonify({
+                'success': True,
+                'data': job.to_dict()
+            })
+
         @self._blueprint.route('/api/plugins/<plugin_name>/health', methods=['GET'])
         @policy_required(is_admin)
         def check_plugin_health(plugin_name: str):
@@ -244,11 +279,34 @@ class PluginManagerView(Plugin):
                     'error': str(e)
                 }), 500
 
+        @self._blueprint.route('/api/plugins/<plugin_name>/metrics/history', methods=['GET'])
+        @policy_required(is_admin)
+        def get_plugin_metrics_history(plugin_name: str):
+            """Return sampled metric and health history of a plugin."""
+            if self.metrics_sampler is None:
+                return jsonify({
+                    'success': False,
+                    'error': 'Metrics history is disabled'
+                }), 404
+            window = request.args.get('window', 3600, type=float)
+            metrics = [name for name in request.args.get('metrics', '').split(',') if name]
+            return jsonify({
+                'success': True,
+                'data': {
+                    'plugin_name': plugin_name,
+                    'window': window,
+                    'series': self.metrics_sampler.query(plugin_name, window, metrics),
+                    'stats': self.metrics_sampler.stats()
+                }
+            })
+
         @self._blueprint.route('/api/cache/clear', methods=['POST'])
         @policy_required(is_admin)
         def clear_plugin_cache():
             """Clear the plugin metadata cache."""
             try:
+                if discovery := getattr(self.app, 'plugin_discovery', None):
+                    discovery.invalidate()
                 if hasattr(self.app, 'plugin_manager') and hasattr(self.app.plugin_manager, 'plugin_loader'):
                     self.app.plugin_manager.plugin_loader.cache.invalidate_cache()
                     return jsonify({
@@ -266,6 +324,75 @@ class PluginManagerView(Plugin):
                     'error': str(e)
                 }), 500
 
+        @self._blueprint.route('/api/config/reload', methods=['POST'])
+        @policy_required(is_admin)
+        def reload_config():
+            """Reload config.toml if it changed and reload only plugins whose section changed."""
+            try:
+                if not hasattr(self.app, 'plugins_for_config_sections'):
+                    return jsonify({
+                        'success': False,
+                        'message': 'Config reload not supported'
+                    })
+                changed = self.app.reload_config(force=request.args.get('force') == '1')
+                reloaded, failed, jobs = [], [], []
+                reloader = getattr(self.app, 'plugin_reloader', None)
+                if changed and hasattr(self.app, 'plugin_manager'):
+                    for plugin_name in self.app.plugins_for_config_sections(changed):
+                        if reloader:
+                            jobs.append(reloader.submit(plugin_name).id)
+                        elif self.app.plugin_manager.reload_plugin(plugin_name):
+                            reloaded.append(plugin_name)
+                        else:
+                            failed.append(plugin_name)
+                return jsonify({
+                    'success': not failed,
+                    'changed_sections': sorted(changed),
+                    'changes': self.app.config_changes if changed else {},
+                    'reloaded': reloaded,
+                    'failed': failed,
+                    'job_ids': jobs
+                }), 202 if jobs else 200
+            except Exception as e:
+                return jsonify({
+                    'success': False,
+                    'error': str(e)
+                }), 500
+
+        @self._blueprint.route('/api/errors', methods=['GET'])
+        @policy_required(is_admin)
+        def get_error_fingerprints():
+            """Return the most frequent exception fingerprints."""
+            aggregator = getattr(self.app, 'error_aggregator', None)
+            if aggregator is None:
+                return jsonify({
+                    'success': False,
+                    'message': 'Error aggregation not available'
+                })
+            include_trace = request.args.get('trace') == '1'
+            errors = aggregator.top(request.args.get('limit', 20, type=int))
+            if not include_trace:
+                for error in errors:
+                    error.pop('trace', None)
+            return jsonify({
+                'success': True,
+                'data': {
+                    'stats': aggregator.stats(),
+                    'errors': errors
+                }
+            })
+
+        @self._blueprint.route('/api/errors/clear', methods=['POST'])
+        @policy_required(is_admin)
+        def clear_error_fingerprints():
+            """Reset the exception fingerprint table."""
+            if aggregator := getattr(self.app, 'error_aggregator', None):
+                aggregator.clear()
+            return jsonify({
+                'success': True,
+                'message': 'Error fingerprints cleared'
+            })
+
         @self._blueprint.route('/management')
         @policy_required(is_admin)
         def plugin_management():
@@ -274,7 +401,7 @@ class PluginManagerView(Plugin):
             try:
                 self.app.mylogger.debug("Starting plugin_management route")
                 self.app.mylogger.debug("Using plugin_manager for stats")
-                stats = self.app.plugin_manager.get_plugin_stats()
+                stats = self._merge_accounting(self.app.plugin_manager.get_plugin_stats())
                 self.app.mylogger.debug(f"plugin_manager stats: {stats}")
                 # Format timestamps and refresh aggregate counters.
                 if 'plugins' in stats:
@@ -317,8 +444,11 @@ class PluginManagerView(Plugin):
                     stats['loaded_plugins'] = 0
 
                 # Render the dashboard template.
+                discovery = getattr(self.app, 'plugin_discovery', None)
                 return render_template('plugin_management.html',
                                      stats=stats,
+                                     discovery=discovery.stats() if discovery else None,
+                                     history=self.metrics_sampler.stats() if self.metrics_sampler else None,
                                      current_time=datetime.now().isoformat())
             except Exception as e:
                 self.app.mylogger.error(f"ERROR in plugin_management: {e}")
@@ -326,6 +456,17 @@ class PluginManagerView(Plugin):
                 self.app.mylogger.error(f"Traceback: {traceback.format_exc()}")
                 return f"Error: {e}", 500
 
+    def _merge_accounting(self, stats: dict) -> dict:
+        """Add per-plugin resource usage as ``resources`` to the plugin manager stats."""
+        accounting = getattr(self.app, 'plugin_accounting', None)
+        if accounting is None:
+            return stats
+        usage = accounting.stats(include_memory=True)
+        for plugin_name, plugin_info in stats.get('plugins', {}).items():
+            plugin_info['resources'] = usage.pop(plugin_name, {})
+        stats['app_resources'] = usage.pop(APP_OWNER, {})
+        return stats
+
     def setup_menus(self):
         """Register the plugin-management menu entry."""
         from funlab.core.menu import MenuItem
@@ -0,0 +1,337 @@
+"""Background plugin reloads that swap the plugin's dispatch in place, or drain and hold its traffic."""
+from __future__ import annotations
+
+import importlib
+import itertools
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from typing import TYPE_CHECKING
+
+from flask import Flask, Response, g, request
+
+from funlab.flaskr.hooks import hook_registry
+
+if TYPE_CHECKING:
+    from funlab.flaskr.app import FunlabFlask
+
+
+@dataclass
+class ReloadJob:
+    id: str
+    plugin_name: str
+    state: str = 'queued'  # queued, warming, draining, swapping, done, failed
+    success: bool = None
+    message: str = ''
+    hot_swap: bool = None  # False: reloaded by plugin_manager.reload_plugin() behind the gate
+    drained: bool = None
+    held_requests: int = 0
+    rejected_requests: int = 0
+    created_at: float = field(default_factory=time.time)
+    finished_at: float = None
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+class _Gate:
+    """Closed while a plugin swaps; a few requests for its blueprint wait for it to reopen."""
+
+    def __init__(self, job: ReloadJob):
+        self.job = job
+        self.opened = threading.Event()
+        self.waiting = 0
+
+
+# blueprint-scoped request handlers, keyed by blueprint name in the app
+_BLUEPRINT_HANDLERS = ('before_request_funcs', 'after_request_funcs', 'teardown_request_funcs',
+                       'url_value_preprocessors', 'url_default_functions', 'template_context_processors',
+                       'error_handler_spec')
+
+
+@dataclass
+class _Swap:
+    """A plugin instance built next to the live one, with what the app dispatches to for its blueprint."""
+    old: object
+    new: object
+    bp_name: str
+    view_functions: dict
+    handlers: dict
+    hooks: list  # (args, kwargs) of the register_hook calls made by the new instance
+
+
+def _rules(app: Flask, bp_name: str = None) -> list[tuple]:
+    return sorted((rule.rule, rule.endpoint, tuple(sorted(rule.methods))) for rule in app.url_map.iter_rules()
+                  if (rule.endpoint.startswith(f'{bp_name}.') if bp_name else rule.endpoint != 'static'))
+
+
+def _app_wide(app: Flask) -> tuple:
+    """What blueprints can register on the whole app (``before_app_request``, ``app_template_filter``, ...)."""
+    return (tuple(len(getattr(app, attr).get(None) or ()) for attr in _BLUEPRINT_HANDLERS),
+            sorted(app.jinja_env.filters), sorted(app.jinja_env.tests), sorted(app.jinja_env.globals))
+
+
+def _bound_to(callback, instance) -> bool:
+    while callback is not None:
+        if getattr(callback, '__self__', None) is instance:
+            return True
+        callback = getattr(callback, '__wrapped__', None)
+    return False
+
+
+class PluginReloadCoordinator:
+    """Run plugin reloads off the request thread, swapping view plugins without stopping their traffic.
+
+    Each reload is a job executed by a single background worker. For a view plugin:
+
+    1. warm: reload the app config (a no-op when unchanged), re-import the plugin's module and build a
+       new instance, its blueprint registered on a scratch app, then call its ``warmup()`` if it has
+       one, all while the live instance keeps serving;
+    2. swap: under the coordinator lock, point the app's view functions, blueprint-scoped handlers,
+       ``app.blueprints`` and ``app.plugins`` entries, and the hooks bound to the old instance at the
+       new one; requests arriving from then on are served by it;
+    3. drain: wait up to ``drain_timeout`` for requests that entered before the swap, then drop the
+       old instance.
+
+    Nothing is held or rejected on that path. Each dispatch table entry is replaced by one assignment:
+    a request already past routing finishes in the old view but runs the new instance's
+    ``after_request`` and teardown handlers.
+
+    The plugin is instead reloaded by ``plugin_manager.reload_plugin()`` behind a closed gate when it
+    cannot be swapped that way: a service plugin (its service would run twice), a new instance that
+    fails to build, changes its URL rules, or registers app-wide handlers, template filters or globals
+    (they cannot be replaced for one blueprint), or an app without the plugin's blueprint. Hook
+    callbacks that are not bound methods of the plugin and menu changes also need that path or a
+    restart. There, the drain comes first: while the gate is closed, at most ``max_held`` new requests
+    for the blueprint wait for it, up to ``hold_timeout`` seconds each; the others, and those still
+    waiting after that, get ``503`` with ``Retry-After`` right away instead of hitting a
+    half-initialized plugin. A held request occupies a WSGI worker thread, so keep ``max_held`` well
+    below the server's thread count (waitress: 4 by default) or set it to 0 so a reload never ties up
+    threads other blueprints need.
+    """
+
+    def __init__(self, app: FunlabFlask, drain_timeout: float = 10.0, hold_timeout: float = 5.0,
+                 max_held: int = 2, max_jobs: int = 100):
+        self.app = app
+        self.drain_timeout = drain_timeout
+        self.hold_timeout = hold_timeout
+        self.max_held = max_held
+        self.max_jobs = max_jobs
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='funlab-plugin-reload')
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        # in-flight requests by (blueprint, generation); a hot swap starts a new generation
+        self._in_flight: dict[tuple[str, int], int] = {}
+        self._generations: dict[str, int] = {}
+        self._gates: dict[str, _Gate] = {}
+        self.jobs: dict[str, ReloadJob] = {}
+
+    @classmethod
+    def from_config(cls, app: FunlabFlask) -> PluginReloadCoordinator:
+        return cls(app, drain_timeout=float(app.config.get('PLUGIN_RELOAD_DRAIN_TIMEOUT', 10)),
+                   hold_timeout=float(app.config.get('PLUGIN_RELOAD_HOLD_TIMEOUT', 5)),
+                   max_held=int(app.config.get('PLUGIN_RELOAD_MAX_HELD', 2)))
+
+    def init_app(self, app: FunlabFlask):
+        app.before_request_funcs.setdefault(None, []).insert(0, self._enter)
+        app.teardown_request_funcs.setdefault(None, []).append(self._leave)
+
+    # request tracking
+    def _enter(self):
+        blueprints = tuple(request.blueprints)
+        if not blueprints:
+            return None
+        if self._gates:
+            with self._lock:
+                gate = next((self._gates[bp] for bp in blueprints if bp in self._gates), None)
+            if gate and not self._wait(gate):
+                return Response('Plugin is reloading, please retry.', status=503,
+                                headers={'Retry-After': str(max(1, int(self.drain_timeout)))})
+        with self._lock:
+            tracked = tuple((bp, self._generations.get(bp, 0)) for bp in blueprints)
+            for key in tracked:
+                self._in_flight[key] = self._in_flight.get(key, 0) + 1
+        g._funlab_reload_tracked = tracked
+        return None
+
+    def _wait(self, gate: _Gate) -> bool:
+        with self._lock:
+            if gate.waiting >= self.max_held:
+                gate.job.rejected_requests += 1
+                return False
+            gate.waiting += 1
+            gate.job.held_requests += 1
+        opened = gate.opened.wait(self.hold_timeout)
+        with self._lock:
+            gate.waiting -= 1
+            if not opened:
+                gate.job.rejected_requests += 1
+        return opened
+
+    def _leave(self, exc=None):
+        tracked = g.pop('_funlab_reload_tracked', None)
+        if not tracked:
+            return
+        with self._lock:
+            for key in tracked:
+                if self._in_flight[key] == 1:
+                    del self._in_flight[key]
+                else:
+                    self._in_flight[key] -= 1
+            self._idle.notify_all()
+
+    def _count(self, blueprint: str, generation: int = None) -> int:
+        return sum(count for (bp, gen), count in self._in_flight.items()
+                   if bp == blueprint and generation in (None, gen))
+
+    def in_flight(self, blueprint: str) -> int:
+        with self._lock:
+            return self._count(blueprint)
+
+    # jobs
+    def submit(self, plugin_name: str) -> ReloadJob:
+        job = ReloadJob(id=f'{int(time.time())}-{next(self._ids)}', plugin_name=plugin_name)
+        with self._lock:
+            self.jobs[job.id] = job
+            while len(self.jobs) > self.max_jobs:
+                self.jobs.pop(next(iter(self.jobs)))
+        self._executor.submit(self._run, job)
+        return job
+
+    def get_job(self, job_id: str) -> ReloadJob | None:
+        return self.jobs.get(job_id)
+
+    def _run(self, job: ReloadJob):
+        app = self.app
+        gate = None
+        try:
+            with app.app_context():
+                job.state = 'warming'
+                try:
+                    if hasattr(app, 'reload_config'):
+                        app.reload_config()
+                except Exception as e:
+                    app.mylogger.warning(f'App config reload failed prior to plugin reload: {e}')
+
+                plugin = app.plugins.get(job.plugin_name) or app.plugin_manager.peek_plugin(job.plugin_name)
+                try:
+                    swap = self._build(plugin)
+                except Exception as e:
+                    app.mylogger.warning(f'Plugin {job.plugin_name} cannot be built for a hot swap: {e}')
+                    swap = None
+                job.hot_swap = swap is not None
+                if swap:
+                    self._hot_swap(job, swap)
+                    return
+                bp_name = getattr(plugin, 'bp_name', None)
+                if bp_name:
+                    job.state = 'draining'
+                    gate = _Gate(job)
+                    with self._lock:
+                        self._gates[bp_name] = gate
+                        job.drained = self._idle.wait_for(lambda: self._count(bp_name) == 0,
+                                                          timeout=self.drain_timeout)
+                    if not job.drained:
+                        app.mylogger.warning(f'Reloading {job.plugin_name} with requests still in flight '
+                                             f'after {self.drain_timeout}s')
+                job.state = 'swapping'
+                job.success = bool(app.plugin_manager.reload_plugin(job.plugin_name))
+                job.message = f'Plugin {job.plugin_name} reload {"successful" if job.success else "failed"}'
+                job.state = 'done' if job.success else 'failed'
+        except Exception as e:
+            app.mylogger.error(f'Plugin {job.plugin_name} reload failed: {e}')
+            job.success, job.state, job.message = False, 'failed', str(e)
+        finally:
+            if gate:
+                with self._lock:
+                    self._gates = {bp: gt for bp, gt in self._gates.items() if gt is not gate}
+                gate.opened.set()
+            job.finished_at = time.time()
+
+    # hot swap
+    def _build(self, old) -> _Swap | None:
+        """Build and warm a new instance of ``old``'s class; None when it has to go through the gate."""
+        app = self.app
+        bp_name = getattr(old, 'bp_name', None)
+        blueprint = getattr(old, 'blueprint', None)
+        if (not bp_name or blueprint is None or app.blueprints.get(bp_name) is not blueprint
+                or callable(getattr(old, 'start_service', None))):
+            return None
+        module = importlib.reload(sys.modules[type(old).__module__])
+        with self._deferred_hooks() as hooks:
+            new = getattr(module, type(old).__name__)(app)
+        if new.bp_name != bp_name:
+            return None
+        scratch = Flask(app.import_name)
+        before = _app_wide(scratch)
+        scratch.register_blueprint(new.blueprint)
+        if _rules(scratch) != _rules(app, bp_name) or _app_wide(scratch) != before:
+            app.mylogger.info(f'Plugin {bp_name} changed its URL rules or app-wide handlers, reloading it gated')
+            return None
+        if callable(warmup := getattr(new, 'warmup', None)):
+            warmup()
+        view_functions = {endpoint: view for endpoint, view in scratch.view_functions.items()
+                          if endpoint.startswith(f'{bp_name}.')}
+        handlers = {attr: getattr(scratch, attr).get(bp_name) for attr in _BLUEPRINT_HANDLERS}
+        return _Swap(old, new, bp_name, view_functions, handlers, hooks)
+
+    @contextmanager
+    def _deferred_hooks(self):
+        """Collect the hooks registered on this thread instead of adding them next to the live instance's."""
+        calls = []
+        hook_manager = getattr(self.app, 'hook_manager', None)
+        if hook_manager is None:
+            yield calls
+            return
+        original, thread = hook_manager.register_hook, threading.get_ident()
+
+        def register_hook(*args, **kwargs):
+            if threading.get_ident() != thread:
+                return original(*args, **kwargs)
+            calls.append((args, kwargs))
+        hook_manager.register_hook = register_hook
+        try:
+            yield calls
+        finally:
+            hook_manager.register_hook = original
+
+    def _hot_swap(self, job: ReloadJob, swap: _Swap):
+        app, bp_name = self.app, swap.bp_name
+        hook_manager = getattr(app, 'hook_manager', None)
+        if hook_manager:
+            hook_manager.call_hook('plugin_before_reload', plugin_name=job.plugin_name, plugin=swap.old)
+        job.state = 'swapping'
+        with self._lock:
+            app.view_functions.update(swap.view_functions)
+            for attr, funcs in swap.handlers.items():
+                if funcs:
+                    getattr(app, attr)[bp_name] = funcs
+                else:
+                    getattr(app, attr).pop(bp_name, None)
+            app.blueprints[bp_name] = swap.new.blueprint
+            app.plugins[job.plugin_name] = swap.new
+            if hook_manager:
+                registry = hook_registry(hook_manager)
+                for hook_name, entries in list(registry.items()):
+                    registry[hook_name] = [entry for entry in entries if not _bound_to(entry['callback'], swap.old)]
+                for args, kwargs in swap.hooks:
+                    hook_manager.register_hook(*args, **kwargs)
+            generation = self._generations.get(bp_name, 0)
+            self._generations[bp_name] = generation + 1
+            job.state = 'draining'
+            job.drained = self._idle.wait_for(lambda: self._count(bp_name, generation) == 0,
+                                              timeout=self.drain_timeout)
+        if not job.drained:
+            app.mylogger.warning(f'Plugin {job.plugin_name} swapped, old instance still serving requests '
+                                 f'after {self.drain_timeout}s')
+        if hook_manager:
+            hook_manager.call_hook('plugin_after_reload', plugin_name=job.plugin_name, plugin=swap.new)
+        job.success, job.state = True, 'done'
+        job.message = f'Plugin {job.plugin_name} reload successful'
+
+    def shutdown(self, wait: bool = True):
+        self._executor.shutdown(wait=wait)
@@ -0,0 +1,202 @@
+"""Bounded in-process history of plugin metrics and health in fixed-size ring buffers."""
+from __future__ import annotations
+
+import math
+import threading
+import time
+from array import array
+from typing import TYPE_CHECKING, Iterable
+
+from funlab.flaskr.metrics import flatten_numeric
+
+if TYPE_CHECKING:
+    from funlab.flaskr.app import FunlabFlask
+
+# (bucket seconds, number of buckets): 1 hour at 10 s, 1 day at 1 min, 1 week at 10 min
+DEFAULT_TIERS = ((10, 360), (60, 1440), (600, 1008))
+
+
+class RingBuffer:
+    """Fixed-capacity ``(timestamp, value)`` buffer on preallocated ``array('d')`` storage."""
+
+    __slots__ = ('capacity', '_times', '_values', '_next', '_size')
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._times = array('d', bytes(8 * capacity))
+        self._values = array('d', bytes(8 * capacity))
+        self._next = 0
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def nbytes(self) -> int:
+        return 2 * 8 * self.capacity
+
+    def append(self, timestamp: float, value: float):
+        self._times[self._next] = timestamp
+        self._values[self._next] = value
+        self._next = (self._next + 1) % self.capacity
+        self._size = min(self._size + 1, self.capacity)
+
+    def items(self, since: float = -math.inf) -> list[tuple[float, float]]:
+        """Points not older than ``since``, oldest first."""
+        start = (self._next - self._size) % self.capacity
+        points = []
+        for offset in range(self._size):
+            idx = (start + offset) % self.capacity
+            if self._times[idx] >= since:
+                points.append((self._times[idx], self._values[idx]))
+        return points
+
+
+class TieredSeries:
+    """One metric downsampled into several ring buffers of increasing bucket size.
+
+    Each tier stores the mean of the samples that fell into a bucket, written when the next
+    bucket starts, so memory is fixed at creation: ``sum(capacities) * 16`` bytes.
+    """
+
+    __slots__ = ('tiers', '_buckets')
+
+    def __init__(self, tiers: Iterable[tuple[int, int]] = DEFAULT_TIERS):
+        self.tiers = tuple((interval, RingBuffer(capacity)) for interval, capacity in tiers)
+        self._buckets = [None] * len(self.tiers)  # per tier: [bucket index, sum, count]
+
+    @property
+    def nbytes(self) -> int:
+        return sum(buffer.nbytes for _, buffer in self.tiers)
+
+    def add(self, timestamp: float, value: float):
+        for idx, (interval, buffer) in enumerate(self.tiers):
+            bucket = int(timestamp // interval)
+            pending = self._buckets[idx]
+            if pending is not None and pending[0] != bucket:
+                buffer.append(pending[0] * interval, pending[1] / pending[2])
+                pending = None
+            if pending is None:
+                self._buckets[idx] = [bucket, value, 1]
+            else:
+                pending[1] += value
+                pending[2] += 1
+
+    def window(self, seconds: float, now: float = None) -> tuple[int, list[tuple[float, float]]]:
+        """Finest tier covering ``seconds`` and its points, including the still-open bucket."""
+        now = time.time() if now is None else now
+        idx = next((i for i, (interval, buffer) in enumerate(self.tiers)
+                    if interval * buffer.capacity >= seconds), len(self.tiers) - 1)
+        interval, buffer = self.tiers[idx]
+        points = buffer.items(since=now - seconds)
+        if (pending := self._buckets[idx]) is not None:
+            points.append((pending[0] * interval, pending[1] / pending[2]))
+        return interval, points
+
+
+class PluginMetricsSampler:
+    """Background thread that samples every active plugin's numeric ``metrics`` and health.
+
+    Series are created on first sight up to ``max_series``; samples of further metrics are
+    dropped and counted, so memory is bounded by ``max_series * sum(tier capacities) * 16`` bytes.
+    """
+
+    def __init__(self, app: FunlabFlask, interval: float = 10, tiers: Iterable[tuple[int, int]] = DEFAULT_TIERS,
+                 max_series: int = 128, sample_health: bool = True):
+        self.app = app
+        self.interval = interval
+        self.tiers = tuple(tuple(tier) for tier in tiers)
+        self.max_series = max_series
+        self.sample_health = sample_health
+        self.series: dict[tuple[str, str], TieredSeries] = {}
+        self.dropped_samples = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: threading.Thread = None
+
+    @classmethod
+    def from_config(cls, app: FunlabFlask, config) -> PluginMetricsSampler:
+        return cls(app, interval=float(config.get('METRICS_HISTORY_INTERVAL', 10)),
+                   tiers=config.get('METRICS_HISTORY_TIERS', DEFAULT_TIERS),
+                   max_series=int(config.get('METRICS_HISTORY_MAX_SERIES', 128)),
+                   sample_health=bool(config.get('METRICS_HISTORY_HEALTH', True)))
+
+    @classmethod
+    def for_app(cls, app: FunlabFlask, config) -> PluginMetricsSampler:
+        """The app's running sampler, created on first use: re-created views (plugin reloads) share its
+        thread and history instead of starting another one."""
+        if (sampler := getattr(app, 'plugin_metrics_sampler', None)) is None:
+            sampler = app.plugin_metrics_sampler = cls.from_config(app, config)
+        sampler.start()
+        return sampler
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='funlab-metrics-history', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5):
+        self._stop.set()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                with self.app.app_context():
+                    self.sample()
+            except Exception as e:
+                self.app.mylogger.warning(f"Plugin metrics sampling failed: {e}")
+
+    def _active_plugins(self) -> dict:
+        manager = getattr(self.app, 'plugin_manager', None)
+        if manager is None:
+            return dict(self.app.plugins)
+        plugins = {}
+        for name in list(self.app.plugins):
+            if manager.get_plugin_state(name) == 'active' and (plugin := manager.peek_plugin(name)):
+                plugins[name] = plugin
+        return plugins
+
+    def sample(self, now: float = None):
+        now = time.time() if now is None else now
+        for name, plugin in self._active_plugins().items():
+            try:
+                values = flatten_numeric(getattr(plugin, 'metrics', None) or {})
+                if self.sample_health and hasattr(plugin, 'health_check'):
+                    values['healthy'] = int(bool(plugin.health_check()))
+            except Exception:
+                values = {'healthy': 0} if self.sample_health else {}
+            for metric, value in values.items():
+                if (series := self._series(name, metric)) is not None:
+                    series.add(now, float(value))
+
+    def _series(self, plugin: str, metric: str) -> TieredSeries | None:
+        key = (plugin, metric)
+        if (series := self.series.get(key)) is not None:
+            return series
+        with self._lock:
+            if key not in self.series:
+                if len(self.series) >= self.max_series:
+                    self.dropped_samples += 1
+                    return None
+                self.series[key] = TieredSeries(self.tiers)
+            return self.series[key]
+
+    def query(self, plugin: str, seconds: float = 3600, metrics: Iterable[str] = None) -> dict:
+        """``{metric: {'interval': bucket seconds, 'points': [[ts, value], ...]}}`` for one plugin."""
+        wanted = set(metrics) if metrics else None
+        result = {}
+        for (name, metric), series in list(self.series.items()):
+            if name == plugin and (wanted is None or metric in wanted):
+                interval, points = series.window(seconds)
+                result[metric] = {'interval': interval, 'points': [[ts, value] for ts, value in points]}
+        return result
+
+    def stats(self) -> dict:
+        return {'series': len(self.series), 'max_series': self.max_series, 'dropped_samples': self.dropped_samples,
+                'bytes': sum(series.nbytes for series in list(self.series.values())),
+                'max_bytes': self.max_series * sum(16 * capacity for _, capacity in self.tiers),
+                'interval': self.interval, 'tiers': [list(tier) for tier in self.tiers]}
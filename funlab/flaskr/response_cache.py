@@ -0,0 +1,169 @@
+"""In-memory page and fragment cache for rendered responses."""
+from __future__ import annotations
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import wraps
+from typing import Callable, Iterable
+
+from flask import Response, current_app, request, session
+from flask_login import current_user
+
+from funlab.flaskr.turbo import turbo_frame
+
+_UNCACHED_HEADERS = frozenset(('set-cookie', 'content-length', 'etag', 'date'))
+
+
+@dataclass(frozen=True)
+class CachedResponse:
+    body: bytes
+    status: int
+    headers: tuple
+    etag: str
+    expires: float
+
+    @property
+    def size(self) -> int:
+        return len(self.body) + 256  # rough per-entry overhead
+
+    def to_response(self) -> Response:
+        response = Response(self.body, status=self.status, headers=list(self.headers))
+        response.set_etag(self.etag)
+        return response.make_conditional(request)
+
+
+class ResponseCache:
+    """Thread-safe LRU of rendered pages bounded by total bytes, with per-entry TTL.
+
+    Keys are built by :meth:`make_key` from the request path, selected query arguments and the
+    caller's scope: anonymous visitors share one entry, authenticated users get their own entry
+    (the banner renders the username) unless a view opts into ``scope='policy'``, which shares
+    entries between users whose evaluated policies are identical.
+    """
+
+    def __init__(self, max_bytes: int = 32 * 1024 * 1024, default_ttl: float = 60):
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_bytes // 8
+        self.default_ttl = default_ttl
+        self._entries: OrderedDict[tuple, CachedResponse] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_config(cls, config) -> ResponseCache:
+        return cls(max_bytes=int(config.get('RESPONSE_CACHE_MAX_BYTES', 32 * 1024 * 1024)),
+                   default_ttl=float(config.get('RESPONSE_CACHE_TTL', 60)))
+
+    def get(self, key: tuple) -> CachedResponse | None:
+        with self._lock:
+            if (entry := self._entries.get(key)) is None:
+                self.misses += 1
+                return None
+            if entry.expires <= time.monotonic():
+                self._remove(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def set(self, key: tuple, body: bytes, status: int = 200, headers: Iterable = (),
+            ttl: float = None) -> CachedResponse:
+        entry = CachedResponse(body=body, status=status, headers=tuple(headers),
+                               etag=hashlib.sha1(body).hexdigest(),
+                               expires=time.monotonic() + (self.default_ttl if ttl is None else ttl))
+        if entry.size > self.max_entry_bytes:
+            return entry
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = entry
+            self._bytes += entry.size
+            while self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+        return entry
+
+    def _remove(self, key: tuple):
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'entries': len(self._entries), 'bytes': self._bytes, 'max_bytes': self.max_bytes,
+                    'hits': self.hits, 'misses': self.misses}
+
+    @staticmethod
+    def make_key(*parts, query_args: Iterable[str] = (), policies: Iterable[Callable] = (),
+                 scope: str = 'user', path: bool = True) -> tuple:
+        """Build a cache key for the current request.
+
+        Args:
+            parts: extra discriminators, e.g. a template name.
+            query_args: query arguments the output depends on; ``layout`` is always included,
+                as is the requested Turbo Frame.
+            policies: policy callables evaluated against ``current_user`` for the key.
+            scope: 'user' keys authenticated users by id, 'policy' only by policy results.
+            path: include ``request.path``; disable for path-independent fragments like error pages.
+        """
+        args = tuple((name, request.args.get(name)) for name in sorted({'layout', *query_args}))
+        if not getattr(current_user, 'is_authenticated', False):
+            identity = ('anonymous',)
+        else:
+            identity = ('policy',) if scope == 'policy' else ('user', current_user.get_id())
+            identity += tuple(bool(policy(current_user)) for policy in policies)
+        # a Turbo Frame request renders the page content only
+        return (request.path if path else None, args, identity, turbo_frame()) + parts
+
+    def get_or_render(self, key: tuple, render: Callable[[], str], ttl: float = None) -> str:
+        """Return a cached rendered fragment, rendering and storing it on a miss."""
+        if (entry := self.get(key)) is None:
+            entry = self.set(key, render().encode('utf-8'), ttl=ttl)
+        return entry.body.decode('utf-8')
+
+
+def _is_cacheable(response: Response) -> bool:
+    # a streamed page (STREAM_TEMPLATES) would have to be buffered whole to be stored
+    if response.status_code != 200 or response.is_streamed or response.direct_passthrough \
+            or 'Set-Cookie' in response.headers:
+        return False
+    cache_control = response.cache_control
+    return not (cache_control.no_store or cache_control.private)
+
+
+def cached_view(ttl: float = None, query_args: Iterable[str] = (), policies: Iterable[Callable] = (),
+                scope: str = 'user'):
+    """Cache a view's rendered 200 response in ``current_app.response_cache``.
+
+    Place it below access decorators such as ``policy_required`` so authorization still runs on
+    every request. Does nothing when the app has no response cache, for non-GET requests and when
+    flashed messages are pending (the layout renders them).
+    """
+    policies = tuple(policies)
+
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            cache: ResponseCache = getattr(current_app, 'response_cache', None)
+            if cache is None or request.method not in ('GET', 'HEAD') or session.get('_flashes'):
+                return func(*args, **kwargs)
+            key = cache.make_key(query_args=query_args, policies=policies, scope=scope)
+            if (entry := cache.get(key)) is None:
+                response = current_app.make_response(func(*args, **kwargs))
+                if not _is_cacheable(response):
+                    return response
+                headers = [(name, value) for name, value in response.headers.items()
+                           if name.lower() not in _UNCACHED_HEADERS]
+                entry = cache.set(key, response.get_data(), response.status_code, headers, ttl=ttl)
+            return entry.to_response()
+        return wrapper
+    return decorator
@@ -0,0 +1,196 @@
+"""WSGI static file fast path with an in-memory cache of small hot files."""
+from __future__ import annotations
+
+import gzip
+import mimetypes
+import os
+import stat as stat_module
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Callable
+
+from werkzeug.http import http_date, is_resource_modified, parse_accept_header
+from werkzeug.security import safe_join
+from werkzeug.wsgi import FileWrapper
+
+_COMPRESSIBLE = ('text/', 'application/javascript', 'application/json', 'image/svg+xml', 'application/xml')
+
+
+@dataclass
+class _StaticEntry:
+    filename: str
+    size: int
+    mtime: float
+    last_modified: datetime
+    etag: str
+    headers: list
+    checked: float
+    body: bytes = None
+    gzip_body: bytes = None
+    gzip_etag: str = None
+    gzip_headers: list = None
+
+
+class StaticFiles:
+    """Serve ``url_prefix`` files from ``directory`` before the request reaches Flask routing.
+
+    File metadata (stat, content type, ETag) is cached and re-checked every ``check_interval``
+    seconds. Files up to ``max_file_bytes`` are kept in memory, and gzip-compressed once for
+    text types, within a ``max_cache_bytes`` LRU budget. Larger files are streamed with the
+    server's ``wsgi.file_wrapper`` (sendfile on gunicorn) or, with ``accel_prefix``, handed to
+    the front proxy through ``X-Accel-Redirect``. Range requests, unknown files and other
+    methods fall through to Flask unchanged.
+    """
+
+    def __init__(self, wsgi_app: Callable, directory: str, url_prefix: str = '/static/',
+                 max_cache_bytes: int = 64 * 1024 * 1024, max_file_bytes: int = 256 * 1024,
+                 max_age: int = None, check_interval: float = 2.0, accel_prefix: str = None,
+                 compress: bool = True):
+        self.wsgi_app = wsgi_app
+        self.directory = os.path.abspath(directory)
+        self.url_prefix = url_prefix.rstrip('/') + '/'
+        self.max_cache_bytes = max_cache_bytes
+        self.max_file_bytes = max_file_bytes
+        self.cache_control = f'public, max-age={max_age}' if max_age else 'no-cache'
+        self.check_interval = check_interval
+        self.accel_prefix = accel_prefix.rstrip('/') + '/' if accel_prefix else None
+        self.compress = compress
+        self._entries: OrderedDict[str, _StaticEntry] = OrderedDict()
+        self._max_entries = 20000
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    @classmethod
+    def from_config(cls, wsgi_app: Callable, directory: str, url_prefix: str, config) -> StaticFiles:
+        return cls(wsgi_app, directory, url_prefix,
+                   max_cache_bytes=int(config.get('STATIC_CACHE_MAX_BYTES', 64 * 1024 * 1024)),
+                   max_file_bytes=int(config.get('STATIC_CACHE_MAX_FILE_BYTES', 256 * 1024)),
+                   max_age=config.get('STATIC_MAX_AGE', None),
+                   check_interval=float(config.get('STATIC_CHECK_INTERVAL', 2.0)),
+                   accel_prefix=config.get('STATIC_ACCEL_REDIRECT', None),
+                   compress=bool(config.get('STATIC_GZIP', True)))
+
+    def __call__(self, environ: dict, start_response: Callable):
+        path = environ.get('PATH_INFO', '')
+        if (not path.startswith(self.url_prefix) or environ.get('REQUEST_METHOD') not in ('GET', 'HEAD')
+                or 'HTTP_RANGE' in environ):
+            return self.wsgi_app(environ, start_response)
+        relative = path[len(self.url_prefix):]
+        if (filename := safe_join(self.directory, relative)) is None or (entry := self._entry(filename)) is None:
+            return self.wsgi_app(environ, start_response)
+
+        # the gzip variant has its own ETag, so caches never answer one encoding's validator with the other
+        use_gzip = (entry.gzip_body is not None
+                    and parse_accept_header(environ.get('HTTP_ACCEPT_ENCODING')).quality('gzip') > 0)
+        etag, headers = (entry.gzip_etag, entry.gzip_headers) if use_gzip else (entry.etag, entry.headers)
+        if not is_resource_modified(environ, etag=etag, last_modified=entry.last_modified):
+            with self._lock:
+                self.not_modified += 1
+            start_response('304 Not Modified', [h for h in headers if h[0] != 'Content-Type'])
+            return []
+
+        headers = list(headers)
+        if entry.body is not None:
+            body = entry.gzip_body if use_gzip else entry.body
+            headers.append(('Content-Length', str(len(body))))
+            start_response('200 OK', headers)
+            return [] if environ['REQUEST_METHOD'] == 'HEAD' else [body]
+
+        if self.accel_prefix:
+            headers.append(('X-Accel-Redirect', self.accel_prefix + relative))
+            start_response('200 OK', headers)
+            return []
+        headers.append(('Content-Length', str(entry.size)))
+        if environ['REQUEST_METHOD'] == 'HEAD':
+            start_response('200 OK', headers)
+            return []
+        try:
+            file = open(filename, 'rb')
+        except OSError:
+            return self.wsgi_app(environ, start_response)
+        start_response('200 OK', headers)
+        return environ.get('wsgi.file_wrapper', FileWrapper)(file, 64 * 1024)
+
+    def _entry(self, filename: str) -> _StaticEntry | None:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(filename)
+            if entry is not None:
+                self._entries.move_to_end(filename)
+                if now - entry.checked < self.check_interval:
+                    self.hits += 1
+                    return entry
+        try:
+            stat = os.stat(filename)
+        except OSError:
+            stat = None
+        if stat is None or not stat_module.S_ISREG(stat.st_mode):
+            if entry is not None:
+                with self._lock:
+                    # another request may have dropped it, or cached a newer entry, meanwhile
+                    if self._entries.get(filename) is entry:
+                        self._drop(filename)
+            return None
+        if entry is not None and entry.mtime == stat.st_mtime and entry.size == stat.st_size:
+            entry.checked = now
+            with self._lock:
+                self.hits += 1
+            return entry
+        with self._lock:
+            self.misses += 1
+        return self._load(filename, stat, now)
+
+    def _load(self, filename: str, stat: os.stat_result, now: float) -> _StaticEntry:
+        mimetype, encoding = mimetypes.guess_type(filename)
+        mimetype = mimetype or 'application/octet-stream'
+        content_type = f'{mimetype}; charset=utf-8' if mimetype.startswith('text/') else mimetype
+        etag = f'{stat.st_mtime_ns:x}-{stat.st_size:x}'
+        last_modified = datetime.fromtimestamp(stat.st_mtime, timezone.utc)
+        headers = [('Content-Type', content_type), ('ETag', f'"{etag}"'),
+                   ('Last-Modified', http_date(last_modified)), ('Cache-Control', self.cache_control)]
+        if encoding:
+            headers.append(('Content-Encoding', encoding))
+        entry = _StaticEntry(filename=filename, size=stat.st_size, mtime=stat.st_mtime,
+                             last_modified=last_modified, etag=etag,
+                             headers=headers, checked=now)
+        if stat.st_size <= self.max_file_bytes:
+            try:
+                with open(filename, 'rb') as f:
+                    entry.body = f.read()
+            except OSError:
+                entry.body = None
+            if (entry.body is not None and self.compress and not encoding and len(entry.body) >= 1024
+                    and mimetype.startswith(_COMPRESSIBLE)):
+                compressed = gzip.compress(entry.body, compresslevel=6, mtime=0)
+                if len(compressed) < len(entry.body):
+                    headers.append(('Vary', 'Accept-Encoding'))
+                    entry.gzip_body, entry.gzip_etag = compressed, f'{etag}-gz'
+                    entry.gzip_headers = [('ETag', f'"{entry.gzip_etag}"') if name == 'ETag' else (name, value)
+                                          for name, value in headers] + [('Content-Encoding', 'gzip')]
+        with self._lock:
+            if filename in self._entries:
+                self._drop(filename)
+            self._entries[filename] = entry
+            self._bytes += self._entry_bytes(entry)
+            while self._entries and (self._bytes > self.max_cache_bytes or len(self._entries) > self._max_entries):
+                self._drop(next(iter(self._entries)))
+        return entry
+
+    @staticmethod
+    def _entry_bytes(entry: _StaticEntry) -> int:
+        return len(entry.body or b'') + len(entry.gzip_body or b'')
+
+    def _drop(self, filename: str):
+        entry = self._entries.pop(filename)
+        self._bytes -= self._entry_bytes(entry)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'entries': len(self._entries), 'bytes': self._bytes, 'max_bytes': self.max_cache_bytes,
+                    'hits': self.hits, 'misses': self.misses, 'not_modified': self.not_modified}
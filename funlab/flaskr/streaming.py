@@ -0,0 +1,75 @@
+"""Streaming template rendering that sends ``<head>`` before the body is rendered."""
+from __future__ import annotations
+
+import sys
+from typing import Iterator
+
+from flask import Response, current_app, render_template, stream_with_context
+from flask.signals import before_render_template, template_rendered
+
+DEFAULT_CHUNK_SIZE = 8192
+STREAM_ERROR_FRAGMENT = ('<div class="alert alert-danger m-3" role="alert">'
+                         'An error occurred while rendering this page. Please reload.</div>')
+
+
+def _read_head(chunks: Iterator[str]) -> str:
+    """Render up to and including ``</head>``; the whole output for templates without one."""
+    head = []
+    for chunk in chunks:
+        head.append(chunk)
+        if '</head>' in chunk:
+            break
+    return ''.join(head)
+
+
+def _stream_body(app, template, context: dict, head: str, chunks: Iterator[str], chunk_size: int) -> Iterator[str]:
+    yield head
+    buffer, size = [], 0
+    try:
+        for chunk in chunks:
+            buffer.append(chunk)
+            size += len(chunk)
+            if size >= chunk_size:
+                yield ''.join(buffer)
+                buffer, size = [], 0
+    except Exception as error:
+        # Status and headers are already on the wire: log, show what rendered plus a notice,
+        # then re-raise so the server aborts the response instead of completing it normally.
+        app.log_exception(sys.exc_info())
+        if metrics := getattr(app, 'request_metrics', None):
+            metrics.record_exception(error)
+        yield ''.join(buffer) + STREAM_ERROR_FRAGMENT
+        raise
+    if buffer:
+        yield ''.join(buffer)
+    template_rendered.send(app, _async_wrapper=app.ensure_sync, template=template, context=context)
+
+
+def stream_page(template_name_or_list, **context) -> Response:
+    """Render a template as a streamed response.
+
+    The ``<head>`` part (CSS links, ``view_layouts_base_html_head`` hook output) is rendered before
+    this returns, so errors there still reach the regular error handlers, and is sent as the
+    first chunk. The body follows in chunks of ``STREAM_CHUNK_SIZE`` characters as it renders.
+    """
+    app = current_app._get_current_object()
+    template = app.jinja_env.get_or_select_template(template_name_or_list)
+    app.update_template_context(context)
+    before_render_template.send(app, _async_wrapper=app.ensure_sync, template=template, context=context)
+    chunks = template.generate(context)
+    head = _read_head(chunks)
+    chunk_size = int(app.config.get('STREAM_CHUNK_SIZE', DEFAULT_CHUNK_SIZE))
+    body = _stream_body(app, template, context, head, chunks, chunk_size)
+    return Response(stream_with_context(body), mimetype='text/html')
+
+
+def render_page(template_name_or_list, stream: bool = None, **context) -> Response | str:
+    """Render a page, streamed when ``stream`` or the ``STREAM_TEMPLATES`` config is enabled.
+
+    Drop-in replacement of ``render_template`` for root_bp and plugin views.
+    """
+    if stream is None:
+        stream = current_app.config.get('STREAM_TEMPLATES', False)
+    if stream:
+        return stream_page(template_name_or_list, **context)
+    return render_template(template_name_or_list, **context)
@@ -0,0 +1,76 @@
+"""Turbo Frame partial rendering: answer frame navigations with the page content only."""
+from __future__ import annotations
+
+from functools import wraps
+from typing import TYPE_CHECKING, Iterable
+
+from flask import Response, has_request_context, request
+
+if TYPE_CHECKING:
+    from funlab.flaskr.app import FunlabFlask
+
+TURBO_FRAME_HEADER = 'Turbo-Frame'
+PAGE_FRAME = 'page_body'
+TURBO_SCRIPT = '/static/dist/libs/@hotwired/turbo/dist/turbo.es2017-esm.js'
+# before_request handlers that only prepare layout parts (menus) a frame response leaves out
+DEFAULT_PARTIAL_SKIP = ('set_global_variables',)
+
+
+def turbo_frame() -> str | None:
+    """Id of the Turbo Frame the current request was made for, ``None`` for regular requests."""
+    if not has_request_context():
+        return None
+    return request.headers.get(TURBO_FRAME_HEADER) or None
+
+
+class TurboSupport:
+    """Render Turbo Frame requests without the layout.
+
+    With Turbo loaded, ``layouts/base.html`` wraps the page header and body in
+    ``<turbo-frame id="page_body">`` and menu links target that frame. A request carrying the
+    ``Turbo-Frame`` header is rendered by the same view and template, but ``base.html`` outputs
+    only the frame (page header, body, page scripts), so menus, banner, settings panel, layout
+    hooks and shared scripts are skipped, together with the ``skip_before_request`` handlers that
+    prepare them. Frames declared inside a page body (``includes/turbo.html``) are served the same
+    way. Turbo Drive (full-body swaps) stays off unless ``drive`` is set.
+    """
+
+    def __init__(self, drive: bool = False, skip_before_request: Iterable[str] = DEFAULT_PARTIAL_SKIP):
+        self.drive = drive
+        self.skip_before_request = tuple(skip_before_request)
+        self.partial_responses = 0
+
+    @classmethod
+    def from_config(cls, config) -> TurboSupport:
+        return cls(drive=bool(config.get('TURBO_DRIVE', False)),
+                   skip_before_request=config.get('TURBO_PARTIAL_SKIP', DEFAULT_PARTIAL_SKIP))
+
+    def init_app(self, app: FunlabFlask):
+        app.context_processor(self._context)
+        app.after_request(self._after_request)
+        funcs = app.before_request_funcs.get(None, [])
+        app.before_request_funcs[None] = [self._full_page_only(func) if getattr(func, '__name__', None)
+                                          in self.skip_before_request else func for func in funcs]
+
+    @staticmethod
+    def _full_page_only(func):
+        @wraps(func)
+        def wrapper():
+            if turbo_frame() is None:
+                return func()
+            return None
+        return wrapper
+
+    def _context(self) -> dict:
+        return {'turbo_enabled': True, 'turbo_drive': self.drive, 'turbo_frame': turbo_frame(),
+                'turbo_script': TURBO_SCRIPT, 'turbo_page_frame': PAGE_FRAME}
+
+    def _after_request(self, response: Response) -> Response:
+        # the same URL renders a full page or a frame: keep shared caches from mixing them up
+        response.vary.add(TURBO_FRAME_HEADER)
+        if turbo_frame() is not None and response.mimetype == 'text/html':
+            self.partial_responses += 1
+        return response
+
+    def stats(self) -> dict:
+        return {'partial_responses': self.partial_responses}
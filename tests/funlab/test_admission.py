@@ -0,0 +1,85 @@
+import logging
+import threading
+import time
+import unittest
+
+from flask import Flask
+
+from funlab.flaskr.admission import CRITICAL, LOW, NORMAL, AdmissionController, TokenBucket
+
+
+class TestTokenBucket(unittest.TestCase):
+    def test_burst_then_refill(self):
+        bucket = TokenBucket(2)
+        now = bucket.updated
+        self.assertEqual([bucket.take(1, 2, now) for _ in range(2)], [0.0, 0.0])
+        self.assertAlmostEqual(bucket.take(1, 2, now), 1.0)
+        self.assertEqual(bucket.take(1, 2, now + 1), 0.0)
+        self.assertEqual(bucket.take(10, 2, now + 100), 0.0)
+        self.assertLessEqual(bucket.tokens, 1)  # refill capped at the burst
+
+
+class TestAdmissionController(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.mylogger = logging.getLogger(__name__)
+        self.app.logger.disabled = True
+        self.entered, self.finish = threading.Semaphore(0), threading.Event()
+        self.app.add_url_rule('/page', 'page', lambda: 'page')
+        self.app.add_url_rule('/health', 'health', lambda: 'ok')
+        self.app.add_url_rule('/slow', 'slow', self.slow)
+        self.client = self.app.test_client()
+
+    def slow(self):
+        self.entered.release()
+        self.finish.wait(2)
+        return 'slow'
+
+    def install(self, **kwargs):
+        self.admission = AdmissionController(**kwargs)
+        self.admission.init_app(self.app)
+        return self.admission
+
+    def test_classify(self):
+        admission = self.install()
+        self.assertEqual([admission.classify(path) for path in ('/health', '/plugin-manager/x', '/static/a.js',
+                                                                 '/notifications/poll', '/page')],
+                         [CRITICAL, CRITICAL, LOW, LOW, NORMAL])
+
+    def test_rate_limited_client_gets_503_with_retry_after(self):
+        admission = self.install(rate=1, burst=2, retry_after=7)
+        statuses = [self.client.get('/page').status_code for _ in range(3)]
+        response = self.client.get('/page', headers={'Accept': 'application/json'})
+        self.assertEqual(statuses, [200, 200, 503])
+        self.assertEqual((response.status_code, response.mimetype), (503, 'application/json'))
+        self.assertIn(response.headers['Retry-After'], ('1', '2'))  # time to the next token, not retry_after
+        self.assertEqual(response.headers['Cache-Control'], 'no-store')
+        self.assertEqual(self.client.get('/health').status_code, 200)  # critical paths are not rate limited
+        self.assertEqual(admission.stats()['shed_rate'], 2)
+
+    def test_concurrency_limit_admits_exactly_the_limit(self):
+        admission = self.install(max_concurrent=2, rate=0, retry_after=7)
+        responses = []
+        threads = [threading.Thread(target=lambda: responses.append(self.client.get('/slow'))) for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        self.assertTrue(all(self.entered.acquire(timeout=2) for _ in range(2)))
+        deadline = time.monotonic() + 2
+        while len(responses) < 4 and time.monotonic() < deadline:
+            time.sleep(0.005)
+        self.assertEqual(admission.stats()['in_flight'], 2)
+        self.assertEqual(self.client.get('/health').status_code, 200)  # critical requests still admitted
+        self.finish.set()
+        for thread in threads:
+            thread.join()
+        statuses = sorted(response.status_code for response in responses)
+        self.assertEqual(statuses, [200, 200, 503, 503, 503, 503])
+        shed = next(response for response in responses if response.status_code == 503)
+        self.assertEqual((shed.headers['Retry-After'], shed.mimetype), ('7', 'text/html'))
+        self.assertIn(b'unavailable', shed.data)  # no error-maintenance.html here: built-in page
+        self.assertEqual(admission.stats(), {'in_flight': 0, 'admitted': 3, 'clients': 0,
+                                             'shed_concurrency': 4, 'shed_rate': 0})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+from funlab.flaskr.asset_pruner import AssetTracer, copy_assets
+
+
+class TestAssetTracer(unittest.TestCase):
+    def setUp(self):
+        self.base = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.base)
+        files = {
+            'templates/base.html': '<link href="/static/css/site.css?1.0" rel="stylesheet">'
+                                   '<script src="/static/js/app.js"></script>'
+                                   '<img src="/static/avatars/{{ user.avatar }}">'
+                                   '<img src="/static/gone.svg">',
+            'templates/showcase_demo.html': '<img src="/static/photos/demo.jpg">',
+            'static/css/site.css': '@import "base.css"; .x { background: url("../img/bg.png"); }',
+            'static/css/base.css': 'body { background: url(data:image/png;base64,AAAA); }',
+            'static/img/bg.png': 'png',
+            'static/js/app.js': 'import { util } from "./util.js";',
+            'static/js/util.js': 'export const util = 1;',
+            'static/avatars/a.jpg': 'a',
+            'static/avatars/b.jpg': 'b',
+            'static/photos/demo.jpg': 'demo',
+            'static/libs/editor/editor.js': '',
+            'static/libs/editor/plugins/table.js': '',
+        }
+        for name, content in files.items():
+            path = self.base / name
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(content)
+
+    def test_trace(self):
+        manifest = AssetTracer(self.base / 'static', [self.base / 'templates']).trace()
+        self.assertEqual(sorted(manifest.used), ['avatars/a.jpg', 'avatars/b.jpg', 'css/base.css', 'css/site.css',
+                                                 'img/bg.png', 'js/app.js', 'js/util.js'])
+        self.assertIn('photos/demo.jpg', manifest.unused)
+        self.assertEqual(manifest.dynamic, ['avatars'])
+        self.assertEqual(list(manifest.missing), ['gone.svg'])
+        self.assertEqual((manifest.unresolved, manifest.possibly_used), ({}, {}))
+
+    def test_static_inside_other_path_not_a_reference(self):
+        (self.base / 'templates/events.js').write_text('new EventSource("/sse/static/photos/demo.jpg");'
+                                                       'const prefix = "/static/";')
+        manifest = AssetTracer(self.base / 'static', [self.base / 'templates']).trace()
+        self.assertIn('photos/demo.jpg', manifest.unused)
+        self.assertEqual((manifest.missing.keys(), manifest.unresolved), ({'gone.svg'}, {}))
+
+    def test_reference_without_literal_directory_marks_possibly_used(self):
+        (self.base / 'templates/loader.js').write_text("img.src = '/static/' + name;")
+        manifest = AssetTracer(self.base / 'static', [self.base / 'templates']).trace()
+        self.assertEqual(manifest.unresolved, {'': [str(self.base / 'templates/loader.js')]})
+        self.assertIn('photos/demo.jpg', manifest.possibly_used)
+        self.assertEqual(manifest.possibly_used, manifest.unused)
+
+    def test_unresolved_reference_narrowed_by_literal_start(self):
+        (self.base / 'templates/theme.html').write_text('<img src="/static/logo-{{ theme }}.svg">')
+        for name in ('logo-dark.svg', 'logo-light.svg', 'other.svg'):
+            (self.base / 'static' / name).write_text('<svg/>')
+        manifest = AssetTracer(self.base / 'static', [self.base / 'templates']).trace()
+        self.assertEqual(sorted(manifest.possibly_used), ['logo-dark.svg', 'logo-light.svg'])
+        self.assertIn('other.svg', manifest.unused)
+
+    def test_whole_dirs_and_keep(self):
+        (self.base / 'templates/editor.html').write_text('<script src="/static/libs/editor/editor.js"></script>')
+        manifest = AssetTracer(self.base / 'static', [self.base / 'templates'], whole_dirs=['libs/editor'],
+                               keep=['photos/*'], exclude=()).trace()
+        self.assertIn('libs/editor/plugins/table.js', manifest.used)
+        self.assertIn('photos/demo.jpg', manifest.used)
+
+    def test_copy_assets(self):
+        manifest = AssetTracer(self.base / 'static', [self.base / 'templates']).trace()
+        out = self.base / 'out'
+        copy_assets(manifest.root, manifest.used, out)
+        self.assertTrue((out / 'css/site.css').is_file())
+        self.assertFalse((out / 'photos').exists())
+
+
+if __name__ == '__main__':
+    unittest.main()
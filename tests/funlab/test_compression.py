@@ -0,0 +1,107 @@
+import gzip
+import unittest
+import zlib
+
+from flask import Flask, Response, stream_with_context
+
+from funlab.flaskr import compression
+from funlab.flaskr.compression import ResponseCompressor
+
+BODY = '<p>' + 'compressible text ' * 100 + '</p>'
+
+
+class TestResponseCompressor(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+
+        @self.app.route('/page')
+        def page():
+            response = Response(BODY, mimetype='text/html')
+            response.set_etag('v1')
+            return response
+
+        @self.app.route('/small')
+        def small():
+            return Response('<p>tiny</p>', mimetype='text/html')
+
+        @self.app.route('/image')
+        def image():
+            return Response(b'\x89PNG' + b'\0' * 2000, mimetype='image/png')
+
+        @self.app.route('/encoded')
+        def encoded():
+            return Response(gzip.compress(BODY.encode()), mimetype='text/html', headers={'Content-Encoding': 'gzip'})
+
+        @self.app.route('/stream')
+        def stream():
+            return Response(stream_with_context(f'<p>{"row " * 50}{i}</p>' for i in range(20)), mimetype='text/html')
+
+        self.client = self.app.test_client()
+
+    def install(self, **kwargs):
+        self.compressor = ResponseCompressor(algorithms=('gzip',), **kwargs)
+        self.compressor.init_app(self.app)
+
+    def get(self, path, encoding='gzip'):
+        return self.client.get(path, headers={'Accept-Encoding': encoding})
+
+    def test_gzip_round_trip_with_vary_and_weak_etag(self):
+        self.install()
+        response = self.get('/page')
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response.vary)
+        self.assertEqual(response.get_etag(), ('v1', True))
+        self.assertLess(response.content_length, len(BODY))
+        self.assertEqual(gzip.decompress(response.data).decode(), BODY)
+
+    def test_below_threshold_not_compressed(self):
+        self.install(min_size=500)
+        response = self.get('/small')
+        self.assertNotIn('Content-Encoding', response.headers)
+        self.assertEqual(response.data, b'<p>tiny</p>')
+
+    def test_not_accepted_encoding_sent_identity(self):
+        self.install()
+        for encoding in ('gzip;q=0', 'identity', ''):
+            response = self.get('/page', encoding)
+            self.assertNotIn('Content-Encoding', response.headers)
+            self.assertIn('Accept-Encoding', response.vary)  # the choice still depended on the header
+            self.assertEqual((response.data.decode(), response.get_etag()), (BODY, ('v1', False)))
+
+    def test_non_compressible_and_encoded_responses_skipped(self):
+        self.install()
+        image = self.get('/image')
+        self.assertNotIn('Content-Encoding', image.headers)
+        self.assertEqual(len(image.data), 2004)
+        encoded = self.get('/encoded')
+        self.assertEqual(gzip.decompress(encoded.data).decode(), BODY)  # not compressed twice
+
+    def test_stream_compressed_incrementally(self):
+        self.install(min_size=200)
+        response = self.get('/stream')
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertNotIn('Content-Length', response.headers)
+        chunks = list(response.response)
+        self.assertGreater(len([chunk for chunk in chunks if chunk]), 2)
+        decompressor = zlib.decompressobj(31)
+        first = decompressor.decompress(chunks[0])
+        self.assertTrue(first.startswith(b'<p>row '))  # readable before the stream ends
+        body = first + b''.join(decompressor.decompress(chunk) for chunk in chunks[1:])
+        self.assertEqual(body.decode(), ''.join(f'<p>{"row " * 50}{i}</p>' for i in range(20)))
+
+    def test_stream_left_alone_when_disabled(self):
+        self.install(stream=False)
+        response = self.get('/stream')
+        self.assertNotIn('Content-Encoding', response.headers)
+        self.assertTrue(response.data.startswith(b'<p>row '))
+
+    @unittest.skipIf(compression.brotli is None, 'brotli not installed')
+    def test_brotli_preferred_and_round_trips(self):
+        ResponseCompressor().init_app(self.app)
+        response = self.get('/page', 'gzip, br')
+        self.assertEqual(response.headers['Content-Encoding'], 'br')
+        self.assertEqual(compression.brotli.decompress(response.data).decode(), BODY)
+
+
+if __name__ == '__main__':
+    unittest.main()
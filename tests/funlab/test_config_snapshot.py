@@ -0,0 +1,48 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from funlab.flaskr.config_snapshot import REDACTED, ConfigSnapshot, ConfigSourceTracker, diff_config, redact
+
+
+class TestConfigSnapshot(unittest.TestCase):
+    def test_redact(self):
+        data = redact({'SECRET_KEY': 'abc', 'API_TOKEN': 'x', 'TITLE': 'FunLab', 'MONKEY': 'ok',
+                       'DATABASE': {'url': 'postgresql://admin:s3cret@db:5432/funlab', 'kwargs': {'echo': False}}})
+        self.assertEqual(data['SECRET_KEY'], REDACTED)
+        self.assertEqual(data['API_TOKEN'], REDACTED)
+        self.assertEqual(data['TITLE'], 'FunLab')
+        self.assertEqual(data['MONKEY'], 'ok')
+        self.assertEqual(data['DATABASE']['url'], f'postgresql://admin:{REDACTED}@db:5432/funlab')
+        self.assertFalse(data['DATABASE']['kwargs']['echo'])
+
+    def test_snapshot_is_read_only(self):
+        snapshot = ConfigSnapshot.build('digest', {'A': {'items': [1, 2]}}, {'SECRET_KEY': 'abc'})
+        with self.assertRaises(TypeError):
+            snapshot.data['A']['new'] = 1
+        self.assertEqual(snapshot.data['A']['items'], (1, 2))
+        self.assertEqual(snapshot.app_config['SECRET_KEY'], REDACTED)
+
+    def test_diff_and_changed_sections(self):
+        old = {'FunlabFlask': {'TITLE': 'a'}, 'PluginA': {'token': 'x', 'n': 1}, 'PluginB': {'n': 1}}
+        new = {'FunlabFlask': {'TITLE': 'a'}, 'PluginA': {'token': 'y', 'n': 1}, 'PluginC': {'n': 1}}
+        self.assertEqual(diff_config(old, new),
+                         {'added': ['PluginC'], 'removed': ['PluginB'], 'changed': ['PluginA.token']})
+        before = ConfigSnapshot.build('1', old, {})
+        after = ConfigSnapshot.build('2', new, {})
+        # secret values are redacted in data but still detected as changes
+        self.assertEqual(after.changed_sections(before), {'PluginA', 'PluginB', 'PluginC'})
+        self.assertEqual(after.diff(before)['changed'], ['PluginA.token'])
+
+    def test_source_tracker(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            config = Path(tmp, 'config.toml')
+            config.write_text('[A]\nx = 1\n')
+            tracker = ConfigSourceTracker([config, None])
+            self.assertIsNone(tracker.changed())
+            config.write_text('[A]\nx = 2\n')
+            self.assertIsNotNone(tracker.changed())
+
+
+if __name__ == '__main__':
+    unittest.main()
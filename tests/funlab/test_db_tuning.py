@@ -0,0 +1,111 @@
+import datetime
+import logging
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+
+from funlab.core.config import Config
+from funlab.core.dbmgr import DbMgr
+from sqlalchemy.pool import NullPool, QueuePool
+
+from funlab.flaskr.db_tuning import DatabaseTuning, _evaluate
+
+
+class TestDatabaseTuning(unittest.TestCase):
+    def setUp(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.url = f"sqlite:///{Path(tmpdir.name, 'test.db')}"
+
+    def install(self, url, logger=None, **sections):
+        dbmgr = DbMgr(Config({'url': url, **sections}))
+        tuning = DatabaseTuning.from_config(dbmgr.config)
+        engine = tuning.install(dbmgr, logger)
+        self.addCleanup(engine.dispose)
+        return tuning, dbmgr, engine
+
+    def test_file_sqlite_pool_and_pragmas(self):
+        tuning, dbmgr, engine = self.install(self.url, pool={'size': 3, 'max_overflow': 0, 'pre_ping': True},
+                                             sqlite={'journal_mode': 'WAL', 'busy_timeout': 4000})
+        self.assertIs(dbmgr.get_db_engine(), engine)
+        self.assertIsInstance(engine.pool, QueuePool)
+        self.assertEqual(engine.pool.size(), 3)
+        with engine.connect() as connection:
+            self.assertEqual(connection.exec_driver_sql('PRAGMA journal_mode').scalar(), 'wal')
+            self.assertEqual(connection.exec_driver_sql('PRAGMA busy_timeout').scalar(), 4000)
+        stats = tuning.stats()
+        self.assertEqual((stats['checkouts'], stats['pool_size'], stats['pool_checked_out']), (1, 3, 0))
+
+    def test_sessions_rebound_to_the_tuned_engine(self):
+        dbmgr = DbMgr(Config({'url': self.url, 'pool': {'size': 2}}))
+        old = dbmgr.get_db_session().get_bind()  # a session factory already bound to DbMgr's engine
+        engine = DatabaseTuning.from_config(dbmgr.config).install(dbmgr)
+        self.addCleanup(engine.dispose)
+        self.assertIsNot(engine, old)
+        sessions = [dbmgr.get_db_session()]
+        thread = threading.Thread(target=lambda: sessions.append(dbmgr.get_db_session()))
+        thread.start()
+        thread.join()
+        self.assertEqual([session.get_bind() for session in sessions], [engine, engine])
+
+    def test_readers_proceed_during_write(self):
+        _, _, engine = self.install(self.url, pool={'size': 2}, sqlite={'journal_mode': 'WAL', 'busy_timeout': 1000})
+        with engine.begin() as connection:
+            connection.exec_driver_sql('CREATE TABLE t (x INTEGER)')
+        written, read = threading.Event(), []
+        with engine.connect() as writer:
+            writer.exec_driver_sql('INSERT INTO t VALUES (1)')  # open write transaction
+
+            def reader():
+                with engine.connect() as connection:
+                    read.append(connection.exec_driver_sql('SELECT count(*) FROM t').scalar())
+                written.set()
+            thread = threading.Thread(target=reader)
+            thread.start()
+            self.assertTrue(written.wait(2))
+            thread.join()
+            writer.commit()
+        self.assertEqual(read, [0])
+
+    def test_memory_sqlite_keeps_its_pool(self):
+        tuning, _, engine = self.install('sqlite://', pool={'size': 3}, sqlite={'cache_size': -1024})
+        self.assertEqual(tuning.engine_options(engine.url), {})
+        self.assertNotIsInstance(engine.pool, QueuePool)
+        with engine.connect() as connection:
+            self.assertEqual(connection.exec_driver_sql('PRAGMA cache_size').scalar(), -1024)
+
+    def test_expression_arguments_kept_on_recreated_engine(self):
+        tuning, _, engine = self.install(self.url, pool={'size': 2},
+                                         connect_args={'detect_types': '@int("1") | 2', 'timeout': 7})
+        self.assertEqual(tuning.stats()['pool_applied'], 1)
+        connection = engine.raw_connection()
+        try:
+            value = connection.cursor().execute('SELECT \'2020-01-02\' AS "d [date]"').fetchone()[0]
+        finally:
+            connection.close()
+        self.assertEqual(value, datetime.date(2020, 1, 2))  # detect_types still passed to sqlite3
+
+    def test_evaluate_imports_named_modules(self):
+        import sqlite3
+        self.assertEqual(_evaluate('@sqlite3.PARSE_DECLTYPES | sqlite3.PARSE_COLNAMES'),
+                         sqlite3.PARSE_DECLTYPES | sqlite3.PARSE_COLNAMES)
+        self.assertEqual(_evaluate('WAL'), 'WAL')
+
+    def test_unevaluable_arguments_keep_dbmgr_engine(self):
+        # 'sa' only resolves inside DbMgr's module
+        with self.assertLogs('db-tuning-test', logging.WARNING) as logs:
+            tuning, dbmgr, engine = self.install(self.url, logging.getLogger('db-tuning-test'), pool={'size': 2},
+                                                 kwargs={'poolclass': '@sa.pool.NullPool'}, connect_args={'timeout': 7})
+        self.assertIsInstance(engine.pool, NullPool)
+        self.assertIs(dbmgr.get_db_engine(), engine)
+        self.assertEqual(tuning.stats()['pool_applied'], 0)
+        self.assertIn('pool options not applied', logs.output[0])
+
+    def test_unknown_option(self):
+        with self.assertRaises(ValueError):
+            DatabaseTuning(pool={'sise': 5})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import threading
+import unittest
+
+from funlab.flaskr.error_storm import ErrorAggregator, error_fingerprint
+
+
+def _fail(value):
+    raise ValueError(f'bad value {value}')
+
+
+def _raise(func, *args):
+    try:
+        func(*args)
+    except Exception as error:
+        return error
+
+
+class TestErrorAggregator(unittest.TestCase):
+    def test_fingerprint_ignores_message(self):
+        first, second = _raise(_fail, 1), _raise(_fail, 2)
+        self.assertEqual(error_fingerprint(first), error_fingerprint(second))
+        self.assertNotEqual(error_fingerprint(first), error_fingerprint(_raise(int, 'x')))
+
+    def test_samples_limited_per_window(self):
+        aggregator = ErrorAggregator(sample_limit=3, window=60)
+        samples = [aggregator.record(_raise(_fail, idx))[1] for idx in range(10)]
+        self.assertEqual(samples, [True] * 3 + [False] * 7)
+        record = aggregator.top()[0]
+        self.assertEqual((record['count'], record['suppressed']), (10, 7))
+        self.assertEqual(record['exc_type'], 'ValueError')
+        self.assertEqual(record['message'], 'bad value 0')
+
+    def test_first_sample_stores_stack_without_message(self):
+        aggregator = ErrorAggregator(sample_limit=1)
+        record, _ = aggregator.record(_raise(_fail, 'secret'))
+        self.assertIn('_fail', record.stack)
+        self.assertNotIn('secret', record.stack)
+        self.assertIn('bad value secret', record.trace)
+
+    def test_stack_set_before_storm_hits(self):
+        aggregator = ErrorAggregator(sample_limit=1)
+        errors = [_raise(_fail, idx) for idx in range(40)]
+        stacks = []
+        threads = [threading.Thread(target=lambda e=e: stacks.append(aggregator.record(e)[0].stack)) for e in errors]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(stacks), 40)
+        self.assertNotIn(None, stacks)
+
+    def test_window_resets_sampling(self):
+        aggregator = ErrorAggregator(sample_limit=1, window=0)
+        self.assertTrue(all(aggregator.record(_raise(_fail, idx))[1] for idx in range(3)))
+
+    def test_max_fingerprints(self):
+        aggregator = ErrorAggregator(max_fingerprints=1)
+        aggregator.record(_raise(_fail, 1))
+        aggregator.record(_raise(int, 'x'))
+        self.assertEqual(aggregator.stats(), {'fingerprints': 1, 'total': 2, 'suppressed': 0})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,195 @@
+import logging
+import threading
+import unittest
+
+from flask import Flask, request
+from flask_login import LoginManager, UserMixin, current_user, login_user
+
+from funlab.flaskr.hooks import (CALLER_RUNS, AsyncHookExecutor, HookDispatcher, LazyHookContext, ModelSnapshot,
+                                 RequestSnapshot, UserSnapshot, async_hook, hook_needs, hook_registry,
+                                 snapshot_context)
+
+
+class _User(UserMixin):
+    def __init__(self, id, username):
+        self.id = id
+        self.username = username
+        self.role = 'admin'
+        self.password_hash = 'secret'
+
+
+class _HookManager:
+    def __init__(self):
+        self._hooks = {}
+
+    def register_hook(self, hook_name, callback, priority=100, plugin_name=None):
+        self._hooks.setdefault(hook_name, []).append(
+            {'callback': callback, 'priority': priority, 'plugin_name': plugin_name})
+
+    def call_hook(self, hook_name, **context):
+        return [entry['callback'](context) for entry in self._hooks.get(hook_name, [])]
+
+
+class TestAsyncHookExecutor(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.mylogger = logging.getLogger(__name__)
+        self.hook_manager = _HookManager()
+        self.executor = AsyncHookExecutor(self.app, workers=1, queue_size=10)
+        self.addCleanup(self.executor.stop)
+
+    def test_marked_callback_runs_in_background(self):
+        threads = []
+
+        @async_hook
+        def record(context):
+            threads.append((threading.current_thread().name, context['request']))
+
+        self.hook_manager.register_hook('controller_after_request', record, plugin_name='P')
+        self.executor.install(self.hook_manager)
+        with self.app.test_request_context('/page'):
+            self.assertEqual(self.hook_manager.call_hook('controller_after_request', request=request), [None])
+        self.executor.stop()
+        name, snapshot = threads[0]
+        self.assertTrue(name.startswith('funlab-hook'))
+        self.assertIsInstance(snapshot, RequestSnapshot)
+        self.assertEqual(snapshot.path, '/page')
+
+    def test_mode_argument_and_error_isolation(self):
+        self.executor.install(self.hook_manager)
+
+        def fail(context):
+            raise ValueError('boom')
+
+        self.hook_manager.register_hook('task_after_execute', fail, mode='async', plugin_name='P')
+        self.hook_manager.call_hook('task_after_execute', task_name='t')
+        self.executor.stop()
+        self.assertEqual(self.executor.stats()['failed'], 1)
+
+    def test_view_hooks_stay_synchronous(self):
+        self.executor.install(self.hook_manager)
+        self.hook_manager.register_hook('view_layouts_base_html_head', async_hook(lambda context: '<!-- x -->'))
+        self.assertEqual(self.hook_manager.call_hook('view_layouts_base_html_head'), ['<!-- x -->'])
+
+    def test_caller_runs_when_full(self):
+        executor = AsyncHookExecutor(self.app, workers=1, queue_size=1, policy=CALLER_RUNS)
+        self.addCleanup(executor.stop)
+        started, gate, ran = threading.Event(), threading.Event(), []
+        executor.submit('h', None, lambda context: started.set() or gate.wait(1), {})
+        started.wait(1)  # worker busy, next item fills the queue
+        executor.submit('h', None, lambda context: gate.wait(1), {})
+        executor.submit('h', None, lambda context: ran.append(threading.current_thread()), {})
+        gate.set()
+        self.assertEqual(ran, [threading.current_thread()])
+        self.assertEqual(executor.stats()['caller_runs'], 1)
+
+    def test_snapshot_context(self):
+        with self.app.test_request_context('/x', method='POST'):
+            snapshot = snapshot_context({'request': request, 'value': 1})
+        self.assertEqual((snapshot['request'].method, snapshot['value']), ('POST', 1))
+
+    def test_snapshot_context_copies_user_fields(self):
+        self.app.secret_key = 'test'
+        LoginManager(self.app).user_loader(lambda user_id: None)
+        with self.app.test_request_context('/x'):
+            anonymous = snapshot_context({'current_user': current_user})['current_user']
+            login_user(_User(7, 'ann'))
+            user = snapshot_context({'current_user': current_user})['current_user']
+        self.assertEqual(user, UserSnapshot(7, 'ann', 'admin', True, True, False))
+        self.assertEqual((user.get_id(), str(user)), ('7', 'ann'))
+        self.assertFalse(hasattr(user, 'password_hash'))  # only plain fields cross to the worker
+        self.assertEqual((anonymous.get_id(), anonymous.is_authenticated, anonymous.is_anonymous), (None, False, True))
+
+    def test_snapshot_context_copies_model_columns(self):
+        from sqlalchemy import Column, Integer, String, create_engine
+        from sqlalchemy.orm import Session, declarative_base, deferred
+
+        class Note(declarative_base()):
+            __tablename__ = 'note'
+            id = Column(Integer, primary_key=True)
+            title = Column(String)
+            body = deferred(Column(String))
+
+        engine = create_engine('sqlite://')
+        Note.metadata.create_all(engine)
+        with Session(engine) as session:
+            session.add(Note(id=1, title='hello', body='text'))
+            session.commit()
+            note = session.get(Note, 1)
+            pending = Note(title='new')
+            snapshot = snapshot_context({'model': note, 'pending': pending, 'model_class': Note})
+        model = snapshot['model']
+        self.assertIsInstance(model, ModelSnapshot)
+        self.assertEqual((model.id, model.title, model.identity, str(model)), (1, 'hello', (1,), '<Note (1,)>'))
+        self.assertFalse(hasattr(model, 'body'))  # deferred, not loaded by the snapshot
+        self.assertEqual((snapshot['pending'].values, str(snapshot['pending'])), ({'title': 'new'}, '<Note (pending)>'))
+        self.assertIs(snapshot['model_class'], Note)
+
+
+class TestLazyHookContext(unittest.TestCase):
+    def test_values_built_once_on_access(self):
+        calls = []
+        context = LazyHookContext({'given': 1}, {'user': lambda: calls.append(1) or 'alice', 'given': lambda: 2})
+        self.assertIn('user', context)
+        self.assertEqual(calls, [])
+        self.assertEqual((context['user'], context.get('user'), context['given']), ('alice', 'alice', 1))
+        self.assertEqual(calls, [1])
+        self.assertEqual(context.computed, {'given', 'user'})
+
+    def test_written_values_replace_factories(self):
+        context = LazyHookContext(factories={'start_time': lambda: 0})
+        context['start_time'] = 5
+        self.assertEqual(dict(context), {'start_time': 5})
+        self.assertIsNone(context.get('missing'))
+
+
+class TestHookDispatcher(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.mylogger = logging.getLogger(__name__)
+        self.hook_manager = _HookManager()
+        self.built = []
+        factories = {'request': lambda: self.built.append('request') or 'req',
+                     'current_user': lambda: self.built.append('current_user') or 'user'}
+        self.dispatcher = HookDispatcher(self.app, self.hook_manager, factories)
+
+    def test_hook_without_callbacks_builds_nothing(self):
+        self.assertEqual(self.dispatcher.render('view_layouts_base_html_head'), '')
+        self.assertEqual((self.built, self.dispatcher.stats()['empty_calls']), ([], 1))
+
+    def test_render_by_priority_and_isolate_errors(self):
+        self.hook_manager.register_hook('view_x', lambda context: f"<b>{context['current_user']}</b>", priority=20)
+        self.hook_manager.register_hook('view_x', lambda context: 1 / 0, priority=5)
+        self.hook_manager.register_hook('view_x', lambda context: f"<i>{context['current_user']}</i>", priority=10)
+        self.assertEqual(self.dispatcher.render('view_x'), '<i>user</i><b>user</b>')
+        self.assertEqual(self.built, ['current_user'])
+
+    def test_declared_needs_limit_the_context(self):
+        self.hook_manager.register_hook('view_x', hook_needs()(lambda context: str(context.get('request'))))
+        self.assertEqual(self.dispatcher.render('view_x'), 'None')
+        self.assertEqual(self.built, [])
+
+    def test_installed_call_hook_builds_context_lazily(self):
+        task_name = hook_needs('task_name')(lambda context: context['task_name'])
+        self.hook_manager.register_hook('task_after_execute', task_name)
+        self.hook_manager.register_hook('controller_after_request', lambda context: context['current_user'])
+        self.dispatcher.install()
+        self.assertEqual(self.hook_manager.call_hook('task_after_execute', task_name='t'), ['t'])
+        self.assertEqual(self.hook_manager.call_hook('model_after_save', model=None), [])
+        self.assertEqual(self.built, [])
+        self.assertEqual(self.hook_manager.call_hook('controller_after_request'), ['user'])
+        self.assertEqual(self.built, ['current_user'])
+
+    def test_manager_without_registry_rejected(self):
+        class Manager:
+            def get_hooks(self):
+                return {'view_x': []}
+        self.assertEqual(hook_registry(Manager()), {'view_x': []})
+        with self.assertRaises(TypeError):
+            HookDispatcher(self.app, object())
+        with self.assertRaises(TypeError):
+            AsyncHookExecutor(self.app).install(object())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,219 @@
+import logging
+import unittest
+
+import threading
+from types import SimpleNamespace
+
+import sqlalchemy as sa
+from flask import Flask, g
+from flask_login import LoginManager, UserMixin, current_user, login_user, logout_user
+from sqlalchemy.orm import DeclarativeBase, Session, relationship, scoped_session, sessionmaker
+
+from funlab.flaskr.identity_cache import IdentityCache, cached_policy
+
+
+class _User(UserMixin):
+    def __init__(self, id, role='user'):
+        self.id = id
+        self.role = role
+
+
+class _Base(DeclarativeBase):
+    pass
+
+
+class _OrmUser(UserMixin, _Base):
+    __tablename__ = 'users'
+    id = sa.Column(sa.Integer, primary_key=True)
+    name = sa.Column(sa.String)
+    roles = relationship('_OrmRole', lazy='selectin')
+
+
+class _OrmRole(_Base):
+    __tablename__ = 'roles'
+    id = sa.Column(sa.Integer, primary_key=True)
+    user_id = sa.Column(sa.ForeignKey('users.id'))
+    name = sa.Column(sa.String)
+
+
+class TestIdentityCache(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.secret_key = 'test'
+        self.app.mylogger = logging.getLogger(__name__)
+        self.app.login_manager = LoginManager(self.app)
+        self.loads, self.checks = [], []
+        self.roles = {'1': 'admin'}
+
+        @self.app.login_manager.user_loader
+        def load_user(user_id):
+            self.loads.append(user_id)
+            return _User(user_id, self.roles.get(user_id, 'user'))
+
+        @cached_policy
+        def is_admin(user):
+            self.checks.append(user.id)
+            return user.role == 'admin'
+
+        @self.app.route('/login/<user_id>')
+        def login(user_id):
+            login_user(_User(user_id))
+            return ''
+
+        @self.app.route('/logout')
+        def logout():
+            logout_user()
+            return ''
+
+        @self.app.route('/page')
+        def page():
+            return str([is_admin(), is_admin(current_user), g.get('_policy_results') is not None])
+
+        self.cache = IdentityCache(ttl=60)
+        self.app.identity_cache = self.cache
+        self.cache.init_app(self.app)
+        self.client = self.app.test_client()
+
+    def test_user_and_policy_reused_across_requests(self):
+        self.client.get('/login/1')
+        self.assertEqual(self.client.get('/page').data, b'[True, True, True]')
+        self.client.get('/page')
+        self.assertEqual((self.loads, self.checks), (['1'], ['1']))
+        self.assertEqual(self.cache.stats()['hits'], 2)
+
+    def test_invalidate_after_role_change(self):
+        self.client.get('/login/1')
+        self.client.get('/page')
+        self.roles['1'] = 'user'
+        self.cache.invalidate('1')
+        self.assertEqual(self.client.get('/page').data, b'[False, False, True]')
+        self.assertEqual(self.loads, ['1', '1'])
+
+    def test_new_login_does_not_reuse_entries(self):
+        self.client.get('/login/1')
+        self.client.get('/page')
+        self.client.get('/logout')
+        self.client.get('/login/1')
+        self.client.get('/page')
+        self.assertEqual(self.checks, ['1', '1'])
+
+    def test_remember_me_restore_gets_its_own_version(self):
+        self.app.add_url_rule('/remember/<user_id>', 'remember',
+                              lambda user_id: login_user(_User(user_id), remember=True) and '')
+        self.client.get('/remember/1')
+        self.client.get('/page')
+        for _ in range(2):
+            self.client.delete_cookie('session')  # browser restarted: only the remember-me cookie is left
+            self.client.get('/page')  # restored from the cookie: shares nothing with other sessions
+        self.client.get('/page')  # the restored session's own version, set after its first load
+        self.client.get('/page')
+        self.assertEqual(self.loads, ['1'] * 4)
+        self.assertEqual(self.checks, ['1'] * 3)
+
+    def test_policy_memoized_per_request_without_cache(self):
+        self.app.identity_cache = None
+        self.client.get('/login/2')
+        self.client.get('/page')
+        self.client.get('/page')
+        self.assertEqual(self.checks, ['2', '2'])
+
+    def test_expired_entries_are_reloaded(self):
+        self.cache.ttl = -1
+        self.client.get('/login/1')
+        self.client.get('/page')
+        self.client.get('/page')
+        self.assertEqual(self.loads, ['1', '1'])
+
+    def test_each_request_gets_own_user(self):
+        users = []
+        self.app.before_request(lambda: users.append(current_user._get_current_object()) and None)
+        self.client.get('/login/1')
+        self.client.get('/page')
+        self.client.get('/page')
+        self.assertEqual(self.loads, ['1'])
+        self.assertIsNot(users[-1], users[-2])
+        self.assertEqual((users[-1].id, users[-1].role), ('1', 'admin'))
+
+    def test_no_user_loader_reported(self):
+        app = Flask(__name__)
+        app.login_manager = LoginManager(app)
+        self.assertFalse(IdentityCache().init_app(app))
+        self.assertTrue(self.cache.caches_users)
+
+
+class TestIdentityCacheOrmUsers(unittest.TestCase):
+    def setUp(self):
+        engine = sa.create_engine('sqlite://', connect_args={'check_same_thread': False},
+                                  poolclass=sa.pool.StaticPool)
+        self.addCleanup(engine.dispose)
+        _Base.metadata.create_all(engine)
+        with Session(engine) as session:
+            session.add(_OrmUser(id=1, name='ann', roles=[_OrmRole(name='admin')]))
+            session.commit()
+        self.sessions = scoped_session(sessionmaker(engine))
+        self.statements = []
+        sa.event.listen(engine, 'before_cursor_execute', lambda *args: self.statements.append(args[2]))
+
+        self.app = Flask(__name__)
+        self.app.secret_key = 'test'
+        self.app.mylogger = logging.getLogger(__name__)
+        self.app.dbmgr = SimpleNamespace(get_db_session=self.sessions)
+        self.app.login_manager = LoginManager(self.app)
+        self.app.login_manager.user_loader(lambda user_id: self.sessions.get(_OrmUser, int(user_id)))
+        self.app.teardown_request(lambda exc: self.sessions.remove())
+        self.users = []
+
+        @self.app.route('/login')
+        def login():
+            login_user(self.sessions.get(_OrmUser, 1))
+            return ''
+
+        @self.app.route('/page')
+        def page():
+            user = current_user._get_current_object()
+            self.users.append(user)
+            return f"{user.name}:{','.join(role.name for role in user.roles)}"
+
+        self.cache = IdentityCache(ttl=60)
+        self.cache.init_app(self.app)
+        self.addCleanup(self.cache.unwatch)
+        self.client = self.app.test_client()
+
+    def test_committed_user_and_role_changes_invalidate(self):
+        self.client.get('/login')
+        self.client.get('/page')
+        self.assertEqual(self.client.get('/page').data, b'ann:admin')
+        with self.sessions.session_factory() as session:
+            session.get(_OrmUser, 1).name = 'anne'
+            session.flush()
+            session.rollback()
+        self.assertEqual(self.client.get('/page').data, b'ann:admin')  # rolled back: still cached
+        with self.sessions.session_factory() as session:
+            session.get(_OrmUser, 1).roles[0].name = 'user'
+            session.commit()
+        self.assertEqual(self.client.get('/page').data, b'ann:user')
+        with self.sessions.session_factory() as session:
+            session.get(_OrmUser, 1).name = 'anne'
+            session.commit()
+        self.assertEqual(self.client.get('/page').data, b'anne:user')
+
+    def test_cached_user_copied_into_each_request_session(self):
+        self.client.get('/login')
+        self.assertEqual(self.client.get('/page').data, b'ann:admin')
+        self.statements.clear()
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(self.client.get('/page').data)) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, [b'ann:admin'] * 4)
+        self.assertEqual(self.statements, [])  # served from the cache, nothing lazy-loaded
+        self.assertEqual(len({id(user) for user in self.users}), 5)
+        cached = next(value for _, value in self.cache._entries.values() if isinstance(value, _OrmUser))
+        self.assertIsNone(sa.inspect(cached).session)
+        self.assertTrue(all(user is not cached and user.roles[0] is not cached.roles[0] for user in self.users))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+import logging
+import unittest
+
+from funlab.flaskr.log_queue import DroppingQueueHandler, QueuedLogging
+
+
+class _RecordingHandler(logging.Handler):
+    def __init__(self, level=logging.NOTSET):
+        super().__init__(level)
+        self.messages = []
+        self.flushes = 0
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+    def flush(self):
+        self.flushes += 1
+
+
+class TestQueuedLogging(unittest.TestCase):
+    def setUp(self):
+        self.logger = logging.getLogger(f'{__name__}.{self._testMethodName}')
+        self.logger.propagate = False
+        self.logger.setLevel(logging.DEBUG)
+        self.handler = _RecordingHandler()
+        self.logger.addHandler(self.handler)
+        self.addCleanup(self.logger.handlers.clear)
+
+    def queued(self, **kwargs):
+        queued = QueuedLogging(**kwargs)
+        queued.attach(self.logger)
+        self.addCleanup(queued.stop)
+        return queued
+
+    def test_batch_written_then_flushed_once(self):
+        queued = self.queued(batch_size=100)
+        for i in range(10):
+            self.logger.info('record %d', i)
+        self.assertEqual(self.handler.messages, [])  # nothing written on the calling thread
+        queued.start()
+        queued.stop()
+        self.assertEqual(self.handler.messages, [f'record {i}' for i in range(10)])
+        self.assertEqual(self.handler.flushes, 1)
+        self.assertIs(type(self.logger.handlers[0]), DroppingQueueHandler)
+        self.assertIs(self.handler.flush.__func__, _RecordingHandler.flush)  # handler left untouched
+
+    def test_full_queue_drops_and_counts(self):
+        queued = self.queued(queue_size=3)
+        for i in range(5):
+            self.logger.warning('record %d', i)
+        self.assertEqual(queued.stats(), {'enqueued': 3, 'dropped': 2, 'depth': 3, 'capacity': 3})
+        queued.start()
+        queued.stop()
+        self.assertEqual(self.handler.messages, ['record 0', 'record 1', 'record 2'])
+
+    def test_stop_drains_queue(self):
+        queued = self.queued(batch_size=4)
+        queued.start()
+        for i in range(50):
+            self.logger.info('record %d', i)
+        queued.stop()
+        self.assertEqual(len(self.handler.messages), 50)
+        self.assertEqual(queued.stats()['depth'], 0)
+
+    def test_handler_level_and_filters_respected(self):
+        self.handler.setLevel(logging.WARNING)
+        self.handler.addFilter(lambda record: 'skip' not in record.getMessage())
+        queued = self.queued()
+        self.logger.info('info')
+        self.logger.warning('warning')
+        self.logger.warning('skip warning')
+        queued.start()
+        queued.stop()
+        self.assertEqual(self.handler.messages, ['warning'])
+
+    def test_install_only_configured_loggers(self):
+        other = logging.getLogger(f'{__name__}.other')
+        other.addHandler(other_handler := _RecordingHandler())
+        self.addCleanup(other.handlers.clear)
+        queued = QueuedLogging(logger_names=[self.logger.name])
+        self.addCleanup(queued.stop)
+        queued.install()
+        self.assertIsInstance(self.logger.handlers[0], DroppingQueueHandler)
+        self.assertEqual(other.handlers, [other_handler])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+import os
+import tempfile
+import unittest
+
+from funlab.flaskr.metrics import RequestMetrics, flatten_numeric
+
+
+class TestRequestMetrics(unittest.TestCase):
+    def test_render(self):
+        metrics = RequestMetrics(latency_buckets=(0.1, 1.0), size_buckets=(100,))
+        metrics.observe_request('root_bp', 'root_bp.home', 'GET', 200, 0.05, size=50)
+        metrics.observe_request('root_bp', 'root_bp.home', 'GET', 200, 0.5, size=500)
+        metrics.record_exception(ValueError('boom'))
+        text = metrics.render()
+        self.assertIn('funlab_http_requests_total{blueprint="root_bp",endpoint="root_bp.home",method="GET",status="200"} 2', text)
+        self.assertIn('funlab_http_request_duration_seconds_bucket{blueprint="root_bp",endpoint="root_bp.home",le="0.1"} 1', text)
+        self.assertIn('funlab_http_request_duration_seconds_bucket{blueprint="root_bp",endpoint="root_bp.home",le="+Inf"} 2', text)
+        self.assertIn('funlab_http_response_size_bytes_count{blueprint="root_bp",endpoint="root_bp.home"} 2', text)
+        self.assertIn('funlab_http_exceptions_total{exception="ValueError"} 1', text)
+
+    def test_multiprocess_aggregation(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            other_worker = RequestMetrics(multiproc_dir=tmpdir)
+            other_worker.observe_request('bp', 'bp.view', 'GET', 200, 0.01)
+            other_worker.flush()
+            # pretend the snapshot was written by another (live) worker process
+            snapshot = other_worker.multiproc_dir.joinpath(f'funlab_metrics_{os.getpid()}.json')
+            snapshot.rename(snapshot.with_name('funlab_metrics_1.json'))
+            this_worker = RequestMetrics(multiproc_dir=tmpdir)
+            this_worker.observe_request('bp', 'bp.view', 'GET', 200, 0.02)
+            self.assertEqual(this_worker.collect()['requests'][('bp', 'bp.view', 'GET', '200')], 2)
+
+    def test_process_gauges_labelled_by_pid_when_combined(self):
+        class Plugin:
+            metrics = {'calls': 3}
+        with tempfile.TemporaryDirectory() as tmpdir:
+            text = RequestMetrics(multiproc_dir=tmpdir).render(plugins={'demo': Plugin()},
+                                                                 extra={'funlab_turbo_frames': 4})
+        self.assertIn(f'funlab_plugin_metric{{plugin="demo",metric="calls",pid="{os.getpid()}"}} 3', text)
+        self.assertIn(f'funlab_turbo_frames{{pid="{os.getpid()}"}} 4', text)
+        self.assertIn('funlab_turbo_frames 4', RequestMetrics().render(extra={'funlab_turbo_frames': 4}))
+
+    def test_plugin_metrics(self):
+        class Plugin:
+            metrics = {'calls': 3, 'healthy': True, 'name': 'x', 'cache': {'hits': 5}}
+        text = RequestMetrics().render(plugins={'demo': Plugin()})
+        self.assertIn('funlab_plugin_metric{plugin="demo",metric="calls"} 3', text)
+        self.assertIn('funlab_plugin_metric{plugin="demo",metric="cache_hits"} 5', text)
+        self.assertEqual(flatten_numeric({'a': 'x'}), {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,111 @@
+import importlib
+import sys
+import tempfile
+import textwrap
+import threading
+import time
+import tracemalloc
+import unittest
+from pathlib import Path
+
+from flask import Blueprint, Flask
+
+from funlab.flaskr.plugin_accounting import APP_OWNER, PluginAccounting
+
+PLUGIN_MODULES = {
+    # the outer plugin calls into the inner one, which does the allocating
+    'acct_outer/view.py': """
+        from acct_inner.view import allocate
+
+        class OuterPlugin:
+            bp_name = 'outer_bp'
+
+        def run():
+            return allocate()
+    """,
+    'acct_inner/view.py': """
+        class InnerPlugin:
+            bp_name = 'inner_bp'
+
+        def allocate():
+            return [bytearray(1024) for _ in range(256)]
+    """,
+}
+
+
+class TestPluginAccounting(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls._tmpdir = tempfile.TemporaryDirectory()
+        for name, source in PLUGIN_MODULES.items():
+            path = Path(cls._tmpdir.name, name)
+            path.parent.mkdir(exist_ok=True)
+            (path.parent / '__init__.py').touch()
+            path.write_text(textwrap.dedent(source))
+        sys.path.insert(0, cls._tmpdir.name)
+        cls.outer = importlib.import_module('acct_outer.view')
+        cls.inner = importlib.import_module('acct_inner.view')
+
+    @classmethod
+    def tearDownClass(cls):
+        sys.path.remove(cls._tmpdir.name)
+        for name in ('acct_outer', 'acct_outer.view', 'acct_inner', 'acct_inner.view'):
+            sys.modules.pop(name, None)
+        cls._tmpdir.cleanup()
+
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.plugins = {'Outer': self.outer.OuterPlugin(), 'Inner': self.inner.InnerPlugin()}
+        bp = Blueprint('outer_bp', __name__, url_prefix='/outer')
+        bp.add_url_rule('/busy', 'busy', lambda: str(sum(range(200000))))
+        self.app.register_blueprint(bp)
+        self.app.add_url_rule('/root', 'root', lambda: 'root')
+        self.accounting = PluginAccounting(self.app)
+        self.accounting.init_app(self.app)
+
+    def test_request_cpu_charged_to_blueprint_owner(self):
+        client = self.app.test_client()
+        client.get('/outer/busy')
+        client.get('/outer/busy')
+        client.get('/root')
+        stats = self.accounting.stats()
+        self.assertEqual((stats['Outer']['requests'], stats[APP_OWNER]['requests']), (2, 1))
+        self.assertGreater(stats['Outer']['cpu'], 0)
+        self.assertGreaterEqual(stats['Outer']['wall'], stats['Outer']['max_wall'])
+
+    @unittest.skipUnless(hasattr(time, 'pthread_getcpuclockid'), 'POSIX thread CPU clocks')
+    def test_thread_cpu_by_tag(self):
+        done, stop = threading.Event(), threading.Event()
+
+        def work():
+            self.accounting.tag_thread('Inner')
+            sum(range(300000))
+            done.set()
+            stop.wait(2)
+        thread = threading.Thread(target=work)
+        thread.start()
+        done.wait(2)
+        stats = self.accounting.stats()
+        stop.set()
+        thread.join()
+        self.assertEqual(stats['Inner']['thread_count'], 1)
+        self.assertGreater(stats['Inner']['thread_cpu'], 0)
+        self.assertGreater(self.accounting.stats()['Inner']['thread_cpu'], 0)  # kept after the thread ends
+
+    def test_memory_charged_to_innermost_plugin_and_snapshots_rate_limited(self):
+        tracemalloc.start(10)
+        self.addCleanup(tracemalloc.stop)
+        self.accounting.memory_interval = 60
+        kept = self.outer.run()
+        memory = self.accounting.memory()
+        self.assertGreaterEqual(memory['Inner']['bytes'], 256 * 1024)
+        self.assertLess(memory.get('Outer', {}).get('bytes', 0), 64 * 1024)
+        more = self.outer.run()
+        self.assertIs(self.accounting.memory(), memory)  # within the interval: no new snapshot
+        self.accounting.memory_interval = 0
+        self.assertGreaterEqual(self.accounting.memory()['Inner']['delta'], 256 * 1024)
+        del kept, more
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+import json
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from funlab.flaskr.plugin_discovery import PluginDiscoveryCache, environment_fingerprint
+
+GROUP = 'funlab_discovery_test'
+
+
+class TestPluginDiscoveryCache(unittest.TestCase):
+    def setUp(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.site = Path(tmpdir.name, 'site')
+        self.cache_dir = Path(tmpdir.name, 'cache')
+        self.add_dist('demo_plugin', 'Demo = demo_plugin.view:DemoView')
+        sys.path.insert(0, str(self.site))
+        self.addCleanup(sys.path.remove, str(self.site))
+
+    def add_dist(self, name, *entry_points):
+        dist_info = self.site / f'{name}-1.0.dist-info'
+        dist_info.mkdir(parents=True)
+        (dist_info / 'METADATA').write_text(f'Metadata-Version: 2.1\nName: {name}\nVersion: 1.0\n')
+        (dist_info / 'entry_points.txt').write_text(f'[{GROUP}]\n' + '\n'.join(entry_points) + '\n')
+        return dist_info
+
+    def lookup(self):
+        cache = PluginDiscoveryCache(self.cache_dir)
+        return cache, {ep.name: ep.value for ep in cache.entry_points(group=GROUP)}
+
+    def test_second_start_served_from_file(self):
+        first, found = self.lookup()
+        self.assertEqual((found, first.stats()['misses']), ({'Demo': 'demo_plugin.view:DemoView'}, 1))
+        second, cached = self.lookup()
+        self.assertEqual(cached, found)
+        self.assertEqual((second.hits, second.misses, second.loaded_from_disk), (1, 0, True))
+        cache_file = second.cache_file
+        with mock.patch.object(sys, 'prefix', '/other/venv'):
+            self.assertNotEqual(second.cache_file, cache_file)  # venvs keep separate files
+
+    def test_fingerprint_follows_installs_and_upgrades(self):
+        before = environment_fingerprint([str(self.site)])
+        dist_info = self.add_dist('other_plugin', 'Other = other_plugin:View')
+        installed = environment_fingerprint([str(self.site)])
+        os.utime(dist_info, ns=(0, 0))
+        self.assertEqual(len({before, installed, environment_fingerprint([str(self.site)])}), 3)
+
+    def test_install_invalidates_the_file(self):
+        self.lookup()
+        self.add_dist('other_plugin', 'Other = other_plugin:View')
+        cache, found = self.lookup()
+        self.assertEqual((set(found), cache.loaded_from_disk, cache.misses), ({'Demo', 'Other'}, False, 1))
+
+    def test_corrupt_or_missing_file_rescans(self):
+        first, found = self.lookup()
+        for content in ('not json', json.dumps({'fingerprint': first._fingerprint, 'groups': {GROUP: [{'x': 1}]}})):
+            first.cache_file.write_text(content)
+            cache, rescanned = self.lookup()
+            self.assertEqual((rescanned, cache.loaded_from_disk), (found, False))
+        first.invalidate()
+        self.assertFalse(first.cache_file.exists())
+        self.assertEqual(self.lookup()[1], found)
+
+    @unittest.skipUnless(hasattr(os, 'getuid'), 'POSIX permissions')
+    def test_writable_by_others_is_ignored(self):
+        first, _ = self.lookup()
+        data = json.loads(first.cache_file.read_text())
+        data['groups'][GROUP][0]['value'] = 'evil:Plugin'
+        first.cache_file.write_text(json.dumps(data))
+        first.cache_file.chmod(0o666)
+        cache, found = self.lookup()
+        self.assertEqual((found['Demo'], cache.rejected_files), ('demo_plugin.view:DemoView', 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,229 @@
+import importlib
+import logging
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+from types import SimpleNamespace
+
+from flask import Blueprint, Flask
+
+from funlab.flaskr.plugin_swap import PluginReloadCoordinator
+
+
+class _PluginManager:
+    def __init__(self):
+        self.swapping = threading.Event()
+        self.release = threading.Event()
+        self.fail = False
+
+    def peek_plugin(self, name):
+        return SimpleNamespace(bp_name=f'{name}_bp')
+
+    def reload_plugin(self, name):
+        self.swapping.set()
+        self.release.wait(2)
+        if self.fail:
+            raise RuntimeError('broken plugin')
+        return True
+
+
+class TestPluginReloadCoordinator(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.mylogger = logging.getLogger(__name__)
+        self.app.plugins = {}
+        self.app.plugin_manager = self.manager = _PluginManager()
+        self.in_view, self.finish = threading.Event(), threading.Event()
+        for name in ('demo', 'other'):
+            bp = Blueprint(f'{name}_bp', __name__, url_prefix=f'/{name}')
+            bp.add_url_rule('/fast', 'fast', lambda: 'ok')
+            bp.add_url_rule('/slow', 'slow', self.slow_view)
+            self.app.register_blueprint(bp)
+        self.coordinator = PluginReloadCoordinator(self.app, drain_timeout=2, hold_timeout=2, max_held=1)
+        self.coordinator.init_app(self.app)
+        self.addCleanup(self.coordinator.shutdown)
+        self.addCleanup(self.manager.release.set)
+
+    def slow_view(self):
+        self.in_view.set()
+        self.finish.wait(2)
+        return 'slow'
+
+    def get(self, path, results):
+        results.append(self.app.test_client().get(path))
+
+    def background(self, path, results):
+        thread = threading.Thread(target=self.get, args=(path, results))
+        thread.start()
+        return thread
+
+    def wait_for(self, condition):
+        deadline = time.monotonic() + 2
+        while not condition() and time.monotonic() < deadline:
+            time.sleep(0.005)
+        self.assertTrue(condition())
+
+    def test_swap_waits_for_in_flight_requests(self):
+        results = []
+        thread = self.background('/demo/slow', results)
+        self.in_view.wait(1)
+        job = self.coordinator.submit('demo')
+        self.wait_for(lambda: job.state == 'draining')
+        self.assertFalse(self.manager.swapping.wait(0.05))
+        self.finish.set()
+        thread.join()
+        self.manager.release.set()
+        self.wait_for(lambda: job.finished_at)
+        self.assertEqual((job.state, job.drained, job.success), ('done', True, True))
+        self.assertEqual(results[0].data, b'slow')
+
+    def test_held_request_released_and_excess_rejected(self):
+        job = self.coordinator.submit('demo')
+        self.manager.swapping.wait(1)
+        held, rejected, other = [], [], []
+        thread = self.background('/demo/fast', held)
+        self.wait_for(lambda: job.held_requests == 1)
+        self.get('/demo/fast', rejected)  # over max_held: answered at once
+        self.get('/other/fast', other)
+        self.assertEqual((rejected[0].status_code, rejected[0].headers['Retry-After']), (503, '2'))
+        self.assertEqual(other[0].data, b'ok')
+        self.manager.release.set()
+        thread.join()
+        self.assertEqual(held[0].data, b'ok')
+        self.assertEqual((job.held_requests, job.rejected_requests), (1, 1))
+
+    def test_hold_timeout(self):
+        self.coordinator.hold_timeout = 0.05
+        job = self.coordinator.submit('demo')
+        self.manager.swapping.wait(1)
+        results = []
+        self.get('/demo/fast', results)
+        self.assertEqual((results[0].status_code, job.rejected_requests), (503, 1))
+
+    def test_failed_job_reported_and_gate_reopened(self):
+        self.manager.fail = True
+        self.manager.release.set()
+        job = self.coordinator.submit('demo')
+        self.wait_for(lambda: job.finished_at)
+        self.assertIs(self.coordinator.get_job(job.id), job)
+        self.assertEqual((job.state, job.success, job.message), ('failed', False, 'broken plugin'))
+        results = []
+        self.get('/demo/fast', results)
+        self.assertEqual(results[0].data, b'ok')
+
+
+PLUGIN_SOURCE = '''
+from flask import Blueprint
+
+VERSION = {version!r}
+
+
+class DemoView:
+    def __init__(self, app):
+        self.app = app
+        self.name, self.bp_name, self.version = 'demo', 'demo_bp', VERSION
+        self.blueprint = Blueprint(self.bp_name, __name__, url_prefix='/demo')
+        self.blueprint.add_url_rule('/fast', 'fast', self.fast)
+        self.blueprint.add_url_rule('/slow', 'slow', self.slow)
+        {extra_rule}
+        self.blueprint.after_request(self.tag)
+        app.hook_manager.register_hook('view_x', self.render, plugin_name=self.name)
+
+    def fast(self):
+        return self.version
+
+    def slow(self):
+        self.app.extensions['release'].wait(2)
+        return self.version
+
+    def tag(self, response):
+        response.headers['X-Version'] = self.version
+        return response
+
+    def render(self, context):
+        return self.version
+'''
+
+
+class _HookManager:
+    def __init__(self):
+        self._hooks = {}
+        self.called = []
+
+    def register_hook(self, hook_name, callback, priority=100, plugin_name=None):
+        self._hooks.setdefault(hook_name, []).append(
+            {'callback': callback, 'priority': priority, 'plugin_name': plugin_name})
+
+    def call_hook(self, hook_name, **context):
+        self.called.append(hook_name)
+        return [entry['callback'](context) for entry in self._hooks.get(hook_name, [])]
+
+
+class TestHotSwap(unittest.TestCase):
+    def setUp(self):
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        self.source = Path(folder.name, 'swap_demo_plugin.py')
+        self.write('v1')
+        sys.path.insert(0, folder.name)
+        self.addCleanup(sys.path.remove, folder.name)
+        self.addCleanup(sys.modules.pop, 'swap_demo_plugin', None)
+        self.module = importlib.import_module('swap_demo_plugin')
+        self.app = Flask(__name__)
+        self.app.mylogger = logging.getLogger(__name__)
+        self.app.extensions['release'] = self.release = threading.Event()
+        self.app.hook_manager = _HookManager()
+        self.app.plugin_manager = self.manager = _PluginManager()
+        self.manager.release.set()
+        self.old = self.module.DemoView(self.app)
+        self.app.register_blueprint(self.old.blueprint)
+        self.app.plugins = {'demo': self.old}
+        self.coordinator = PluginReloadCoordinator(self.app, drain_timeout=2)
+        self.coordinator.init_app(self.app)
+        self.addCleanup(self.coordinator.shutdown)
+        self.addCleanup(self.release.set)
+
+    def write(self, version, extra_rule=''):
+        self.source.write_text(PLUGIN_SOURCE.format(version=version, extra_rule=extra_rule))
+
+    def wait_for(self, condition):
+        deadline = time.monotonic() + 2
+        while not condition() and time.monotonic() < deadline:
+            time.sleep(0.005)
+        self.assertTrue(condition())
+
+    def test_new_instance_serves_while_old_one_drains(self):
+        slow = []
+        thread = threading.Thread(target=lambda: slow.append(self.app.test_client().get('/demo/slow')))
+        thread.start()
+        self.wait_for(lambda: self.coordinator.in_flight('demo_bp') == 1)
+        self.write('v22')
+        job = self.coordinator.submit('demo')
+        self.wait_for(lambda: job.state == 'draining')
+        response = self.app.test_client().get('/demo/fast')  # neither held nor rejected
+        self.assertEqual((response.data, response.headers['X-Version']), (b'v22', 'v22'))
+        self.assertIsNone(job.finished_at)  # the old instance still has a request
+        self.release.set()
+        thread.join()
+        self.wait_for(lambda: job.finished_at)
+        self.assertEqual((slow[0].data, slow[0].headers['X-Version']), (b'v1', 'v22'))  # new after_request
+        self.assertEqual((job.state, job.success, job.hot_swap, job.drained), ('done', True, True, True))
+        self.assertEqual((job.held_requests, job.rejected_requests, self.manager.swapping.is_set()), (0, 0, False))
+        self.assertIsNot(self.app.plugins['demo'], self.old)
+        self.assertEqual(self.app.hook_manager.call_hook('view_x'), ['v22'])  # the old instance's hook is gone
+        self.assertIn('plugin_after_reload', self.app.hook_manager.called)
+
+    def test_changed_rules_reloaded_through_the_gate(self):
+        self.write('v22', extra_rule="self.blueprint.add_url_rule('/new', 'new', self.fast)")
+        job = self.coordinator.submit('demo')
+        self.wait_for(lambda: job.finished_at)
+        self.assertEqual((job.state, job.hot_swap), ('done', False))
+        self.assertTrue(self.manager.swapping.is_set())
+        self.assertIs(self.app.plugins['demo'], self.old)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,49 @@
+import threading
+import unittest
+
+from flask import Flask
+
+from funlab.flaskr.plugin_timeseries import PluginMetricsSampler, RingBuffer, TieredSeries
+
+
+class TestRingBuffer(unittest.TestCase):
+    def test_wraps_at_capacity(self):
+        buffer = RingBuffer(3)
+        for ts in range(5):
+            buffer.append(ts, ts * 10)
+        self.assertEqual(len(buffer), 3)
+        self.assertEqual(buffer.items(), [(2, 20), (3, 30), (4, 40)])
+        self.assertEqual(buffer.items(since=3), [(3, 30), (4, 40)])
+        self.assertEqual(buffer.nbytes, 48)
+
+
+class TestTieredSeries(unittest.TestCase):
+    def test_downsampling_and_window_tier(self):
+        series = TieredSeries(((10, 6), (60, 4)))
+        for ts in range(0, 130, 10):
+            series.add(ts, ts)
+        interval, points = series.window(60, now=130)
+        self.assertEqual(interval, 10)
+        self.assertEqual(points[-1], (120, 120))
+        interval, points = series.window(200, now=130)
+        self.assertEqual(interval, 60)
+        # bucket 0..50 averages to 25, 60..110 to 85, open bucket 120 so far 120
+        self.assertEqual(points, [(0, 25), (60, 85), (120, 120)])
+        self.assertEqual(series.nbytes, (6 + 4) * 16)
+
+
+class TestPluginMetricsSampler(unittest.TestCase):
+    def test_one_sampler_thread_per_app(self):
+        app = Flask(__name__)
+        app.plugins = {}
+        sampler = PluginMetricsSampler.for_app(app, {'METRICS_HISTORY_INTERVAL': 60})
+        self.addCleanup(sampler.stop)
+        self.assertIs(PluginMetricsSampler.for_app(app, {}), sampler)  # e.g. the view re-created on reload
+        threads = [thread for thread in threading.enumerate() if thread.name == 'funlab-metrics-history']
+        self.assertEqual(threads, [sampler._thread])
+        sampler.stop()
+        self.assertFalse(sampler._thread.is_alive())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,158 @@
+"""Render hot-path benchmarks: deep menus and full-layout pages, each measured against another render.
+
+Skipped unless FUNLAB_BENCH=1. Each case takes the median time of ROUNDS renders (FUNLAB_BENCH_ROUNDS,
+default 50) and the peak memory allocated during one render, and compares them with a reference
+render on the same machine, so no recorded baseline is needed:
+
+- the horizontal menu renders within twice the time and memory of the vertical one;
+- doubling the number of menus costs at most three times as much (quadratic growth would cost four);
+- a content page costs at most twice (about) or three times (plugin management, one row per plugin)
+  the blank page, which already carries the layout, the deep menus and every layout hook.
+
+Page cases build the app with create_app() and need the full funlab-libs install.
+"""
+import os
+import statistics
+import tempfile
+import time
+import tracemalloc
+import unittest
+from pathlib import Path
+
+from flask import g
+from flask_login import UserMixin
+
+BENCH = os.environ.get('FUNLAB_BENCH') == '1'
+ROUNDS = int(os.environ.get('FUNLAB_BENCH_ROUNDS', 50))
+CONFIG = Path(__file__).parents[2] / 'funlab' / 'flaskr' / 'conf' / 'config.toml'
+
+ICON = ('<svg xmlns="http://www.w3.org/2000/svg" class="icon icon-tabler" width="24" height="24" viewBox="0 0 24 24" '
+        'stroke-width="2" stroke="currentColor" fill="none" stroke-linecap="round" stroke-linejoin="round">'
+        '<path stroke="none" d="M0 0h24v24H0z" fill="none"/><path d="M12 9h.01" /><path d="M11 12h1v4h1" />'
+        '<path d="M12 3c7.2 0 9 1.8 9 9s-1.8 9 -9 9s-9 -1.8 -9 -9s1.8 -9 9 -9z" /></svg>')
+LAYOUT_HOOKS = ('view_layouts_base_html_head', 'view_layouts_base_content_top',
+                'view_layouts_base_content_bottom', 'view_layouts_base_body_bottom')
+
+
+class BenchUser(UserMixin):
+    id = 'bench'
+    username = 'bench'
+    role = 'admin'
+    avatar_url = None
+    is_admin = True
+
+
+def build_menus(top=8, depth=3, submenus=2, items=4):
+    """``top`` menus nested ``depth`` levels deep; ``top=8`` gives 336 menus, items and dividers."""
+    from funlab.core.menu import Menu, MenuDivider, MenuItem
+    from funlab.flaskr.identity_cache import is_admin
+
+    def fill(menu, path, level):
+        for i in range(items):
+            menu.append(MenuItem(title=f'Item {path}.{i}', icon=ICON, href=f'/bench/{path}/{i}',
+                                 badge='New' if i == 0 else '', required_policy=is_admin if i == items - 1 else None))
+        menu.append(MenuDivider())
+        if level < depth:
+            for i in range(submenus):
+                menu.append(fill(Menu(title=f'Menu {path}.{i}', icon=ICON), f'{path}.{i}', level + 1))
+        return menu
+
+    return [fill(Menu(title=f'Menu {t}', icon=ICON), str(t), 1) for t in range(top)]
+
+
+def measure(render, rounds=ROUNDS, warmup=3) -> dict:
+    for _ in range(warmup):
+        render()
+    times = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        render()
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        render()
+        peak = tracemalloc.get_traced_memory()[1] - base
+    finally:
+        tracemalloc.stop()
+    return {'median_ms': round(statistics.median(times) * 1000, 4), 'peak_kib': round(peak / 1024, 1)}
+
+
+@unittest.skipUnless(BENCH, 'render benchmarks run with FUNLAB_BENCH=1')
+class RenderBenchmark(unittest.TestCase):
+    def assertWithin(self, result, reference, limit, message):
+        self.assertLessEqual(result['median_ms'], reference['median_ms'] * limit,
+                             f'{message} render time: {result} vs {reference}')
+        self.assertLessEqual(result['peak_kib'], reference['peak_kib'] * limit + 1,
+                             f'{message} render memory: {result} vs {reference}')
+
+
+class TestMenuRenderBenchmark(RenderBenchmark):
+    @classmethod
+    def setUpClass(cls):
+        from funlab.core.menu import MenuBar
+        cls.menubar = MenuBar(title='FunLab', icon='/static/logo.svg')
+        cls.menubar.append(build_menus())
+        cls.user = BenchUser()
+
+    def test_horizontal_relative_to_vertical(self):
+        vertical = measure(lambda: self.menubar.html('vertical', user=self.user))
+        horizontal = measure(lambda: self.menubar.html('horizontal', user=self.user))
+        self.assertWithin(horizontal, vertical, 2, 'horizontal vs vertical menu')
+
+    def test_linear_in_menu_count(self):
+        from funlab.core.menu import MenuBar
+        half = MenuBar(title='FunLab', icon='/static/logo.svg')
+        half.append(build_menus(top=4))
+        for layout in ('vertical', 'horizontal'):
+            with self.subTest(layout=layout):
+                small = measure(lambda: half.html(layout, user=self.user))
+                full = measure(lambda: self.menubar.html(layout, user=self.user))
+                self.assertWithin(full, small, 3, f'{layout} menu, 8 vs 4 top menus')
+
+
+class TestPageRenderBenchmark(RenderBenchmark):
+    """Pages rendered through the full layout by the app's own views and before-request handlers."""
+
+    @classmethod
+    def setUpClass(cls):
+        from funlab.flaskr.app import create_app
+        cls._cwd = os.getcwd()
+        cls._tmpdir = tempfile.TemporaryDirectory()
+        os.chdir(cls._tmpdir.name)  # the TEST profile's sqlite file and funlab.log stay out of the tree
+        cls.app = create_app(configfile=str(CONFIG))
+        cls.app.append_mainmenu(build_menus())
+        for priority, hook_name in enumerate(LAYOUT_HOOKS):
+            cls.app.hook_manager.register_hook(hook_name, lambda context, name=hook_name: f'<!-- {name} -->',
+                                               priority=priority, plugin_name='RenderBenchmark')
+        cls.user = BenchUser()
+
+    @classmethod
+    def tearDownClass(cls):
+        os.chdir(cls._cwd)
+        cls._tmpdir.cleanup()
+
+    def render(self, path):
+        with self.app.test_request_context(path):
+            g._login_user = self.user
+            response = self.app.full_dispatch_request()
+            return response.status_code, response.get_data()
+
+    def measure_page(self, path) -> dict:
+        status, body = self.render(path)
+        self.assertEqual(status, 200, body[:200])
+        for hook_name in LAYOUT_HOOKS:
+            self.assertIn(f'<!-- {hook_name} -->'.encode(), body)
+        return measure(lambda: self.render(path))
+
+    def test_about_relative_to_blank(self):
+        self.assertWithin(self.measure_page('/about'), self.measure_page('/blank'), 2, 'about vs blank page')
+
+    def test_plugin_management_relative_to_blank(self):
+        self.assertWithin(self.measure_page('/plugin-manager/management'), self.measure_page('/blank'), 3,
+                          'plugin management vs blank page')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,141 @@
+import unittest
+
+from flask import Flask, Response, flash, get_flashed_messages, make_response
+from flask_login import LoginManager, UserMixin, login_user
+
+from funlab.flaskr.response_cache import ResponseCache, cached_view
+
+
+class _User(UserMixin):
+    def __init__(self, id):
+        self.id = id
+
+
+class TestResponseCache(unittest.TestCase):
+    def test_lru_byte_budget(self):
+        cache = ResponseCache(max_bytes=4096 * 8)
+        body = b'x' * 3000
+        for idx in range(12):
+            cache.set(('page', idx), body)
+        stats = cache.stats()
+        self.assertLessEqual(stats['bytes'], cache.max_bytes)
+        self.assertIsNone(cache.get(('page', 0)))  # evicted first
+        self.assertEqual(cache.get(('page', 11)).body, body)
+
+    def test_ttl_and_oversized_entries(self):
+        cache = ResponseCache(max_bytes=8192, default_ttl=60)
+        cache.set(('expired',), b'old', ttl=0)
+        self.assertIsNone(cache.get(('expired',)))
+        cache.set(('too-big',), b'x' * 2048)  # above max_bytes // 8
+        self.assertIsNone(cache.get(('too-big',)))
+        self.assertEqual(cache.stats()['entries'], 0)
+
+    def test_get_or_render(self):
+        cache = ResponseCache()
+        calls = []
+
+        def render():
+            calls.append(1)
+            return '<p>é</p>'
+        self.assertEqual(cache.get_or_render(('frag',), render), '<p>é</p>')
+        self.assertEqual(cache.get_or_render(('frag',), render), '<p>é</p>')
+        self.assertEqual(len(calls), 1)
+        cache.clear()
+        cache.get_or_render(('frag',), render)
+        self.assertEqual(len(calls), 2)
+
+
+class TestCachedView(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.secret_key = 'test'
+        self.app.response_cache = ResponseCache()
+        LoginManager(self.app).user_loader(_User)
+        self.renders = []
+        self.admins = {'1'}
+
+        def is_admin(user):
+            return user.id in self.admins
+
+        def view(name, **options):
+            @cached_view(**options)
+            def render():
+                self.renders.append(name)
+                get_flashed_messages()  # as the layout does
+                return f'{name} {len(self.renders)}'
+            self.app.add_url_rule(f'/{name}', name, render)
+
+        view('page')
+        view('shared', scope='policy', policies=(is_admin,))
+        for name, make in (('missing', lambda: ('gone', 404)),
+                           ('cookie', lambda: self.with_cookie()),
+                           ('private', lambda: Response('mine', headers={'Cache-Control': 'private'}))):
+            self.app.add_url_rule(f'/{name}', name, cached_view()(lambda make=make, name=name:
+                                                                   self.renders.append(name) or make()))
+
+        @self.app.route('/login/<user_id>')
+        def login(user_id):
+            login_user(_User(user_id))
+            return ''
+
+        @self.app.route('/flash')
+        def flashed():
+            flash('saved')
+            return ''
+
+    @staticmethod
+    def with_cookie():
+        response = make_response('cookie')
+        response.set_cookie('c', '1')
+        return response
+
+    def client(self, user_id=None):
+        client = self.app.test_client()
+        if user_id:
+            client.get(f'/login/{user_id}')
+        return client
+
+    def test_hit_returns_same_body_and_etag(self):
+        client = self.client()
+        first, second = client.get('/page'), client.get('/page')
+        self.assertEqual((first.data, second.data), (b'page 1', b'page 1'))
+        self.assertEqual(self.renders, ['page'])
+        self.assertEqual(first.headers['ETag'], second.headers['ETag'])
+        not_modified = client.get('/page', headers={'If-None-Match': first.headers['ETag']})
+        self.assertEqual((not_modified.status_code, not_modified.data), (304, b''))
+
+    def test_keys_per_user_frame_and_query(self):
+        anonymous = self.client()
+        anonymous.get('/page')
+        self.client().get('/page')  # anonymous visitors share an entry
+        self.client('1').get('/page')
+        self.client('2').get('/page')
+        anonymous.get('/page', headers={'Turbo-Frame': 'content'})
+        anonymous.get('/page?layout=plain')
+        anonymous.get('/page?unrelated=1')
+        self.assertEqual(len(self.renders), 5)
+
+    def test_policy_scope_shared_by_equal_policies(self):
+        self.admins = {'1', '2'}
+        self.assertEqual(self.client('1').get('/shared').data, self.client('2').get('/shared').data)
+        self.assertNotEqual(self.client('3').get('/shared').data, b'shared 1')
+        self.assertEqual(self.renders, ['shared', 'shared'])
+
+    def test_uncacheable_responses_not_stored(self):
+        client = self.client()
+        for path in ('/missing', '/cookie', '/private'):
+            client.get(path)
+            client.get(path)
+        self.assertEqual(self.renders, ['missing', 'missing', 'cookie', 'cookie', 'private', 'private'])
+        self.assertEqual(self.app.response_cache.stats()['entries'], 0)
+
+    def test_pending_flash_bypasses_cache(self):
+        client = self.client()
+        client.get('/page')
+        client.get('/flash')
+        self.assertEqual(client.get('/page').data, b'page 2')  # the layout shows the flashed message
+        self.assertEqual(client.get('/page').data, b'page 1')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+import gzip
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from werkzeug.test import Client
+from werkzeug.wrappers import Response
+
+from funlab.flaskr.static_files import StaticFiles
+
+
+def _fallback(environ, start_response):
+    return Response('fallback', 404)(environ, start_response)
+
+
+class TestStaticFiles(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        with open(os.path.join(self.directory, 'site.css'), 'w') as f:
+            f.write('body { color: red; }\n' * 90)
+        with open(os.path.join(self.directory, 'large.bin'), 'wb') as f:
+            f.write(b'x' * 4096)
+        self.static = StaticFiles(_fallback, self.directory, '/static', max_file_bytes=2048)
+        self.client = Client(self.static)
+
+    def test_small_file_served_from_memory(self):
+        first = self.client.get('/static/site.css')
+        second = self.client.get('/static/site.css')
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(first.headers['Content-Type'], 'text/css; charset=utf-8')
+        self.assertEqual(first.data, second.data)
+        self.assertEqual(self.static.stats()['misses'], 1)
+        self.assertEqual(self.static.stats()['hits'], 1)
+
+    def test_gzip_variant(self):
+        response = self.client.get('/static/site.css', headers={'Accept-Encoding': 'gzip, br'})
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.data), b'body { color: red; }\n' * 90)
+        identity = self.client.get('/static/site.css')
+        self.assertNotIn('Content-Encoding', identity.headers)
+        self.assertEqual(response.headers['ETag'], identity.headers['ETag'][:-1] + '-gz"')
+        self.assertEqual((response.headers['Vary'], identity.headers['Vary']), ('Accept-Encoding', 'Accept-Encoding'))
+
+    def test_gzip_refused_with_zero_quality(self):
+        for accept in ('gzip;q=0, br', 'identity', 'gzip;q=0.0'):
+            response = self.client.get('/static/site.css', headers={'Accept-Encoding': accept})
+            self.assertNotIn('Content-Encoding', response.headers)
+        wildcard = self.client.get('/static/site.css', headers={'Accept-Encoding': '*'})
+        self.assertEqual(wildcard.headers['Content-Encoding'], 'gzip')
+
+    def test_conditional_request_per_variant(self):
+        gzipped = {'Accept-Encoding': 'gzip'}
+        etag = self.client.get('/static/site.css', headers=gzipped).headers['ETag']
+        response = self.client.get('/static/site.css', headers={'If-None-Match': etag, **gzipped})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual((response.headers['ETag'], response.headers['Vary']), (etag, 'Accept-Encoding'))
+        # the gzip validator does not match the identity representation
+        self.assertEqual(self.client.get('/static/site.css', headers={'If-None-Match': etag}).status_code, 200)
+
+    def test_conditional_request(self):
+        etag = self.client.get('/static/site.css').headers['ETag']
+        response = self.client.get('/static/site.css', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.data, b'')
+        self.assertEqual(response.headers['Vary'], 'Accept-Encoding')
+
+    def test_large_file_streamed_not_cached(self):
+        response = self.client.get('/static/large.bin')
+        self.assertEqual(len(response.data), 4096)
+        self.assertEqual(self.static.stats()['bytes'], 0)
+
+    def test_accel_redirect(self):
+        client = Client(StaticFiles(_fallback, self.directory, '/static', max_file_bytes=2048,
+                                    accel_prefix='/internal'))
+        response = client.get('/static/large.bin')
+        self.assertEqual(response.headers['X-Accel-Redirect'], '/internal/large.bin')
+        self.assertEqual(response.data, b'')
+
+    def test_fall_through(self):
+        for path, headers in (('/static/missing.css', {}), ('/static/../secret', {}),
+                              ('/static/site.css', {'Range': 'bytes=0-1'}), ('/other', {})):
+            self.assertEqual(self.client.get(path, headers=headers).data, b'fallback', path)
+
+    def test_cache_budget(self):
+        static = StaticFiles(_fallback, self.directory, '/static', max_cache_bytes=100, compress=False)
+        Client(static).get('/static/site.css')
+        self.assertEqual(static.stats()['bytes'], 0)
+
+    def test_file_removed_while_another_request_drops_it(self):
+        static = StaticFiles(_fallback, self.directory, '/static', check_interval=0)
+        client = Client(static)
+        client.get('/static/site.css')
+        os.remove(os.path.join(self.directory, 'site.css'))
+
+        def stat(filename):  # a concurrent request evicts the entry between the lookup and the stat
+            with static._lock:
+                static._drop(filename)
+            raise FileNotFoundError(filename)
+        with mock.patch('funlab.flaskr.static_files.os.stat', side_effect=stat):
+            self.assertEqual(client.get('/static/site.css').data, b'fallback')
+        self.assertEqual((static.stats()['entries'], static.stats()['bytes']), (0, 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+import unittest
+
+from flask import Flask, render_template
+from jinja2 import DictLoader
+
+from funlab.flaskr.response_cache import ResponseCache, cached_view
+from funlab.flaskr.streaming import STREAM_ERROR_FRAGMENT, render_page
+
+TEMPLATES = {
+    'page.html': '<html><head><title>{{ title }}</title></head><body>'
+                 '{% for i in range(rows) %}<p>row {{ i }}</p>{% endfor %}</body></html>',
+    'fragment.html': '<p>{{ title }}</p>',
+    'broken.html': '<html><head></head><body><p>start</p>{{ fail() }}</body></html>',
+}
+
+
+class TestStreaming(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.jinja_loader = DictLoader(TEMPLATES)
+        self.app.config['STREAM_CHUNK_SIZE'] = 100
+        self.app.response_cache = None
+
+        @self.app.route('/page')
+        @cached_view()
+        def page():
+            return render_page('page.html', title='Page', rows=20)
+
+        @self.app.route('/fragment')
+        def fragment():
+            return render_page('fragment.html', stream=True, title='Frag')
+
+        @self.app.route('/broken')
+        def broken():
+            return render_page('broken.html', stream=True, fail=lambda: 1 / 0)
+
+        self.client = self.app.test_client()
+
+    def chunks(self, path):
+        response = self.client.get(path)
+        return response, [chunk.decode() for chunk in response.response]
+
+    def expected(self, template, **context):
+        with self.app.test_request_context():
+            return render_template(template, **context)
+
+    def test_fallback_renders_whole_page(self):
+        response, chunks = self.chunks('/page')
+        self.assertIn('Content-Length', response.headers)
+        self.assertEqual(len(chunks), 1)
+        self.assertEqual(''.join(chunks), self.expected('page.html', title='Page', rows=20))
+
+    def test_head_flushed_first_then_body_in_chunks(self):
+        self.app.config['STREAM_TEMPLATES'] = True
+        response, chunks = self.chunks('/page')
+        self.assertNotIn('Content-Length', response.headers)
+        # the head chunk ends with the static text around </head>, before any body expression
+        self.assertEqual(chunks[0], '<html><head><title>Page</title></head><body>')
+        self.assertGreater(len(chunks), 3)
+        self.assertTrue(all(len(chunk) >= 100 for chunk in chunks[1:-1]))
+        self.assertEqual(''.join(chunks), self.expected('page.html', title='Page', rows=20))
+
+    def test_template_without_head_is_one_chunk(self):
+        _, chunks = self.chunks('/fragment')
+        self.assertEqual(chunks, ['<p>Frag</p>'])
+
+    def test_error_after_head_is_shown_inline(self):
+        self.app.logger.disabled = True
+        response = self.client.get('/broken')
+        body = response.response
+        self.assertEqual(next(body).decode(), '<html><head></head><body><p>start</p>')
+        self.assertEqual(next(body).decode(), STREAM_ERROR_FRAGMENT)
+        with self.assertRaises(ZeroDivisionError):
+            next(body)
+
+    def test_streamed_page_not_stored_in_response_cache(self):
+        self.app.config['STREAM_TEMPLATES'] = True
+        self.app.response_cache = ResponseCache()
+        for _ in range(2):
+            response, chunks = self.chunks('/page')
+            self.assertNotIn('Content-Length', response.headers)
+            self.assertGreater(len(chunks), 1)
+        self.assertEqual(self.app.response_cache.stats()['entries'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import unittest
+from pathlib import Path
+
+from flask import Flask, g, render_template, render_template_string
+from jinja2 import FileSystemLoader
+
+import funlab.flaskr.turbo
+from funlab.flaskr.turbo import PAGE_FRAME, TurboSupport
+
+TEMPLATES = Path(funlab.flaskr.turbo.__file__).parent / 'templates'
+
+PAGE = ('{% if turbo_frame %}<turbo-frame id="{{ turbo_page_frame }}">{{ g.get("mainmenu", "") }}body</turbo-frame>'
+        '{% else %}<html>{{ g.mainmenu }}body</html>{% endif %}')
+
+
+class TestTurboSupport(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.menu_builds = 0
+
+        @self.app.before_request
+        def set_global_variables():
+            self.menu_builds += 1
+            g.mainmenu = 'menu'
+
+        @self.app.route('/page')
+        def page():
+            return render_template_string(PAGE)
+
+        self.turbo = TurboSupport()
+        self.turbo.init_app(self.app)
+        self.client = self.app.test_client()
+
+    def test_full_page(self):
+        response = self.client.get('/page')
+        self.assertEqual(response.data, b'<html>menubody</html>')
+        self.assertIn('Turbo-Frame', response.headers['Vary'])
+        self.assertEqual(self.menu_builds, 1)
+
+    def test_frame_request_skips_layout_handlers(self):
+        response = self.client.get('/page', headers={'Turbo-Frame': PAGE_FRAME})
+        self.assertEqual(response.data, f'<turbo-frame id="{PAGE_FRAME}">body</turbo-frame>'.encode())
+        self.assertEqual(self.menu_builds, 0)
+        self.assertEqual(self.turbo.stats()['partial_responses'], 1)
+
+    def test_frame_macro(self):
+        self.app.jinja_loader = FileSystemLoader(TEMPLATES)
+        with self.app.test_request_context():
+            html = render_template_string("{% import 'includes/turbo.html' as turbo %}"
+                                          "{% call turbo.frame('stats', src='/stats', loading='lazy') %}x{% endcall %}")
+        self.assertEqual(html.strip(), '<turbo-frame id="stats" src="/stats" loading="lazy">x</turbo-frame>')
+
+    def test_frame_render_skips_layout_hooks(self):
+        self.app.jinja_loader = FileSystemLoader(TEMPLATES)
+        hooks = []
+        self.app.jinja_env.globals['call_hook'] = lambda hook_name, **context: hooks.append(hook_name) or ''
+        with self.app.test_request_context():
+            html = render_template('layouts/base.html', turbo_frame=True, turbo_page_frame=PAGE_FRAME)
+        self.assertIn(f'<turbo-frame id="{PAGE_FRAME}">', html)
+        self.assertEqual(hooks, [])
+
+
+if __name__ == '__main__':
+    unittest.main()